@@ -0,0 +1,312 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import ConfigParser
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+# Kivy would read this tool's options as its own when it is imported.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from imaging.assetcache import AssetCache
+from imaging.buffers import BufferStore, shared_memory_dir
+from imaging.compositor import Compositor, make_compositor
+from imaging.workerpool import WorkerPool
+from pipeline.export import (
+    compose_sessions,
+    export_contact_sheets,
+    export_gallery,
+    find_sessions,
+    print_sessions
+)
+from pipeline.session import Session
+from printer.backend import Printer, make_printer
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Reprint, re-lay-out, and export sessions saved by '
+                    'photobooth.py --save. Outputs that are already up to '
+                    'date are skipped.'
+    )
+    parser.add_argument(
+        '--config',
+        default=None,
+        help='Photobooth config file to take print settings from (command '
+             'line arguments override settings).'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of processes that decode and scale images. 0 picks one '
+             'per core, as long as there is enough memory.'
+    )
+    parser.add_argument(
+        '--session',
+        action='append',
+        default=None,
+        help='Only use this session, e.g. session_20160521_143005_12. Give it '
+             'more than once for more sessions. Every session in the archives '
+             'is used if this is not given.'
+    )
+    commands = parser.add_subparsers(dest='command')
+
+    compose = commands.add_parser(
+        'compose',
+        help='Rebuild composites from the photos saved with --save-raw.'
+    )
+    compose.add_argument(
+        '--layout',
+        default=None,
+        help='Print layout definition, for a new layout.'
+    )
+    compose.add_argument(
+        '--compositor',
+        default=None,
+        choices=Compositor.BACKENDS,
+        help='Image processing backend used to compose the prints.'
+    )
+    compose.add_argument(
+        '--image-width',
+        type=int,
+        default=None,
+        help='Print width in pixels.'
+    )
+    compose.add_argument(
+        '--image-height',
+        type=int,
+        default=None,
+        help='Print height in pixels.'
+    )
+    compose.add_argument(
+        '--background-color',
+        default=None,
+        help='Background color of the prints.'
+    )
+    compose.add_argument(
+        '--logo',
+        default=None,
+        help='Path to logo to print on the prints.'
+    )
+
+    gallery = commands.add_parser(
+        'gallery',
+        help='Export web sized copies of the composites, with thumbnails and '
+             'an index page.'
+    )
+    gallery.add_argument(
+        '--size',
+        type=int,
+        default=1600,
+        help='Longest side of the web sized copies, in pixels.'
+    )
+    gallery.add_argument(
+        '--thumbnail-size',
+        type=int,
+        default=320,
+        help='Longest side of the thumbnails, in pixels.'
+    )
+
+    sheets = commands.add_parser(
+        'contact-sheets',
+        help='Export pages of captioned composites, for picking reprints.'
+    )
+    sheets.add_argument(
+        '--page-size',
+        type=parse_size,
+        default=(2480, 3508),
+        help='Page size in pixels, as WIDTHxHEIGHT. Defaults to A4 at 300 '
+             'DPI.'
+    )
+    sheets.add_argument(
+        '--columns',
+        type=int,
+        default=3,
+        help='Composites across each page.'
+    )
+    sheets.add_argument(
+        '--rows',
+        type=int,
+        default=5,
+        help='Composites down each page.'
+    )
+
+    reprint = commands.add_parser(
+        'print',
+        help='Print the composites, holding jobs back while the printer is '
+             'busy.'
+    )
+    reprint.add_argument(
+        '--printer',
+        default=None,
+        help='Printer to print on.'
+    )
+    reprint.add_argument(
+        '--print-backend',
+        default=None,
+        choices=Printer.BACKENDS,
+        help='How to print.'
+    )
+    reprint.add_argument(
+        '--max-print-jobs',
+        type=int,
+        default=None,
+        help='Hold prints back while this many jobs are already at the '
+             'printer. At least 1.'
+    )
+
+    for command in (compose, gallery, sheets):
+        command.add_argument(
+            '--output',
+            required=True,
+            help='Directory to write to. Run again with the same directory '
+                 'to only make what has changed.'
+        )
+
+    for command in (compose, gallery, sheets, reprint):
+        command.add_argument(
+            'archives',
+            nargs='+',
+            help='Directories written by photobooth.py --save.'
+        )
+
+    args = parser.parse_args()
+
+    # Anything not given comes from the photobooth's settings, so prints come
+    # out the way the photobooth made them.
+    config = ConfigParser.RawConfigParser()
+    with open('photobooth_defaults.cfg') as fp:
+        config.readfp(fp)
+
+    if args.config:
+        config.read(args.config)
+
+    for option, get in (
+        ('workers', config.getint),
+        ('layout', config.get),
+        ('compositor', config.get),
+        ('image_width', config.getint),
+        ('image_height', config.getint),
+        ('background_color', config.get),
+        ('logo', config.get),
+        ('printer', config.get),
+        ('print_backend', config.get),
+        ('max_print_jobs', config.getint)
+    ):
+        if getattr(args, option, False) is None:
+            setattr(
+                args,
+                option,
+                get('photobooth', option.replace('_', '-'))
+            )
+
+    if args.command == 'print' and args.max_print_jobs < 1:
+        parser.error('--max-print-jobs must be at least 1.')
+
+    for option in ('layout', 'logo', 'output'):
+        if getattr(args, option, None):
+            setattr(
+                args,
+                option,
+                os.path.abspath(os.path.expanduser(getattr(args, option)))
+            )
+
+    return args
+
+
+def main():
+    args = parse_command_line()
+    sessions = find_sessions(
+        [os.path.expanduser(archive) for archive in args.archives]
+    )
+    if args.session:
+        sessions = [
+            session for session in sessions if session.name in args.session
+        ]
+
+    if args.command == 'print':
+        from printer.tracker import PrintTracker
+
+        tracker = PrintTracker(
+            make_printer(args.print_backend, args.printer),
+            args.max_print_jobs
+        )
+        tracker.start()
+        try:
+            progress = print_sessions(tracker, sessions)
+
+        finally:
+            tracker.stop()
+
+        return progress.failed
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    pool = WorkerPool(args.workers or None)
+    work = tempfile.mkdtemp(prefix='archive_tool_', dir=shared_memory_dir(''))
+    try:
+        if args.command == 'compose':
+            compositor = make_compositor(
+                args.compositor,
+                args.image_width,
+                args.image_height,
+                args.background_color,
+                args.logo,
+                AssetCache(os.path.expanduser('~/.cache/photobooth')),
+                BufferStore(os.path.join(work, 'buffers')),
+                layout=args.layout,
+                photo_count=Session.PHOTO_COUNT
+            )
+            progress = compose_sessions(
+                compositor,
+                pool,
+                sessions,
+                args.output,
+                ('composite', args.compositor, compositor.canvas_key()),
+                work
+            )
+
+        elif args.command == 'gallery':
+            progress = export_gallery(
+                pool,
+                sessions,
+                args.output,
+                args.size,
+                args.thumbnail_size
+            )
+
+        else:
+            progress = export_contact_sheets(
+                pool,
+                sessions,
+                args.output,
+                args.page_size,
+                args.columns,
+                args.rows,
+                'white'
+            )
+
+    finally:
+        pool.close()
+        shutil.rmtree(work, ignore_errors=True)
+
+    return progress.failed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,728 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import argparse
+import glob
+import logging
+import math
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from distutils.spawn import find_executable
+
+from imaging.assetcache import AssetCache
+from imaging.buffers import BufferStore, shared_memory_dir
+from imaging.compositor import Compositor, make_compositor
+from imaging.workerpool import WorkerPool, default_workers
+from pipeline.asynclog import AsyncLogHandler, FORMAT, measure_overhead
+
+
+class Measurement(object):
+    """Wall time, CPU time, and peak RSS of one stage."""
+    def __init__(self, stage):
+        self.stage = stage
+        self.wall = None
+        self.cpu = None
+        self.peak_rss = None
+
+
+def reset_peak_rss():
+    """Reset the process's peak RSS, if the kernel supports it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fp:
+            fp.write('5')
+
+    except (IOError, OSError):
+        pass
+
+
+def peak_rss():
+    """Peak RSS in bytes of this process, and of its largest child process.
+
+    The process's peak comes from VmHWM, which reset_peak_rss() resets. Child
+    peaks can not be reset, so the child figure is the largest child so far.
+    """
+    own = None
+    try:
+        with open('/proc/self/status') as fp:
+            for line in fp:
+                if line.startswith('VmHWM:'):
+                    own = int(line.split()[1]) * 1024
+
+    except (IOError, OSError):
+        pass
+
+    if own is None:
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return own, children
+
+
+@contextmanager
+def measure(stage, results):
+    """Measure the stage run in a with block, and append it to results."""
+    measurement = Measurement(stage)
+    _, children_before = peak_rss()
+    reset_peak_rss()
+    times = os.times()
+    start = time.time()
+
+    yield measurement
+
+    measurement.wall = time.time() - start
+    end_times = os.times()
+    # User and system time of this process, and of child processes.
+    measurement.cpu = sum(end_times[:4]) - sum(times[:4])
+    own, children = peak_rss()
+    measurement.peak_rss = max(
+        own,
+        children if children > children_before else 0
+    )
+    results.append(measurement)
+
+
+def in_threads(function, args_list):
+    """Call function once per args in parallel threads, like the photobooth."""
+    errors = []
+
+    def run(args):
+        try:
+            function(*args)
+
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=run, args=(args,))
+        for args in args_list
+    ]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+def make_photo(path, size):
+    """Write a synthetic camera photo.
+
+    Noise makes the JPEG about as expensive to decode as a real photo, which a
+    flat color would not be.
+    """
+    from PIL import Image
+
+    bands = [Image.effect_noise(size, 64 + 32 * i) for i in range(3)]
+    Image.merge('RGB', bands).save(path, 'JPEG', quality=92)
+
+
+def make_corpus(directory, resolution, count):
+    """Write count synthetic photos at resolution, and return their paths."""
+    paths = []
+    for idx in range(count):
+        path = os.path.join(
+            directory,
+            'sample_{}x{}_{}.jpg'.format(resolution[0], resolution[1], idx)
+        )
+        make_photo(path, resolution)
+        paths.append(path)
+
+    return paths
+
+
+def bench_pipeline(
+    backend,
+    photos,
+    output_size,
+    logo,
+    background_color,
+    layout,
+    work
+):
+    """Run the print pipeline once, and measure each stage.
+
+    The stages are the same as the photobooth's print queue: make the canvas at
+    startup, resize each photo in parallel, and compose the print.
+    """
+    results = []
+    compositor = make_compositor(
+        backend,
+        output_size[0],
+        output_size[1],
+        background_color,
+        logo,
+        AssetCache(os.path.join(work, 'cache')),
+        BufferStore(os.path.join(work, 'buffers')),
+        layout=layout,
+        photo_count=len(photos)
+    )
+    canvas = os.path.join(work, 'canvas.jpg')
+    resized = [
+        os.path.join(work, 'photo{}_resized.jpg'.format(idx + 1))
+        for idx in range(len(photos))
+    ]
+    composite = os.path.join(work, 'composite.jpg')
+
+    with measure('canvas', results):
+        compositor.make_canvas(canvas)
+
+    with measure('resize', results):
+        in_threads(
+            compositor.resize,
+            [
+                (photo, dest, idx)
+                for idx, (photo, dest) in enumerate(zip(photos, resized))
+            ]
+        )
+
+    with measure('composite', results):
+        compositor.compose(resized, canvas, composite)
+
+    compositor.release(resized)
+    return results
+
+
+def bench_workers(workers, photos, layout, work):
+    """Resize photos with a pool of workers, and measure the whole batch.
+
+    Returns:
+        measurement, the mean time a photo waited for a worker, and the total
+        time workers spent resizing. CPU time in the measurement does not
+        include the workers, which are still running when it is taken.
+    """
+    from imaging.pillowcompositor import PillowCompositor
+
+    results = []
+    compositor = PillowCompositor(
+        1924,
+        1300,
+        'white',
+        None,
+        AssetCache(os.path.join(work, 'cache')),
+        BufferStore(os.path.join(work, 'buffers')),
+        layout=layout
+    )
+    resized = [
+        os.path.join(work, 'photo{}_resized.jpg'.format(idx + 1))
+        for idx in range(len(photos))
+    ]
+    # Starting the pool is done once at startup, so it is not measured.
+    pool = WorkerPool(workers)
+    done = threading.Semaphore(0)
+    errors = []
+    busy = []
+
+    def callback(result, error, latency, elapsed):
+        if error:
+            errors.append(error)
+
+        busy.append(elapsed)
+
+        done.release()
+
+    try:
+        with measure('resize', results):
+            for idx, (src, dest) in enumerate(zip(photos, resized)):
+                function, args = compositor.resize_task(src, dest, idx % 3)
+                pool.submit(function, args, callback)
+
+            for _ in photos:
+                done.acquire()
+
+    finally:
+        pool.close()
+
+    if errors:
+        raise RuntimeError(errors[0])
+
+    compositor.release(resized)
+    return results[0], sum(pool.latencies) / len(pool.latencies), sum(busy)
+
+
+def bench_burst(photos, burst):
+    """Score a burst of frames in the worker pool, as the photobooth does
+    before it keeps the best one.
+
+    Returns:
+        list of measurements, one per burst.
+    """
+    from imaging.sharpness import SCORE_SIZE, pick_best, score_frame
+
+    results = []
+    pool = WorkerPool()
+    done = threading.Semaphore(0)
+    errors = []
+    scores = []
+
+    def callback(result, error, latency, elapsed):
+        if error:
+            errors.append(error)
+
+        scores.append(result)
+        done.release()
+
+    try:
+        for first in range(0, len(photos), burst):
+            frames = [
+                photos[(first + idx) % len(photos)] for idx in range(burst)
+            ]
+            with measure('score', results):
+                for frame in frames:
+                    pool.submit(score_frame, (frame, SCORE_SIZE), callback)
+
+                for _ in frames:
+                    done.acquire()
+
+                pick_best(scores[-burst:], 1.0)
+
+    finally:
+        pool.close()
+
+    if errors:
+        raise RuntimeError(errors[0])
+
+    return results
+
+
+def psnr(a, b):
+    """Peak signal to noise ratio of b against a, in dB."""
+    from PIL import ImageChops
+
+    histogram = ImageChops.difference(a, b).histogram()
+    squares = sum(
+        count * (idx % 256) ** 2
+        for idx, count in enumerate(histogram)
+    )
+    mse = float(squares) / (a.size[0] * a.size[1] * len(a.getbands()))
+    if mse == 0:
+        return float('inf')
+
+    return 10 * math.log10(255 ** 2 / mse)
+
+
+def bench_decode(photos, layout):
+    """Resize each photo with a full decode, and with a scaled decode.
+
+    Returns:
+        full decode measurements, scaled decode measurements, and the PSNR of
+        each scaled decode against the full decode.
+    """
+    from imaging.layout import load_layout
+    from imaging.pillowcompositor import decode_photo, render
+
+    layout = load_layout(layout, 1924, 1300, None, len(photos))
+    full = []
+    scaled = []
+    quality = []
+    for idx, photo in enumerate(photos):
+        slot = layout.photo_slots(idx)[0]
+        with measure('full decode', full):
+            reference = render(decode_photo(photo, slot, False), slot)
+
+        with measure('scaled decode', scaled):
+            image = render(decode_photo(photo, slot), slot)
+
+        quality.append(psnr(reference, image))
+
+    return full, scaled, quality
+
+
+def bench_logging(work, count):
+    """Time logging calls to a file handler that writes and flushes every
+    record, the way Kivy's does, and to the asynchronous handler.
+
+    Returns:
+        list of (handler, seconds per call, seconds to finish writing).
+    """
+    rows = []
+    for name in ('file', 'async'):
+        path = os.path.join(work, '{}.log'.format(name))
+        if name == 'file':
+            handler = logging.FileHandler(path)
+            handler.setFormatter(logging.Formatter(FORMAT))
+
+        else:
+            handler = AsyncLogHandler(path, capacity=count)
+
+        logger = logging.getLogger('benchmark.{}'.format(name))
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        per_call = measure_overhead(logger, count)
+        start = time.time()
+        handler.close()
+        logger.removeHandler(handler)
+        rows.append((name, per_call, time.time() - start))
+
+    return rows
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the photobooth print pipeline without a '
+                    'camera, display, or printer.'
+    )
+    parser.add_argument(
+        '--corpus',
+        default=None,
+        help='Directory of sample JPEGs. Synthetic photos are generated at '
+             'each --resolution if this is not specified.'
+    )
+    parser.add_argument(
+        '--resolution',
+        type=parse_size,
+        action='append',
+        default=None,
+        help='Resolution of synthetic photos, as WIDTHxHEIGHT. May be '
+             'repeated. Defaults to 3888x2592.'
+    )
+    parser.add_argument(
+        '--output-size',
+        type=parse_size,
+        action='append',
+        default=None,
+        help='Print size (image-width x image-height), as WIDTHxHEIGHT. May '
+             'be repeated. Defaults to 1924x1300.'
+    )
+    parser.add_argument(
+        '--backend',
+        action='append',
+        choices=Compositor.BACKENDS,
+        default=None,
+        help='Compositor backend to benchmark. May be repeated. Defaults to '
+             'every backend that is installed.'
+    )
+    parser.add_argument(
+        '--logo',
+        default=None,
+        help='Path to logo to include in the print.'
+    )
+    parser.add_argument(
+        '--layout',
+        default=None,
+        help='Print layout definition. Defaults to layouts/classic.cfg.'
+    )
+    parser.add_argument(
+        '--background-color',
+        default='white',
+        help='Background color of the print.'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Number of times to run each configuration.'
+    )
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=None,
+        help='Compare resizing every photo in the corpus with 1 to this many '
+             'worker processes. Defaults to the number the photobooth would '
+             'pick.'
+    )
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=3,
+        help='Frames per burst to score, as with photobooth.py --burst.'
+    )
+    parser.add_argument(
+        '--wait-time',
+        type=int,
+        default=5,
+        help='Time between photos, in seconds, that scoring a burst has to '
+             'fit in, as with photobooth.py --wait-time.'
+    )
+    parser.add_argument(
+        '--log-calls',
+        type=int,
+        default=10000,
+        help='Number of logging calls to time for each log handler.'
+    )
+    return parser.parse_args()
+
+
+def available_backends():
+    backends = []
+    try:
+        import PIL
+        backends.append(Compositor.PILLOW)
+
+    except ImportError:
+        pass
+
+    if find_executable('convert') and find_executable('montage'):
+        backends.append(Compositor.IMAGEMAGICK)
+
+    return backends
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def report(rows):
+    row = '{:<12} {:<10} {:<10} {:<10} {:>9} {:>9} {:>9}'
+    print(row.format(
+        'backend',
+        'photos',
+        'output',
+        'stage',
+        'wall (s)',
+        'cpu (s)',
+        'rss (MB)'
+    ))
+    for backend, photos, output, stage, measurements in rows:
+        print(row.format(
+            backend,
+            photos,
+            output,
+            stage,
+            '{:.3f}'.format(median([m.wall for m in measurements])),
+            '{:.3f}'.format(median([m.cpu for m in measurements])),
+            '{:.1f}'.format(
+                max(m.peak_rss for m in measurements) / (1024.0 * 1024.0)
+            )
+        ))
+
+
+def report_workers(rows):
+    row = '{:<10} {:>8} {:>9} {:>9} {:>12} {:>9}'
+    print(row.format(
+        'photos',
+        'workers',
+        'wall (s)',
+        'busy (s)',
+        'photos/s',
+        'queue (s)'
+    ))
+    for photos, workers, count, measurements, latencies, busy in rows:
+        wall = median([m.wall for m in measurements])
+        print(row.format(
+            photos,
+            workers,
+            '{:.3f}'.format(wall),
+            '{:.3f}'.format(median(busy)),
+            '{:.2f}'.format(count / wall),
+            '{:.3f}'.format(median(latencies))
+        ))
+
+
+def report_decode(rows):
+    row = '{:<10} {:<14} {:>9} {:>9} {:>9} {:>10}'
+    print(row.format(
+        'photos',
+        'decode',
+        'wall (s)',
+        'cpu (s)',
+        'rss (MB)',
+        'psnr (dB)'
+    ))
+    for photos, decode, measurements, quality in rows:
+        print(row.format(
+            photos,
+            decode,
+            '{:.3f}'.format(median([m.wall for m in measurements])),
+            '{:.3f}'.format(median([m.cpu for m in measurements])),
+            '{:.1f}'.format(
+                max(m.peak_rss for m in measurements) / (1024.0 * 1024.0)
+            ),
+            '{:.1f}'.format(min(quality)) if quality else '-'
+        ))
+
+
+def report_burst(rows, wait_time):
+    row = '{:<10} {:>6} {:>9} {:>9} {:>10} {:>6}'
+    print(row.format(
+        'photos',
+        'burst',
+        'p50 (s)',
+        'max (s)',
+        'budget (s)',
+        'fits'
+    ))
+    for photos, burst, measurements in rows:
+        worst = max(m.wall for m in measurements)
+        print(row.format(
+            photos,
+            burst,
+            '{:.3f}'.format(median([m.wall for m in measurements])),
+            '{:.3f}'.format(worst),
+            wait_time,
+            'yes' if worst < wait_time else 'no'
+        ))
+
+
+def report_logging(rows):
+    row = '{:<8} {:>14} {:>12}'
+    print(row.format('handler', 'per call (us)', 'drain (s)'))
+    for handler, per_call, drain in rows:
+        print(row.format(
+            handler,
+            '{:.1f}'.format(per_call * 1000000),
+            '{:.3f}'.format(drain)
+        ))
+
+
+def main():
+    args = parse_command_line()
+    backends = args.backend or available_backends()
+    output_sizes = args.output_size or [(1924, 1300)]
+    # Work where the photobooth does, in shared memory if there is any.
+    work = tempfile.mkdtemp(
+        prefix='photobooth_benchmark_',
+        dir=shared_memory_dir('')
+    )
+
+    try:
+        # Each corpus is a list of sets of three photos, one set per print.
+        if args.corpus:
+            corpus = sorted(glob.glob(os.path.join(args.corpus, '*.jpg')))
+            if len(corpus) < 3:
+                raise SystemExit('Corpus needs at least three JPEGs.')
+
+            corpora = [(
+                'corpus',
+                [corpus[i:i + 3] for i in range(0, len(corpus) - 2, 3)]
+            )]
+
+        else:
+            corpora = [
+                (
+                    '{}x{}'.format(*resolution),
+                    [make_corpus(work, resolution, 3)]
+                )
+                for resolution in args.resolution or [(3888, 2592)]
+            ]
+
+        rows = []
+        for backend in backends:
+            for name, photo_sets in corpora:
+                for output_size in output_sizes:
+                    runs = []
+                    for _ in range(args.repeat):
+                        for photos in photo_sets:
+                            run_dir = tempfile.mkdtemp(dir=work)
+                            runs.append(bench_pipeline(
+                                backend,
+                                photos,
+                                output_size,
+                                args.logo,
+                                args.background_color,
+                                args.layout,
+                                run_dir
+                            ))
+                            shutil.rmtree(run_dir)
+
+                    for stage_idx, first in enumerate(runs[0]):
+                        rows.append((
+                            backend,
+                            name,
+                            '{}x{}'.format(*output_size),
+                            first.stage,
+                            [run[stage_idx] for run in runs]
+                        ))
+
+        report(rows)
+
+        if Compositor.PILLOW in backends:
+            # Scaled decode, compared to a full decode of the same photos.
+            rows = []
+            for name, photo_sets in corpora:
+                full = []
+                scaled = []
+                quality = []
+                for _ in range(args.repeat):
+                    for photos in photo_sets:
+                        results = bench_decode(photos, args.layout)
+                        full += results[0]
+                        scaled += results[1]
+                        quality += results[2]
+
+                rows.append((name, 'full', full, []))
+                rows.append((name, 'scaled', scaled, quality))
+
+            print('')
+            report_decode(rows)
+
+            rows = []
+            max_workers = args.max_workers or default_workers()
+            for name, photo_sets in corpora:
+                photos = sum(photo_sets, [])
+                for workers in range(1, max_workers + 1):
+                    measurements = []
+                    latencies = []
+                    busy = []
+                    for _ in range(args.repeat):
+                        run_dir = tempfile.mkdtemp(dir=work)
+                        measurement, latency, busy_time = bench_workers(
+                            workers,
+                            photos,
+                            args.layout,
+                            run_dir
+                        )
+                        measurements.append(measurement)
+                        latencies.append(latency)
+                        busy.append(busy_time)
+                        shutil.rmtree(run_dir)
+
+                    rows.append((
+                        name,
+                        workers,
+                        len(photos),
+                        measurements,
+                        latencies,
+                        busy
+                    ))
+
+            print('')
+            report_workers(rows)
+
+            try:
+                import numpy
+
+            except ImportError:
+                numpy = None
+
+            if numpy and args.burst > 1:
+                rows = []
+                for name, photo_sets in corpora:
+                    measurements = []
+                    for _ in range(args.repeat):
+                        measurements += bench_burst(
+                            sum(photo_sets, []),
+                            args.burst
+                        )
+
+                    rows.append((name, args.burst, measurements))
+
+                print('')
+                report_burst(rows, args.wait_time)
+
+        print('')
+        report_logging(bench_logging(work, args.log_calls))
+
+    finally:
+        shutil.rmtree(work)
+
+if __name__ == '__main__':
+    main()
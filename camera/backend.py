@@ -0,0 +1,87 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+
+
+class Camera(object):
+    """Interface for camera backends.
+
+    A backend is opened once, and then takes any number of photos. Methods are
+    blocking, and are only called from the camera session's worker thread.
+    """
+    GPHOTO2 = 'gphoto2'
+    FAKE = 'fake'
+    BACKENDS = (GPHOTO2, FAKE)
+
+    # Where photos are stored on the camera when they are taken. RAM skips
+    # writing them to the memory card. BOTH takes them to RAM, and copies them
+    # back to the card once the camera has nothing else to do.
+    RAM = 'ram'
+    CARD = 'card'
+    BOTH = 'both'
+    STORAGE_MODES = (RAM, CARD, BOTH)
+
+    def open(self):
+        """Detect and claim the camera."""
+        raise NotImplementedError
+
+    def configure(self, profile):
+        """Apply a camera profile (camera.profiles.CameraProfile)."""
+        raise NotImplementedError
+
+    def set_storage(self, mode):
+        """Take photos to RAM or to the memory card."""
+        raise NotImplementedError
+
+    def capture(self):
+        """Take a photo, and return a handle to it on the camera."""
+        raise NotImplementedError
+
+    def preview(self):
+        """Capture a low resolution live view frame, and return it as JPEG
+        data.
+        """
+        raise NotImplementedError
+
+    def download(self, handle, filename):
+        """Download a captured photo to filename."""
+        raise NotImplementedError
+
+    def delete(self, handle):
+        """Delete a photo from the camera, after it has been downloaded."""
+        raise NotImplementedError
+
+    def store(self, filename):
+        """Copy a downloaded photo to the camera's memory card."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the camera."""
+        raise NotImplementedError
+
+
+def make_camera(backend, card_folder=None):
+    """Create camera for the named backend.
+
+    Args:
+        backend (str): Camera.BACKENDS.
+        card_folder (str): folder on the camera to copy photos to, for
+            Camera.BOTH, or None for the backend's default.
+    """
+    if backend == Camera.GPHOTO2:
+        from camera.gphoto2camera import GPhoto2Camera
+        if card_folder:
+            return GPhoto2Camera(card_folder)
+
+        return GPhoto2Camera()
+
+    elif backend == Camera.FAKE:
+        from camera.fakecamera import FakeCamera
+        return FakeCamera()
+
+    raise ValueError('Unknown camera backend "{}".'.format(backend))
@@ -0,0 +1,109 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import io
+import itertools
+import time
+
+from PIL import Image, ImageDraw
+from kivy.logger import Logger
+
+from camera.backend import Camera
+
+
+class FakeCamera(Camera):
+    """Camera that generates test JPEGs, for running without hardware.
+
+    Capture and download delays approximate a USB-tethered DSLR. The download
+    and card write delays are for a full size photo, and scale with the number
+    of pixels, so camera profiles that shoot smaller photos download faster.
+    Photos taken to the card are written to it before capture returns, like a
+    real camera.
+    """
+    def __init__(
+        self,
+        width=3888,
+        height=2592,
+        capture_time=0.5,
+        download_time=1.0,
+        preview_time=0.05,
+        card_write_time=0.8
+    ):
+        self.width = width
+        self.height = height
+        self.full_size = width * height
+        self.capture_time = capture_time
+        self.download_time = download_time
+        self.preview_time = preview_time
+        self.card_write_time = card_write_time
+        self.storage = Camera.CARD
+        self.counter = itertools.count(1)
+        self.preview_counter = itertools.count(1)
+
+    def open(self):
+        Logger.info('FakeCamera: open().')
+
+    def configure(self, profile):
+        Logger.info('FakeCamera: configure(%s).', profile)
+        self.width = profile.width
+        self.height = profile.height
+
+    def set_storage(self, mode):
+        Logger.info('FakeCamera: set_storage(%s).', mode)
+        self.storage = mode
+
+    def capture(self):
+        time.sleep(self.capture_time)
+        if self.storage == Camera.CARD:
+            time.sleep(self.card_write_time * self.scale())
+
+        return next(self.counter)
+
+    def preview(self):
+        time.sleep(self.preview_time)
+        image = self.make_image(next(self.preview_counter), (640, 424))
+        data = io.BytesIO()
+        image.save(data, 'JPEG', quality=80)
+        return data.getvalue()
+
+    def download(self, handle, filename):
+        time.sleep(self.download_time * self.scale())
+        self.make_image(handle).save(filename, 'JPEG', quality=90)
+
+    def delete(self, handle):
+        pass
+
+    def store(self, filename):
+        time.sleep(self.card_write_time * self.scale())
+
+    def close(self):
+        Logger.info('FakeCamera: close().')
+
+    def scale(self):
+        """Size of the photos, relative to a full size photo."""
+        return float(self.width * self.height) / self.full_size
+
+    def make_image(self, handle, size=None):
+        """Draw a numbered test pattern."""
+        width, height = size or (self.width, self.height)
+        hue = (handle * 67) % 360
+        image = Image.new(
+            'RGB',
+            (width, height),
+            'hsl({}, 60%, 50%)'.format(hue)
+        )
+        draw = ImageDraw.Draw(image)
+        step = width // 8
+        for x in range(0, width, step):
+            draw.line([(x, 0), (x, height)], fill='white', width=4)
+
+        for y in range(0, height, step):
+            draw.line([(0, y), (width, y)], fill='white', width=4)
+
+        draw.text((step // 4, step // 4), 'Photo {}'.format(handle), fill='black')
+        return image
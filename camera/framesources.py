@@ -0,0 +1,185 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import io
+import os
+import subprocess
+import time
+
+
+class FrameSource(object):
+    """Interface for live view frame sources.
+
+    read() blocks until the next frame, and returns it as JPEG data, or None
+    when the source has no more frames.
+    """
+    CAMERA = 'camera'
+    V4L2 = 'v4l2'
+    SYNTHETIC = 'synthetic'
+    SOURCES = (CAMERA, V4L2, SYNTHETIC)
+
+    # Seconds between frames, for sources that are paced by pace().
+    interval = 0.0
+    next_frame = None
+
+    def start(self):
+        pass
+
+    def pace(self):
+        """Sleep until the next frame is due.
+
+        A source that falls behind starts again from now, rather than
+        making up for the frames it missed.
+        """
+        now = time.time()
+        if self.next_frame is None:
+            self.next_frame = now
+
+        delay = self.next_frame - now
+        if delay > 0:
+            time.sleep(delay)
+
+        self.next_frame = max(self.next_frame, now) + self.interval
+
+    def read(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class CameraPreviewSource(FrameSource):
+    """Preview frames from the camera session's camera.
+
+    Frames are requested through the camera session, so they share the camera
+    with captures instead of fighting over it, and a capture is only ever
+    queued behind one preview. Frames are only requested at fps, so the
+    camera and the USB bus are not kept busy with frames that are not shown.
+    """
+    def __init__(self, camera_session, fps=15):
+        self.camera_session = camera_session
+        self.interval = 1.0 / fps
+
+    def start(self):
+        self.next_frame = time.time()
+
+    def read(self):
+        self.pace()
+        job = self.camera_session.preview()
+        if job.wait() != 0:
+            return None
+
+        return job.result
+
+
+class MjpegSource(FrameSource):
+    """Frames from a process that writes an MJPEG stream to stdout."""
+    SOI = b'\xff\xd8'
+    EOI = b'\xff\xd9'
+
+    def __init__(self, command):
+        """
+        Args:
+            command (list): command line of the process.
+        """
+        self.command = command
+        self.process = None
+        self.buffer = b''
+
+    def start(self):
+        self.buffer = b''
+        self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE)
+
+    def read(self):
+        while True:
+            start = self.buffer.find(self.SOI)
+            end = self.buffer.find(self.EOI, start + 2) if start >= 0 else -1
+            if end >= 0:
+                frame = self.buffer[start:end + 2]
+                self.buffer = self.buffer[end + 2:]
+                return frame
+
+            if self.process is None:
+                return None
+
+            chunk = os.read(self.process.stdout.fileno(), 64 * 1024)
+            if not chunk:
+                return None
+
+            self.buffer += chunk
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+
+        self.process = None
+
+
+class V4L2Source(MjpegSource):
+    """Frames from a V4L2 webcam that can send MJPEG, copied out by ffmpeg
+    without decoding them.
+    """
+    def __init__(self, device, fps):
+        super(V4L2Source, self).__init__([
+            'ffmpeg',
+            '-loglevel', 'error',
+            '-f', 'v4l2',
+            '-input_format', 'mjpeg',
+            '-framerate', str(fps),
+            '-i', device,
+            '-c:v', 'copy',
+            '-f', 'mjpeg',
+            '-'
+        ])
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames, for testing the live view without a camera."""
+    def __init__(self, width=640, height=424, fps=30):
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps
+        self.count = 0
+
+    def start(self):
+        self.next_frame = time.time()
+
+    def read(self):
+        # Only needed for testing, so Pillow is not loaded at startup for it.
+        from PIL import Image, ImageDraw
+
+        self.pace()
+        self.count += 1
+
+        image = Image.new('RGB', (self.width, self.height), (40, 40, 40))
+        draw = ImageDraw.Draw(image)
+        x = (self.count * 8) % self.width
+        draw.rectangle([x, 0, x + 20, self.height], fill=(200, 200, 0))
+        draw.text((10, 10), 'Frame {}'.format(self.count), fill='white')
+
+        data = io.BytesIO()
+        image.save(data, 'JPEG', quality=80)
+        return data.getvalue()
+
+
+def make_frame_source(source, camera_session, device, fps):
+    """Create the named frame source, or None for no live view."""
+    if not source:
+        return None
+
+    if source == FrameSource.CAMERA:
+        return CameraPreviewSource(camera_session, fps)
+
+    elif source == FrameSource.V4L2:
+        return V4L2Source(device, fps)
+
+    elif source == FrameSource.SYNTHETIC:
+        return SyntheticSource(fps=fps)
+
+    raise ValueError('Unknown viewfinder source "{}".'.format(source))
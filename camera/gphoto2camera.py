@@ -0,0 +1,210 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from kivy.logger import Logger
+
+from camera.backend import Camera
+from imaging.buffers import shared_memory_dir
+
+
+class GPhoto2Error(Exception):
+    pass
+
+
+class GPhoto2Camera(Camera):
+    """Camera driven through a long-lived `gphoto2 --shell` process.
+
+    The camera is detected and claimed once when the shell starts, instead of
+    once per photo.
+    """
+    # e.g. "gphoto2: {/home/pi} /store_00020001/DCIM/100CANON> ". The prompt
+    # names the current camera folder, so it only ends in "/> " at the root.
+    PROMPT = re.compile(r'gphoto2: \{[^}]*\} [^>]*> $')
+    NEW_FILE = re.compile(r'New file is in location (\S+) on the camera')
+    PREVIEW_FILE = re.compile(r'Saving file as (\S+)')
+    # Choices of the capturetarget setting.
+    CAPTURE_TARGETS = {
+        Camera.RAM: 0,
+        Camera.CARD: 1,
+        Camera.BOTH: 0,
+    }
+
+    def __init__(self, card_folder='/store_00020001'):
+        """
+        Args:
+            card_folder (str): folder on the camera that store() copies
+                photos to.
+        """
+        self.card_folder = card_folder
+        self.shell = None
+        self.local_dir = None
+        self.preview_dir = None
+
+    def open(self):
+        Logger.info('GPhoto2Camera: open().')
+        self.preview_dir = tempfile.mkdtemp(
+            prefix='preview_',
+            dir=shared_memory_dir('')
+        )
+        self.shell = subprocess.Popen(
+            ['gphoto2', '--shell'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+        self.read_until_prompt()
+
+    def configure(self, profile):
+        for name, value in profile.settings:
+            output = self.command('set-config {}={}'.format(name, value))
+            if 'not found in configuration tree' in output:
+                # Profiles are written for one camera body. Others may not
+                # have every setting.
+                Logger.warning(
+                    'GPhoto2Camera: camera has no %s setting, skipped.',
+                    name
+                )
+
+            elif '*** Error' in output:
+                raise GPhoto2Error(
+                    'Setting {} to {} failed: {}'.format(
+                        name,
+                        value,
+                        output.strip()
+                    )
+                )
+
+    def set_storage(self, mode):
+        output = self.command(
+            'set-config-index capturetarget={}'.format(
+                self.CAPTURE_TARGETS[mode]
+            )
+        )
+        if '*** Error' in output:
+            raise GPhoto2Error(
+                'Setting capture target failed: {}'.format(output.strip())
+            )
+
+    def capture(self):
+        output = self.command('capture-image')
+        match = self.NEW_FILE.search(output)
+        if not match:
+            raise GPhoto2Error('Capture failed: {}'.format(output.strip()))
+
+        return match.group(1)
+
+    def preview(self):
+        self.change_local_dir(self.preview_dir)
+        output = self.command('capture-preview')
+        match = self.PREVIEW_FILE.search(output)
+        if not match:
+            raise GPhoto2Error('Preview failed: {}'.format(output.strip()))
+
+        path = os.path.join(self.preview_dir, match.group(1))
+        with open(path, 'rb') as fp:
+            data = fp.read()
+
+        os.remove(path)
+        return data
+
+    def download(self, handle, filename):
+        local_dir = os.path.dirname(filename)
+        self.change_local_dir(local_dir)
+
+        folder, name = handle.rsplit('/', 1)
+        self.command('cd {}'.format(folder or '/'))
+        self.command('get {}'.format(name))
+
+        downloaded = os.path.join(local_dir, name)
+        if not os.path.exists(downloaded):
+            raise GPhoto2Error('Download of {} failed.'.format(handle))
+
+        shutil.move(downloaded, filename)
+
+    def delete(self, handle):
+        folder, name = handle.rsplit('/', 1)
+        self.command('cd {}'.format(folder or '/'))
+        output = self.command('delete {}'.format(name))
+        if '*** Error' in output:
+            raise GPhoto2Error(
+                'Delete of {} failed: {}'.format(handle, output.strip())
+            )
+
+    def store(self, filename):
+        self.command('cd {}'.format(self.card_folder))
+        output = self.command('put {}'.format(filename))
+        if '*** Error' in output:
+            raise GPhoto2Error(
+                'Copy of {} to {} failed: {}'.format(
+                    filename,
+                    self.card_folder,
+                    output.strip()
+                )
+            )
+
+    def close(self):
+        Logger.info('GPhoto2Camera: close().')
+        if self.shell and self.shell.poll() is None:
+            self.shell.stdin.write('exit\n')
+            self.shell.stdin.flush()
+            self.shell.wait()
+
+        self.shell = None
+        # A new shell starts in the working directory.
+        self.local_dir = None
+        if self.preview_dir:
+            # Shared memory is not cleared until the Pi restarts.
+            shutil.rmtree(self.preview_dir, ignore_errors=True)
+            self.preview_dir = None
+
+    def change_local_dir(self, local_dir):
+        """Change the directory the shell downloads to."""
+        if local_dir != self.local_dir:
+            self.command('lcd {}'.format(local_dir))
+            self.local_dir = local_dir
+
+    def command(self, cmd):
+        """Send a command to the shell, and return its output."""
+        if self.shell is None or self.shell.poll() is not None:
+            raise GPhoto2Error('gphoto2 shell is not running.')
+
+        self.shell.stdin.write(cmd + '\n')
+        self.shell.stdin.flush()
+        return self.read_until_prompt()
+
+    def read_until_prompt(self):
+        """Read shell output up to the next prompt.
+
+        The prompt is not followed by a newline, so output is read a character
+        at a time.
+        """
+        output = []
+        line_start = 0
+        while True:
+            c = self.shell.stdout.read(1)
+            if not c:
+                raise GPhoto2Error(
+                    'gphoto2 shell exited: {}'.format(''.join(output).strip())
+                )
+
+            output.append(c)
+            if c == '\n':
+                line_start = len(output)
+
+            elif (
+                c == ' ' and
+                output[-2:-1] == ['>'] and
+                self.PROMPT.match(''.join(output[line_start:]))
+            ):
+                return ''.join(output[:line_start])
@@ -0,0 +1,221 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import collections
+import io
+import threading
+import time
+
+from PIL import Image
+from kivy.logger import Logger
+
+
+class RingBuffer(object):
+    """Fixed size buffer that drops the oldest items when it is full.
+
+    A slow consumer gets the newest item, and never holds up the producer.
+    """
+    def __init__(self, capacity):
+        self.items = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Get the newest item, dropping older ones, or None on timeout."""
+        with self.condition:
+            if not self.items:
+                self.condition.wait(timeout)
+
+            if not self.items:
+                return None
+
+            item = self.items.pop()
+            self.dropped += len(self.items)
+            self.items.clear()
+            return item
+
+    def clear(self):
+        with self.condition:
+            self.items.clear()
+
+
+class LiveView(object):
+    """Decodes live view frames in the background, for display.
+
+    A reader thread pulls JPEG frames from the source into a ring buffer, and
+    a decoder thread decodes the newest one, at reduced scale, into raw RGB.
+    The UI picks up the latest decoded frame on its own clock, so it never
+    waits on a decode, and frames that can not be shown in time are dropped.
+    """
+    # Seconds between statistics reports.
+    REPORT_INTERVAL = 5.0
+
+    def __init__(self, source, size=(800, 480)):
+        """
+        Args:
+            source (FrameSource): where frames come from.
+            size (tuple): largest size to decode frames to.
+        """
+        self.source = source
+        self.size = size
+        self.frames = RingBuffer(2)
+        self.lock = threading.Lock()
+        self.latest = None
+        self.sequence = 0
+        self.shown = 0
+        self.running = False
+        # Threads from an earlier start() exit once the generation changes.
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames.dropped = 0
+        self.received = 0
+        self.decoded = 0
+        self.displayed = 0
+        self.latencies = []
+        self.report_start = time.time()
+
+    def start(self, size=None):
+        """Start streaming frames.
+
+        Args:
+            size (tuple): largest size to decode frames to, if it has changed.
+        """
+        Logger.info('LiveView: start(%s).', size)
+        if self.running:
+            return
+
+        if size:
+            self.size = size
+
+        self.running = True
+        self.generation += 1
+        self.frames.clear()
+        self.reset_stats()
+        self.source.start()
+        for target, name in (
+            (self.read_frames, 'live view reader'),
+            (self.decode_frames, 'live view decoder')
+        ):
+            thread = threading.Thread(
+                target=target,
+                args=(self.generation,),
+                name=name
+            )
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """Stop asking for frames.
+
+        Does not wait for the threads, so the UI is not held up by a frame
+        that is being read or decoded. They exit when they are done with it.
+        """
+        Logger.info('LiveView: stop().')
+        if not self.running:
+            return
+
+        self.running = False
+        self.generation += 1
+        self.source.stop()
+        # Wake the decoder.
+        self.frames.put(None)
+        self.report()
+        with self.lock:
+            self.latest = None
+
+    def frame(self):
+        """Get the latest decoded frame if it has not been shown yet.
+
+        Returns:
+            (size, RGB data), or None.
+        """
+        with self.lock:
+            if self.latest is None or self.sequence == self.shown:
+                return None
+
+            self.shown = self.sequence
+            self.displayed += 1
+            return self.latest
+
+    def read_frames(self, generation):
+        while generation == self.generation:
+            try:
+                data = self.source.read()
+
+            except Exception:
+                Logger.exception('LiveView: frame source failed.')
+                data = None
+
+            if generation != self.generation:
+                break
+
+            if data is None:
+                Logger.warning('LiveView: frame source ended.')
+                break
+
+            self.received += 1
+            self.frames.put((time.time(), data))
+
+    def decode_frames(self, generation):
+        while generation == self.generation:
+            item = self.frames.get(timeout=0.5)
+            if item is None or generation != self.generation:
+                continue
+
+            arrived, data = item
+            try:
+                image = Image.open(io.BytesIO(data))
+                image.draft('RGB', self.size)
+                image = image.convert('RGB')
+                width, height = image.size
+                if width > self.size[0] or height > self.size[1]:
+                    image.thumbnail(self.size, Image.BILINEAR)
+
+                pixels = image.tobytes()
+
+            except Exception:
+                Logger.exception('LiveView: failed to decode frame.')
+                continue
+
+            with self.lock:
+                if generation != self.generation:
+                    break
+
+                self.latest = (image.size, pixels)
+                self.sequence += 1
+
+            self.decoded += 1
+            self.latencies.append(time.time() - arrived)
+            if time.time() - self.report_start >= self.REPORT_INTERVAL:
+                self.report()
+                self.reset_stats()
+
+    def report(self):
+        elapsed = time.time() - self.report_start
+        if not elapsed or not self.latencies:
+            return
+
+        Logger.info(
+            'LiveView: %.1f fps shown, %.1f fps received, %s dropped, decode '
+            'latency mean %.3fs max %.3fs.',
+            self.displayed / elapsed,
+            self.received / elapsed,
+            self.frames.dropped,
+            sum(self.latencies) / len(self.latencies),
+            max(self.latencies)
+        )
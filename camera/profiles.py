@@ -0,0 +1,106 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import ConfigParser
+import os
+
+# Profiles used when no profiles file is given.
+DEFAULT_PROFILES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'camera_profiles.cfg'
+)
+
+# Profile name that picks the smallest profile the layout can use.
+AUTO = 'auto'
+
+
+class CameraProfile(object):
+    """Camera settings, and the size of the photos they produce."""
+    def __init__(self, name, width, height, settings):
+        """
+        Args:
+            name (str): profile name.
+            width, height (int): size of the photos the profile produces.
+            settings (list): (name, value) of each camera config setting.
+        """
+        self.name = name
+        self.width = width
+        self.height = height
+        self.settings = settings
+
+    def __str__(self):
+        return '{} ({}x{})'.format(self.name, self.width, self.height)
+
+
+def load_profiles(path=None):
+    """Read camera profiles.
+
+    Each section of the file is a profile. width and height are the size of
+    the photos it produces, every other option is a camera config setting.
+    """
+    config = ConfigParser.RawConfigParser()
+    path = os.path.abspath(os.path.expanduser(path or DEFAULT_PROFILES))
+    if not config.read(path):
+        raise ValueError('Can not read camera profiles {}.'.format(path))
+
+    profiles = []
+    for section in config.sections():
+        profiles.append(CameraProfile(
+            section,
+            config.getint(section, 'width'),
+            config.getint(section, 'height'),
+            [
+                (name, value)
+                for name, value in config.items(section)
+                if name not in ('width', 'height')
+            ]
+        ))
+
+    return profiles
+
+
+def pick_profile(profiles, layout):
+    """Pick the smallest profile that no slot of layout has to scale up.
+
+    If every profile is too small, the biggest is used.
+    """
+    profiles = sorted(profiles, key=lambda p: p.width * p.height)
+    for profile in profiles:
+        if not any(
+            slot.upscales((profile.width, profile.height))
+            for slot in layout.slots
+        ):
+            return profile
+
+    return profiles[-1] if profiles else None
+
+
+def load_camera_profile(name, layout, path=None):
+    """Get the named camera profile.
+
+    Args:
+        name (str): profile name, AUTO to pick one for layout, or None to leave
+            the camera's settings alone.
+        layout (imaging.layout.Layout): print layout.
+        path (str): profiles file, or None for the default profiles.
+
+    Returns:
+        CameraProfile, or None.
+    """
+    if not name:
+        return None
+
+    profiles = load_profiles(path)
+    if name == AUTO:
+        return pick_profile(profiles, layout)
+
+    for profile in profiles:
+        if profile.name == name:
+            return profile
+
+    raise ValueError('Unknown camera profile "{}".'.format(name))
@@ -0,0 +1,294 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import Queue
+import collections
+import os
+import shutil
+import threading
+import time
+
+from kivy.logger import Logger
+
+from camera.backend import Camera
+from imaging.buffers import shared_memory_dir
+from pipeline.jobs import Job
+
+
+class CameraSession(object):
+    """Long-lived camera session.
+
+    The camera is opened once when the session starts. Capture requests are
+    queued to a worker thread that owns the camera, and each request returns a
+    Job that completes when the photo has been downloaded. The job result is a
+    dictionary of timings, in seconds, for each phase of the request.
+
+    Finding and opening the camera can take seconds, so it is not waited for.
+    The opened job completes once the first attempt to open it is over, with
+    its (start, end) times.
+
+    Work on the camera that nobody waits for (deleting photos taken to RAM
+    once they are downloaded, and copying them to the card) is left until
+    there are no requests.
+    """
+    def __init__(self, camera, profile=None, storage=Camera.CARD):
+        """
+        Args:
+            camera (camera.backend.Camera): camera backend.
+            profile (camera.profiles.CameraProfile): settings to apply
+                whenever the camera is opened, or None.
+            storage (str): Camera.STORAGE_MODES, where photos are taken to.
+        """
+        self.camera = camera
+        self.profile = profile
+        self.storage = storage
+        self.chores = collections.deque()
+        self.backup_dir = shared_memory_dir('camera_backup')
+        self.requests = Queue.Queue()
+        self.opened = Job('open camera')
+        self.worker = threading.Thread(target=self.run, name='camera session')
+        self.worker.daemon = True
+
+    def start(self):
+        Logger.info('CameraSession: start().')
+        self.worker.start()
+
+    def stop(self):
+        Logger.info('CameraSession: stop().')
+        self.requests.put(None)
+
+    def capture(self, filename, timeline=None, burst=1):
+        """Queue a request to take a photo and download it to filename.
+
+        Args:
+            filename (str): where to download the photo to.
+            timeline (pipeline.timing.Timeline): records the time spent in
+                each phase, if given.
+            burst (int): number of photos to take, back to back. The photos
+                of a burst are downloaded next to filename, and listed in the
+                job result's "frames", for the caller to pick from.
+        """
+        job = Job('capture {}'.format(filename))
+        self.requests.put(
+            ('capture', job, filename, timeline, time.time(), burst)
+        )
+        return job
+
+    def preview(self):
+        """Queue a request for a live view frame.
+
+        The job result is the frame as JPEG data.
+        """
+        job = Job('preview')
+        self.requests.put(('preview', job))
+        return job
+
+    def run(self):
+        start = time.time()
+        self.open_camera()
+        self.opened.complete((start, time.time()))
+
+        while True:
+            try:
+                request = self.requests.get(block=not self.chores)
+
+            except Queue.Empty:
+                self.do_chore(*self.chores.popleft())
+                continue
+
+            if request is None:
+                break
+
+            if request[0] == 'preview':
+                job = request[1]
+                try:
+                    job.complete(self.camera.preview())
+
+                except Exception as e:
+                    # Not every camera can preview. Leave the camera alone, so
+                    # captures still work.
+                    Logger.exception('CameraSession: preview failed.')
+                    job.fail(e)
+
+                continue
+
+            _, job, filename, timeline, queued, burst = request
+            try:
+                job.complete(
+                    self.take_photo(filename, timeline, queued, burst)
+                )
+
+            except Exception as e:
+                Logger.exception('CameraSession: capture failed.')
+                job.fail(e)
+
+                # The camera may have been unplugged, or the backend may have
+                # died. Claim it again for the next request.
+                self.close_camera()
+                self.open_camera()
+
+        if self.chores:
+            Logger.warning(
+                'CameraSession: %s camera chores left undone.',
+                len(self.chores)
+            )
+            shutil.rmtree(self.backup_dir, ignore_errors=True)
+
+        self.close_camera()
+
+    def do_chore(self, chore, target):
+        try:
+            start = time.time()
+            if chore == 'delete':
+                self.camera.delete(target)
+
+            else:
+                self.camera.store(target)
+                os.remove(target)
+
+            Logger.info(
+                'CameraSession: %s %s took %.3fs, %s left.',
+                chore,
+                target,
+                time.time() - start,
+                len(self.chores)
+            )
+
+        except Exception:
+            Logger.exception('CameraSession: %s %s failed.', chore, target)
+
+    def open_camera(self):
+        try:
+            start = time.time()
+            self.camera.open()
+            Logger.info(
+                'CameraSession: camera opened in %.3fs.',
+                time.time() - start
+            )
+
+        except Exception:
+            Logger.exception('CameraSession: failed to open camera.')
+            return
+
+        if self.profile:
+            try:
+                start = time.time()
+                self.camera.configure(self.profile)
+                Logger.info(
+                    'CameraSession: profile %s applied in %.3fs.',
+                    self.profile,
+                    time.time() - start
+                )
+
+            except Exception:
+                # Carry on with whatever the camera is set to.
+                Logger.exception(
+                    'CameraSession: failed to apply profile %s.',
+                    self.profile
+                )
+
+        try:
+            self.camera.set_storage(self.storage)
+
+        except Exception:
+            Logger.exception(
+                'CameraSession: failed to take photos to %s.',
+                self.storage
+            )
+
+    def close_camera(self):
+        try:
+            self.camera.close()
+
+        except Exception:
+            Logger.exception('CameraSession: failed to close camera.')
+
+    def take_photo(self, filename, timeline, queued, burst=1):
+        if burst > 1:
+            name, extension = os.path.splitext(filename)
+            frames = [
+                '{}_burst{}{}'.format(name, idx + 1, extension)
+                for idx in range(burst)
+            ]
+
+        else:
+            frames = [filename]
+
+        start = time.time()
+        # Every shot of a burst is taken before any is downloaded, so they are
+        # as close together as the camera allows.
+        handles = [self.camera.capture() for _ in frames]
+        captured = time.time()
+        for handle, frame in zip(handles, frames):
+            self.camera.download(handle, frame)
+
+        downloaded = time.time()
+        for handle, frame in zip(handles, frames):
+            if self.storage != Camera.CARD:
+                # Free the camera's RAM for the next photo.
+                self.chores.append(('delete', handle))
+
+            if self.storage == Camera.BOTH:
+                self.back_up(frame)
+
+        timings = {
+            'queue': start - queued,
+            'capture': captured - start,
+            'download': downloaded - captured,
+            'total': downloaded - queued,
+            'bytes': sum(os.path.getsize(frame) for frame in frames),
+            'storage': self.storage,
+            'frames': frames,
+        }
+        Logger.info(
+            'CameraSession: %s queue %.3fs, capture %.3fs, download %.3fs '
+            '(%d KB), total %.3fs, %s to %s.',
+            filename,
+            timings['queue'],
+            timings['capture'],
+            timings['download'],
+            timings['bytes'] // 1024,
+            timings['total'],
+            len(frames),
+            self.storage
+        )
+        if timeline:
+            # Lets timing_report.py compare download times between profiles.
+            timeline.tags['camera_profile'] = (
+                self.profile.name if self.profile else 'none'
+            )
+            timeline.tags['camera_storage'] = self.storage
+            detail = os.path.basename(filename)
+            timeline.record('camera queue', queued, start, detail=detail)
+            timeline.record('capture', start, captured, detail=detail)
+            timeline.record('download', captured, downloaded, detail=detail)
+
+        return timings
+
+    def back_up(self, filename):
+        """Queue a copy of filename to the camera's card."""
+        # The photo may be gone by the time the camera is free.
+        if not os.path.exists(self.backup_dir):
+            os.makedirs(self.backup_dir)
+
+        # Named after the session, so photos do not overwrite each other on
+        # the card.
+        backup = os.path.join(
+            self.backup_dir,
+            '{}_{}'.format(
+                os.path.basename(os.path.dirname(filename)),
+                os.path.basename(filename)
+            )
+        )
+        try:
+            os.link(filename, backup)
+
+        except OSError:
+            shutil.copy(filename, backup)
+
+        self.chores.append(('store', backup))
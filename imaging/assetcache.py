@@ -0,0 +1,116 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+
+class AssetCache(object):
+    """Content-addressed cache of static print assets.
+
+    Assets are keyed on everything that goes into making them, so a change of
+    print size, background color, or logo file creates a new entry instead of
+    invalidating an old one. Decoded images are held in memory, and stored on
+    disk as raw pixels, so they survive restarts without being decoded again.
+    """
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): where to keep the cache between runs.
+        """
+        self.directory = directory
+        self.images = {}
+        self.lock = threading.Lock()
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    @staticmethod
+    def key(*parts):
+        """Make a cache key from the parts that identify an asset."""
+        return hashlib.sha1(
+            '\0'.join(str(part) for part in parts).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def file_key(*parts):
+        """Make a cache key that includes a file's path and modified time.
+
+        The last part is the file.
+        """
+        path = parts[-1]
+        return AssetCache.key(*(parts + (os.path.getmtime(path),)))
+
+    def path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def get_image(self, key):
+        """Get a decoded image, or None if it is not in the cache."""
+        with self.lock:
+            image = self.images.get(key)
+
+        if image is not None:
+            return image
+
+        try:
+            with open(self.path(key, '.raw'), 'rb') as fp:
+                mode, width, height = fp.readline().decode('ascii').split()
+                image = Image.frombytes(
+                    mode,
+                    (int(width), int(height)),
+                    fp.read()
+                )
+
+        except (IOError, OSError, ValueError):
+            return None
+
+        with self.lock:
+            self.images[key] = image
+
+        return image
+
+    def put_image(self, key, image):
+        """Store a decoded image in memory and on disk."""
+        with self.lock:
+            self.images[key] = image
+
+        header = '{} {} {}\n'.format(image.mode, image.size[0], image.size[1])
+        self.write(
+            self.path(key, '.raw'),
+            header.encode('ascii') + image.tobytes()
+        )
+
+    def get_file(self, key, ext):
+        """Get the path to a cached file, or None if it is not in the cache."""
+        path = self.path(key, ext)
+        return path if os.path.exists(path) else None
+
+    def put_file(self, key, ext, src):
+        """Copy a file into the cache, and return its path in the cache."""
+        path = self.path(key, ext)
+        with open(src, 'rb') as fp:
+            self.write(path, fp.read())
+
+        return path
+
+    def write(self, path, data):
+        """Write data atomically, so a crash never leaves a partial entry."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+
+            os.rename(tmp, path)
+
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
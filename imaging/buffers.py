@@ -0,0 +1,121 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+# Shared memory filesystem, if there is one.
+SHM = '/dev/shm'
+
+# Size of the trailer that describes the pixels in a buffer.
+TRAILER_SIZE = 64
+
+
+def shared_memory_dir(name):
+    """Directory for name in shared memory, or in /tmp if there is none."""
+    if os.path.isdir(SHM) and os.access(SHM, os.W_OK):
+        return os.path.join(SHM, name)
+
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+class BufferStore(object):
+    """Decoded images in memory-mapped files.
+
+    Images are referred to by name, so a reference can be handed to another
+    thread or process, which maps the same pages instead of receiving a copy of
+    the pixels. The pixels start at the beginning of the file, and are followed
+    by a trailer with the mode and size, so Pillow can use the mapping directly
+    as the image's memory.
+    """
+    # Pillow can only map modes that it stores the way they are laid out in
+    # the buffer. RGB is stored with a padding byte.
+    mapped_modes = {'RGB': 'RGBX'}
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): where to keep the buffers, ideally on tmpfs.
+        """
+        self.directory = directory
+        self.images = {}
+        self.lock = threading.Lock()
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def path(self, name):
+        return os.path.join(
+            self.directory,
+            hashlib.sha1(name.encode('utf-8')).hexdigest() + '.raw'
+        )
+
+    def put_image(self, name, image):
+        """Store image under name."""
+        mode = self.mapped_modes.get(image.mode, image.mode)
+        if mode != image.mode:
+            image = image.convert(mode)
+
+        trailer = '{} {} {}'.format(mode, image.size[0], image.size[1])
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(image.tobytes())
+            fp.write(trailer.ljust(TRAILER_SIZE).encode('ascii'))
+
+        os.rename(tmp, self.path(name))
+        with self.lock:
+            self.images.pop(name, None)
+
+    def get_image(self, name):
+        """Get the image stored under name, or None.
+
+        The image is backed by the mapping, and is read only. Pillow copies it
+        if it is modified.
+        """
+        with self.lock:
+            image = self.images.get(name)
+
+        if image is not None:
+            return image
+
+        try:
+            with open(self.path(name), 'rb') as fp:
+                mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except (IOError, OSError):
+            return None
+
+        mode, width, height = mapping[-TRAILER_SIZE:].decode('ascii').split()
+        image = Image.frombuffer(
+            mode,
+            (int(width), int(height)),
+            mapping,
+            'raw',
+            mode,
+            0,
+            1
+        )
+        with self.lock:
+            self.images[name] = image
+
+        return image
+
+    def release(self, name):
+        """Forget the image stored under name."""
+        with self.lock:
+            self.images.pop(name, None)
+
+        try:
+            os.remove(self.path(name))
+
+        except OSError:
+            pass
@@ -0,0 +1,150 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+from imaging.layout import load_layout
+
+
+class Compositor(object):
+    """Interface for the print composition pipeline.
+
+    The photobooth print is built in two stages: each photo is rotated and
+    scaled for its slot in the layout, then every photo is pasted straight into
+    its place on a canvas the size of the print, which already has the
+    background and any overlays under the photos. Backends implement each stage
+    as a blocking call, so the caller decides what runs in the background.
+    """
+    IMAGEMAGICK = 'imagemagick'
+    PILLOW = 'pillow'
+    BACKENDS = (IMAGEMAGICK, PILLOW)
+
+    # Bumped whenever a backend starts drawing the canvas differently, so
+    # canvases cached by older versions are not reused.
+    CANVAS_VERSION = 1
+
+    def __init__(
+        self,
+        width,
+        height,
+        background_color,
+        logo,
+        cache,
+        buffers,
+        debug=False,
+        layout=None,
+        photo_count=3
+    ):
+        """
+        Args:
+            width (int): print width in pixels, unless the layout sets it.
+            height (int): print height in pixels, unless the layout sets it.
+            background_color (str): ImageMagick color specification.
+            logo (str): path to logo, or None.
+            cache (imaging.assetcache.AssetCache): cache for static assets.
+            buffers (imaging.buffers.BufferStore): shared memory for
+                intermediate images.
+            debug (bool): write intermediate images to disk.
+            layout (str): layout definition, or None for the default layout.
+            photo_count (int): number of photos in a print.
+        """
+        self.layout = load_layout(layout, width, height, logo, photo_count)
+        self.width = self.layout.width
+        self.height = self.layout.height
+        self.background_color = background_color
+        self.logo = logo
+        self.cache = cache
+        self.buffers = buffers
+        self.debug = debug
+
+    def canvas_key(self):
+        """Asset cache key of the canvas."""
+        return self.cache.key(
+            'canvas',
+            type(self).__name__,
+            self.CANVAS_VERSION,
+            self.width,
+            self.height,
+            self.background_color,
+            *self.layout.key_parts()
+        )
+
+    def make_canvas(self, dest):
+        """Create the print canvas, with the overlays that go under the photos.
+        """
+        raise NotImplementedError
+
+    def resize(self, src, dest, photo):
+        """Rotate and scale a photo for its slot in the layout.
+
+        Args:
+            src (str): photo from the camera.
+            dest (str): name of the resized photo.
+            photo (int): index of the photo in the session.
+        """
+        raise NotImplementedError
+
+    def resize_task(self, src, dest, photo):
+        """Get resize() as a (function, args) pair that a worker process can
+        run, or None if the resize has to run in this process.
+        """
+        return None
+
+    def compose(self, photos, canvas, dest):
+        """Place the resized photos, and the overlays above them, on the
+        canvas, and write the print.
+
+        Args:
+            photos (list): names of the resized photos, by photo index.
+            canvas (str): canvas created by make_canvas().
+            dest (str): where to write the print.
+        """
+        raise NotImplementedError
+
+    def release(self, names):
+        """Forget intermediate images that are no longer needed."""
+        pass
+
+
+def make_compositor(
+    backend,
+    width,
+    height,
+    background_color,
+    logo,
+    cache,
+    buffers,
+    debug=False,
+    layout=None,
+    photo_count=3
+):
+    """Create compositor for the named backend.
+
+    Backends are imported on demand, so optional imaging libraries are only
+    required when they are used.
+    """
+    if backend == Compositor.IMAGEMAGICK:
+        from imaging.imagemagickcompositor import ImageMagickCompositor
+        cls = ImageMagickCompositor
+
+    elif backend == Compositor.PILLOW:
+        from imaging.pillowcompositor import PillowCompositor
+        cls = PillowCompositor
+
+    else:
+        raise ValueError('Unknown compositor backend "{}".'.format(backend))
+
+    return cls(
+        width,
+        height,
+        background_color,
+        logo,
+        cache,
+        buffers,
+        debug,
+        layout,
+        photo_count
+    )
@@ -0,0 +1,72 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+from PIL import Image, ImageDraw
+
+# Height of the caption under each print, in pixels.
+CAPTION_HEIGHT = 30
+
+
+def make_contact_sheet(
+    sources,
+    captions,
+    dest,
+    size,
+    columns,
+    rows,
+    background_color='white',
+    margin=40
+):
+    """Write a page with sources laid out in a grid, each with its caption.
+
+    Sources are decoded in draft mode, at the smallest scale that still fills
+    their cell, so a page of full size prints does not have to be decoded at
+    full size.
+
+    Args:
+        sources (list): paths of the images on the page, in order.
+        captions (list): text under each image.
+        dest (str): where to write the page.
+        size (tuple): page size in pixels.
+        columns (int): images across the page.
+        rows (int): images down the page.
+        background_color (str): color of the page.
+        margin (int): space around, and between, the images.
+    """
+    page = Image.new('RGB', size, background_color)
+    draw = ImageDraw.Draw(page)
+    cell_width = (size[0] - margin * (columns + 1)) // columns
+    cell_height = (size[1] - margin * (rows + 1)) // rows
+    image_size = (cell_width, cell_height - CAPTION_HEIGHT)
+    for idx, (src, caption) in enumerate(zip(sources, captions)):
+        x = margin + (idx % columns) * (cell_width + margin)
+        y = margin + (idx // columns) * (cell_height + margin)
+
+        image = Image.open(src)
+        image.draft('RGB', image_size)
+        image = image.convert('RGB')
+        image.thumbnail(image_size, Image.LANCZOS)
+        page.paste(
+            image,
+            (
+                x + (cell_width - image.size[0]) // 2,
+                y + (image_size[1] - image.size[1]) // 2
+            )
+        )
+
+        text_width, text_height = draw.textsize(caption)
+        draw.text(
+            (
+                x + (cell_width - text_width) // 2,
+                y + image_size[1] + (CAPTION_HEIGHT - text_height) // 2
+            ),
+            caption,
+            fill='black'
+        )
+
+    page.save(dest, 'JPEG', quality=90)
@@ -0,0 +1,131 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import shutil
+import subprocess
+
+from imaging.compositor import Compositor
+from imaging.layout import Placement
+
+
+class ImageMagickCompositor(Compositor):
+    """Compose prints with the ImageMagick command line tools.
+
+    Every stage decodes its inputs from disk, and encodes its output to disk.
+    The print is composed by one convert command.
+    """
+    # Version 1 ignored the background color.
+    CANVAS_VERSION = 2
+
+    def make_canvas(self, dest):
+        key = self.canvas_key()
+        cached = self.cache.get_file(key, '.jpg')
+        if cached is None:
+            self.convert_canvas(dest)
+            overlays = self.layout.canvas_overlays()
+            if overlays:
+                cmd = ['convert', dest]
+                for overlay in overlays:
+                    cmd += self.overlay(overlay)
+
+                subprocess.check_call(cmd + [dest])
+
+            # Every command was checked, so only a complete canvas is kept.
+            self.cache.put_file(key, '.jpg', dest)
+
+        else:
+            shutil.copy(cached, dest)
+
+    def convert_canvas(self, dest):
+        subprocess.check_call([
+            'convert',
+            '-size', '{}x{}'.format(self.width, self.height),
+            'xc:{}'.format(self.background_color),
+            dest
+        ])
+
+    def resize(self, src, dest, photo):
+        slot = self.layout.photo_slots(photo)[0]
+        # Let libjpeg decode at a reduced scale that is still big enough.
+        cmd = (
+            [
+                'convert',
+                '-define', 'jpeg:size={}x{}'.format(*slot.decode_size()),
+                src
+            ] +
+            self.transform(slot) +
+            [dest]
+        )
+        subprocess.check_call(cmd)
+
+    def compose(self, photos, canvas, dest):
+        cmd = ['convert', canvas]
+        for slot in self.layout.slots:
+            first = self.layout.photo_slots(slot.source)[0]
+            if slot.same_render(first):
+                cmd += [photos[slot.source]]
+
+            else:
+                cmd += (
+                    ['(', photos[slot.source]] +
+                    self.transform(slot, (slot.rotate - first.rotate) % 360) +
+                    [')']
+                )
+
+            cmd += self.place(slot)
+
+        for overlay in self.layout.top_overlays():
+            cmd += self.overlay(overlay)
+
+        subprocess.check_call(cmd + [dest])
+
+    def overlay(self, placement):
+        """Arguments that draw an overlay image."""
+        return (
+            ['(', placement.source] +
+            self.transform(placement) +
+            [')'] +
+            self.place(placement)
+        )
+
+    def place(self, placement):
+        """Arguments that composite the last image, centered in placement's
+        box.
+
+        With center gravity, the geometry is the offset from the center of the
+        print, so the image does not have to be measured first.
+        """
+        return [
+            '-gravity', 'center',
+            '-geometry', '{:+d}{:+d}'.format(
+                placement.x + placement.width // 2 - self.width // 2,
+                placement.y + placement.height // 2 - self.height // 2
+            ),
+            '-composite'
+        ]
+
+    @staticmethod
+    def transform(placement, rotate=None):
+        """Arguments that rotate and scale an image for placement."""
+        rotate = placement.rotate if rotate is None else rotate
+        args = ['-rotate', str(rotate)] if rotate else []
+        size = '{}x{}'.format(placement.width, placement.height)
+        if placement.fit == Placement.COVER:
+            args += [
+                '-resize', size + '^',
+                '-gravity', 'center',
+                '-extent', size
+            ]
+
+        elif placement.fit == Placement.CENTER:
+            args += ['-resize', size + '>']
+
+        else:
+            args += ['-resize', size]
+
+        return args
@@ -0,0 +1,377 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import ConfigParser
+import os
+
+# Layout used when none is configured.
+DEFAULT_LAYOUT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'layouts',
+    'classic.cfg'
+)
+
+
+class LayoutError(Exception):
+    pass
+
+
+class Placement(object):
+    """Where one photo or overlay goes on the print.
+
+    The box is in print pixels. The image is rotated clockwise by rotate
+    degrees, scaled into the box the way fit says, and centered in it.
+    """
+    # Scale to fit inside the box.
+    CONTAIN = 'contain'
+    # Scale to fill the box, and crop what does not fit.
+    COVER = 'cover'
+    # Keep the image's own size, unless it does not fit.
+    CENTER = 'center'
+    FITS = (CONTAIN, COVER, CENTER)
+
+    ROTATIONS = (0, 90, 180, 270)
+
+    def __init__(self, source, x, y, width, height, rotate=0, fit=CONTAIN):
+        """
+        Args:
+            source: photo index for photo slots, image path for overlays.
+            x, y, width, height (int): box in print pixels.
+            rotate (int): clockwise rotation, in degrees.
+            fit (str): how the image is scaled into the box.
+        """
+        self.source = source
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rotate = rotate
+        self.fit = fit
+
+    def __repr__(self):
+        return 'Placement({!r}, {}, {}, {}, {}, {}, {!r})'.format(
+            self.source,
+            self.x,
+            self.y,
+            self.width,
+            self.height,
+            self.rotate,
+            self.fit
+        )
+
+    def rotated_size(self, size):
+        """Size of an image of size once it is rotated."""
+        if self.rotate in (90, 270):
+            return size[1], size[0]
+
+        return size
+
+    def decode_size(self):
+        """Smallest size, before rotation, that an image can be decoded at and
+        still be scaled down into the box, whatever the fit.
+        """
+        return self.rotated_size((self.width, self.height))
+
+    def upscales(self, size):
+        """True if an image of size, before rotation, would be scaled up."""
+        rotated = self.rotated_size(size)
+        return self.scaled_size(rotated)[0] > rotated[0]
+
+    def scaled_size(self, size):
+        """Size to scale a rotated image of size to."""
+        width, height = size
+        scale_x = float(self.width) / width
+        scale_y = float(self.height) / height
+        if self.fit == self.COVER:
+            scale = max(scale_x, scale_y)
+
+        elif self.fit == self.CENTER:
+            scale = min(1.0, scale_x, scale_y)
+
+        else:
+            scale = min(scale_x, scale_y)
+
+        return (
+            max(1, int(round(width * scale))),
+            max(1, int(round(height * scale)))
+        )
+
+    def crop_box(self, size):
+        """Part of a scaled image of size that fits in the box, or None if it
+        all does.
+        """
+        width, height = size
+        if width <= self.width and height <= self.height:
+            return None
+
+        left = max(0, (width - self.width) // 2)
+        top = max(0, (height - self.height) // 2)
+        return (
+            left,
+            top,
+            left + min(width, self.width),
+            top + min(height, self.height)
+        )
+
+    def position(self, size):
+        """Top left corner of an image of size, centered in the box."""
+        return (
+            self.x + (self.width - size[0]) // 2,
+            self.y + (self.height - size[1]) // 2
+        )
+
+    def same_render(self, other):
+        """True if an image rendered for other is rendered for this too."""
+        return (
+            (self.width, self.height, self.rotate, self.fit) ==
+            (other.width, other.height, other.rotate, other.fit)
+        )
+
+
+class Layout(object):
+    """Compiled print layout.
+
+    Everything that does not depend on the photos is worked out when the
+    layout is loaded, so composing a print is one paste per slot.
+    """
+    def __init__(self, path, width, height, slots, overlays):
+        """
+        Args:
+            path (str): layout definition.
+            width, height (int): print size in pixels.
+            slots (list): Placement of each photo, by photo index.
+            overlays (list): (Placement, above) of each overlay image. Overlays
+                that are not above the photos are drawn on the canvas.
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.overlays = overlays
+
+    def photo_slots(self, photo):
+        """Slots that photo index photo is placed in."""
+        return [slot for slot in self.slots if slot.source == photo]
+
+    def canvas_overlays(self):
+        return [overlay for overlay, above in self.overlays if not above]
+
+    def top_overlays(self):
+        return [overlay for overlay, above in self.overlays if above]
+
+    def key_parts(self):
+        """Parts identifying the layout and its overlays, for the asset cache.
+        """
+        parts = [self.path, os.path.getmtime(self.path)]
+        for overlay, _ in self.overlays:
+            parts += [overlay.source, os.path.getmtime(overlay.source)]
+
+        return parts
+
+
+def parse_ints(text, count=None):
+    try:
+        values = [int(value) for value in text.split(',')]
+
+    except ValueError:
+        raise LayoutError('Expected integers, got "{}".'.format(text))
+
+    if count is not None and len(values) != count:
+        raise LayoutError(
+            'Expected {} integers, got "{}".'.format(count, text)
+        )
+
+    return values
+
+
+def parse_margin(text):
+    """Parse a margin as top, right, bottom, left, in the CSS shorthand."""
+    values = parse_ints(text)
+    if len(values) == 1:
+        return values * 4
+
+    if len(values) == 2:
+        return values * 2
+
+    if len(values) == 4:
+        return values
+
+    raise LayoutError('Expected 1, 2, or 4 margins, got "{}".'.format(text))
+
+
+def grid_cells(width, height, margin, grid, spacing):
+    """Boxes of the cells of a columns x rows grid, in row major order."""
+    columns, rows = (int(n) for n in grid.lower().split('x'))
+    top, right, bottom, left = margin
+    cell_width = (width - left - right - spacing * (columns - 1)) // columns
+    cell_height = (height - top - bottom - spacing * (rows - 1)) // rows
+    if cell_width <= 0 or cell_height <= 0:
+        raise LayoutError('Grid {} does not fit on the print.'.format(grid))
+
+    return [
+        (
+            left + col * (cell_width + spacing),
+            top + row * (cell_height + spacing),
+            cell_width,
+            cell_height
+        )
+        for row in range(rows)
+        for col in range(columns)
+    ]
+
+
+def placement(config, section, source, cells, padding, fit):
+    """Compile the box, rotation and fit of a slot or overlay section."""
+    if config.has_option(section, 'box'):
+        x, y, width, height = parse_ints(config.get(section, 'box'), 4)
+
+    elif config.has_option(section, 'cell'):
+        cell = config.getint(section, 'cell')
+        if not 1 <= cell <= len(cells):
+            raise LayoutError('[{}] has no cell {}.'.format(section, cell))
+
+        x, y, width, height = cells[cell - 1]
+
+    else:
+        raise LayoutError('[{}] needs a box or a cell.'.format(section))
+
+    if config.has_option(section, 'padding'):
+        padding = config.getint(section, 'padding')
+
+    rotate = 0
+    if config.has_option(section, 'rotate'):
+        rotate = config.getint(section, 'rotate') % 360
+
+    if rotate not in Placement.ROTATIONS:
+        raise LayoutError(
+            '[{}] can only rotate by a multiple of 90.'.format(section)
+        )
+
+    if config.has_option(section, 'fit'):
+        fit = config.get(section, 'fit')
+
+    if fit not in Placement.FITS:
+        raise LayoutError('[{}] has unknown fit "{}".'.format(section, fit))
+
+    return Placement(
+        source,
+        x + padding,
+        y + padding,
+        width - 2 * padding,
+        height - 2 * padding,
+        rotate,
+        fit
+    )
+
+
+def load_layout(path, width, height, logo, photo_count):
+    """Read and compile a layout definition.
+
+    Args:
+        path (str): layout definition, or None for the default layout.
+        width, height (int): print size, unless the layout sets its own.
+        logo (str): image used by overlays whose image is "logo", or None to
+            leave those overlays out.
+        photo_count (int): number of photos in a session.
+
+    Returns:
+        Layout.
+    """
+    path = os.path.abspath(os.path.expanduser(path or DEFAULT_LAYOUT))
+    config = ConfigParser.RawConfigParser()
+    if not config.read(path):
+        raise LayoutError('Can not read layout {}.'.format(path))
+
+    try:
+        if config.has_option('layout', 'width'):
+            width = config.getint('layout', 'width')
+
+        if config.has_option('layout', 'height'):
+            height = config.getint('layout', 'height')
+
+        width = int(width)
+        height = int(height)
+        padding = 0
+        if config.has_option('layout', 'padding'):
+            padding = config.getint('layout', 'padding')
+
+        cells = []
+        if config.has_option('layout', 'grid'):
+            margin = [0] * 4
+            if config.has_option('layout', 'margin'):
+                margin = parse_margin(config.get('layout', 'margin'))
+
+            spacing = 0
+            if config.has_option('layout', 'spacing'):
+                spacing = config.getint('layout', 'spacing')
+
+            cells = grid_cells(
+                width,
+                height,
+                margin,
+                config.get('layout', 'grid'),
+                spacing
+            )
+
+        slots = []
+        overlays = []
+        for section in config.sections():
+            if section.startswith('slot'):
+                photo = config.getint(section, 'photo')
+                if not 1 <= photo <= photo_count:
+                    raise LayoutError(
+                        '[{}] photo must be 1 to {}.'.format(
+                            section,
+                            photo_count
+                        )
+                    )
+
+                slots.append(placement(
+                    config,
+                    section,
+                    photo - 1,
+                    cells,
+                    padding,
+                    Placement.CONTAIN
+                ))
+
+            elif section.startswith('overlay'):
+                image = config.get(section, 'image')
+                if image == 'logo':
+                    image = logo
+
+                if not image:
+                    continue
+
+                above = False
+                if config.has_option(section, 'above'):
+                    above = config.getboolean(section, 'above')
+
+                overlays.append((
+                    placement(
+                        config,
+                        section,
+                        os.path.abspath(os.path.expanduser(image)),
+                        cells,
+                        padding,
+                        Placement.CENTER
+                    ),
+                    above
+                ))
+
+    except (ConfigParser.Error, ValueError) as e:
+        raise LayoutError('{}: {}'.format(path, e))
+
+    missing = set(range(photo_count)) - set(slot.source for slot in slots)
+    if missing:
+        raise LayoutError('{} has no slot for photo {}.'.format(
+            path,
+            ', '.join(str(photo + 1) for photo in sorted(missing))
+        ))
+
+    return Layout(path, width, height, slots, overlays)
@@ -0,0 +1,228 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import re
+
+from PIL import Image, ImageColor
+
+from imaging.buffers import BufferStore
+from imaging.compositor import Compositor
+
+JPEG_QUALITY = 92
+
+# Buffer stores opened by this process, by directory. Worker processes keep
+# theirs between tasks.
+_buffer_stores = {}
+
+
+def parse_color(color):
+    """Convert an ImageMagick color specification to an RGB(A) tuple.
+
+    Pillow understands color names and "rgb(r, g, b)", but not the
+    "rgba(r, g, b, a)" notation with a floating point alpha.
+    """
+    match = re.match(
+        r'rgba\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*([\d.]+)\s*\)$',
+        color.strip()
+    )
+    if match:
+        r, g, b = (int(c) for c in match.groups()[:3])
+        a = int(round(float(match.group(4)) * 255))
+        return r, g, b, a
+
+    return ImageColor.getrgb(color)
+
+
+def buffer_store(directory):
+    """Get this process's BufferStore for directory."""
+    store = _buffer_stores.get(directory)
+    if store is None:
+        store = _buffer_stores[directory] = BufferStore(directory)
+
+    return store
+
+
+# Pillow transpose for each clockwise rotation.
+TRANSPOSE = {
+    90: Image.ROTATE_270,
+    180: Image.ROTATE_180,
+    270: Image.ROTATE_90,
+}
+
+
+def render(image, placement, rotate=None):
+    """Rotate, scale, and crop image for placement.
+
+    Args:
+        image (PIL.Image.Image): image to render.
+        placement (imaging.layout.Placement): where the image goes.
+        rotate (int): rotation to use instead of the placement's.
+    """
+    rotate = placement.rotate if rotate is None else rotate
+    if rotate:
+        image = image.transpose(TRANSPOSE[rotate])
+
+    size = placement.scaled_size(image.size)
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS)
+
+    box = placement.crop_box(image.size)
+    if box:
+        image = image.crop(box)
+
+    return image
+
+
+def decode_photo(src, slot, scale_on_decode=True):
+    """Decode src for slot.
+
+    JPEGs are decoded at the smallest of 1/8, 1/4, 1/2, or full scale that is
+    still at least as big as the slot, so libjpeg skips most of the work, and
+    the memory, of decoding pixels that would be thrown away by the resize.
+    """
+    image = Image.open(src)
+    if scale_on_decode:
+        image.draft('RGB', slot.decode_size())
+
+    return image.convert('RGB')
+
+
+def resize_photo(src, dest, slot, buffer_dir, debug=False):
+    """Decode src, and store it in shared memory as dest, rendered for slot.
+
+    This is a module level function so it can run in a worker process. Only
+    the resized pixels are shared. The decoded photo is not kept in the
+    worker, so each call decodes src again.
+    """
+    image = render(decode_photo(src, slot), slot)
+    buffer_store(buffer_dir).put_image(dest, image)
+    if debug:
+        image.save(dest, 'JPEG', quality=JPEG_QUALITY)
+
+
+class PillowCompositor(Compositor):
+    """Compose prints in-process with Pillow.
+
+    Each photo is decoded once, and rendered for its slot. Resized photos are
+    held in shared memory, keyed by the file name the ImageMagick backend would
+    have written, and only the print is encoded to disk (unless debugging).
+    """
+    def __init__(
+        self,
+        width,
+        height,
+        background_color,
+        logo,
+        cache,
+        buffers,
+        debug=False,
+        layout=None,
+        photo_count=3
+    ):
+        super(PillowCompositor, self).__init__(
+            width,
+            height,
+            background_color,
+            logo,
+            cache,
+            buffers,
+            debug,
+            layout,
+            photo_count
+        )
+        self.color = parse_color(background_color)
+        self.images = {}
+
+    def make_canvas(self, dest):
+        key = self.canvas_key()
+        canvas = self.cache.get_image(key)
+        if canvas is None:
+            canvas = Image.new('RGB', (self.width, self.height), self.color)
+            for overlay in self.layout.canvas_overlays():
+                self.paste(canvas, self.overlay(overlay), overlay)
+
+            self.cache.put_image(key, canvas)
+
+        self.images[dest] = canvas
+
+    def resize(self, src, dest, photo):
+        resize_photo(*self.resize_task(src, dest, photo)[1])
+
+    def resize_task(self, src, dest, photo):
+        # Photos are rendered for their first slot. Any other slot that needs
+        # something different is rendered from that when composing.
+        return resize_photo, (
+            src,
+            dest,
+            self.layout.photo_slots(photo)[0],
+            self.buffers.directory,
+            self.debug
+        )
+
+    def compose(self, photos, canvas, dest):
+        image = self.load(canvas).copy()
+        for slot in self.layout.slots:
+            tile = self.load(photos[slot.source])
+            first = self.layout.photo_slots(slot.source)[0]
+            if not slot.same_render(first):
+                tile = render(tile, slot, (slot.rotate - first.rotate) % 360)
+
+            self.paste(image, tile, slot)
+
+        for overlay in self.layout.top_overlays():
+            self.paste(image, self.overlay(overlay), overlay)
+
+        image.save(dest, 'JPEG', quality=JPEG_QUALITY)
+
+    def overlay(self, placement):
+        """Get an overlay image, decoded and rendered for placement."""
+        key = self.cache.file_key(
+            'overlay',
+            placement.width,
+            placement.height,
+            placement.rotate,
+            placement.fit,
+            placement.source
+        )
+        image = self.cache.get_image(key)
+        if image is None:
+            image = Image.open(placement.source)
+            alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if alpha else 'RGB')
+            image = render(image, placement)
+            self.cache.put_image(key, image)
+
+        return image
+
+    @staticmethod
+    def paste(image, tile, placement):
+        """Paste tile into image, centered in placement's box."""
+        image.paste(
+            tile,
+            placement.position(tile.size),
+            tile if tile.mode == 'RGBA' else None
+        )
+
+    def release(self, names):
+        for name in names:
+            self.buffers.release(name)
+
+    def load(self, name):
+        """Get an intermediate image from memory, or decode it from disk."""
+        image = self.images.get(name)
+        if image is None:
+            image = self.buffers.get_image(name)
+
+        if image is not None:
+            return image
+
+        image = Image.open(name)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+
+        return image
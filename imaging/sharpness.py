@@ -0,0 +1,87 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import numpy
+from PIL import Image
+
+# Frames are scored at this size, or smaller. Blur and blinks still show at
+# this size, and a JPEG can be decoded straight to it.
+SCORE_SIZE = (400, 400)
+
+# Where eyes are, as fractions of the frame (left, top, right, bottom), for
+# guests framed by the countdown's live view.
+EYE_BAND = (0.15, 0.2, 0.85, 0.5)
+
+
+def laplacian(pixels):
+    """4-neighbour Laplacian of a 2D array, without its border."""
+    return (
+        pixels[:-2, 1:-1] +
+        pixels[2:, 1:-1] +
+        pixels[1:-1, :-2] +
+        pixels[1:-1, 2:] -
+        4 * pixels[1:-1, 1:-1]
+    )
+
+
+def score_frame(path, size=SCORE_SIZE):
+    """Measure how sharp a frame is, and how much dark detail there is where
+    eyes would be.
+
+    Sharpness is the variance of the Laplacian, which drops when the frame is
+    blurred by motion or focus. The eye score is the mean of the Laplacian's
+    positive part (small dark features, such as pupils and lashes) in
+    EYE_BAND, which drops when eyes close. Neither means anything on its own;
+    they are compared between frames of the same burst.
+
+    Returns:
+        (sharpness, eye score).
+    """
+    image = Image.open(path)
+    image.draft('L', size)
+    image = image.convert('L')
+    image.thumbnail(size)
+
+    pixels = numpy.asarray(image, dtype=numpy.float32)
+    edges = laplacian(pixels)
+    height, width = edges.shape
+    band = edges[
+        int(height * EYE_BAND[1]):int(height * EYE_BAND[3]),
+        int(width * EYE_BAND[0]):int(width * EYE_BAND[2])
+    ]
+    return float(edges.var()), float(numpy.maximum(band, 0).mean())
+
+
+def pick_best(scores, eye_weight=0.0):
+    """Pick the best frame of a burst.
+
+    Sharpness and eye scores are scaled by the best of each in the burst, and
+    added, with the eye score weighted by eye_weight.
+
+    Args:
+        scores (list): (sharpness, eye score) of each frame, or None for
+            frames that could not be scored.
+        eye_weight (float): weight of the eye score, or 0 to ignore it.
+
+    Returns:
+        index of the best frame, or 0 if no frame was scored.
+    """
+    scored = [
+        (idx, score) for idx, score in enumerate(scores) if score is not None
+    ]
+    if not scored:
+        return 0
+
+    sharpest = max(score[0] for idx, score in scored) or 1.0
+    most_eyes = max(score[1] for idx, score in scored) or 1.0
+    return max(
+        scored,
+        key=lambda item: (
+            item[1][0] / sharpest + eye_weight * item[1][1] / most_eyes
+        )
+    )[0]
@@ -0,0 +1,66 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import io
+
+from PIL import Image
+
+EXIF = 'exif'
+DRAFT = 'draft'
+
+
+def exif_thumbnail(image):
+    """Get the thumbnail embedded in a JPEG's EXIF data, or None.
+
+    The thumbnail is a complete JPEG stored inside the APP1 segment, so it can
+    be found by its start and end of image markers.
+    """
+    for marker, data in getattr(image, 'applist', []):
+        if marker != 'APP1' or not data.startswith(b'Exif'):
+            continue
+
+        start = data.find(b'\xff\xd8', 6)
+        end = data.rfind(b'\xff\xd9')
+        if start < 0 or end < start:
+            return None
+
+        thumbnail = Image.open(io.BytesIO(data[start:end + 2]))
+        thumbnail.load()
+        return thumbnail
+
+    return None
+
+
+def make_thumbnail(src, dest, size):
+    """Write a preview of src that fits in size.
+
+    The embedded EXIF thumbnail is used if it is big enough. Otherwise the JPEG
+    is decoded in draft mode, which lets libjpeg skip most of the work of
+    decoding pixels that would be thrown away.
+
+    Returns:
+        str: EXIF or DRAFT, depending on how the thumbnail was made.
+    """
+    image = Image.open(src)
+    thumbnail = exif_thumbnail(image)
+    if (
+        thumbnail is not None and
+        thumbnail.size[0] >= size[0] and
+        thumbnail.size[1] >= size[1]
+    ):
+        method = EXIF
+        image = thumbnail
+
+    else:
+        method = DRAFT
+        image.draft('RGB', size)
+
+    image = image.convert('RGB')
+    image.thumbnail(size, Image.LANCZOS)
+    image.save(dest, 'JPEG', quality=85)
+    return method
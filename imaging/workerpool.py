@@ -0,0 +1,120 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import collections
+import multiprocessing
+import threading
+import time
+import traceback
+
+# Rough peak memory needed to decode and resize one camera photo.
+MEMORY_PER_WORKER = 150 * 1024 * 1024
+
+# Number of recent task latencies kept. The photobooth runs for the whole
+# event, so they can not all be kept.
+LATENCY_HISTORY = 1000
+
+
+def available_memory():
+    """Available memory in bytes, or None if it is unknown."""
+    try:
+        with open('/proc/meminfo') as fp:
+            for line in fp:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+
+    except (IOError, OSError):
+        pass
+
+    return None
+
+
+def default_workers():
+    """One worker per core, as long as there is memory for them."""
+    workers = multiprocessing.cpu_count()
+    memory = available_memory()
+    if memory is not None:
+        workers = min(workers, memory // MEMORY_PER_WORKER)
+
+    return max(1, workers)
+
+
+def _run_task(function, args, submitted):
+    """Run a task in a worker, and report how long it waited and ran."""
+    started = time.time()
+    try:
+        result = function(*args)
+        error = None
+
+    except Exception:
+        result = None
+        error = traceback.format_exc()
+
+    return result, error, started - submitted, time.time() - started
+
+
+class WorkerPool(object):
+    """Pool of worker processes for CPU-bound image work.
+
+    The pool is created once at startup, before any UI, so forking workers
+    does not copy the UI's state, and each task skips the cost of starting a
+    process. Python threads can not decode images on more than one core at a
+    time, worker processes can.
+
+    Tasks must be module level functions, so they can be sent to a worker.
+    Results go to a callback, called from the pool's result thread.
+    """
+    def __init__(self, workers=None):
+        """
+        Args:
+            workers (int): number of worker processes. Defaults to
+                default_workers().
+        """
+        self.workers = workers or default_workers()
+        self.pool = multiprocessing.Pool(self.workers)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.latencies = collections.deque(maxlen=LATENCY_HISTORY)
+
+    def submit(self, function, args, callback):
+        """Run function(*args) in a worker.
+
+        Args:
+            function: module level function.
+            args (tuple): arguments to pass to function.
+            callback: called with (result, error, latency, run time) when the
+                task is done. error is a formatted traceback, or None.
+                latency is how long the task waited for a worker.
+        """
+        with self.lock:
+            self.pending += 1
+
+        def done(outcome):
+            with self.lock:
+                self.pending -= 1
+                self.latencies.append(outcome[2])
+
+            callback(*outcome)
+
+        self.pool.apply_async(
+            _run_task,
+            (function, args, time.time()),
+            callback=done
+        )
+
+    def depth(self):
+        """Number of tasks submitted that have not finished."""
+        with self.lock:
+            return self.pending
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self):
+        self.pool.terminate()
@@ -12,7 +12,13 @@ import os
 
 import datetime
 
-from ui.photoboothapp import PhotoboothApp
+from camera.backend import Camera
+from camera.framesources import FrameSource
+from imaging.compositor import Compositor
+from imaging.workerpool import WorkerPool
+from pipeline.asynclog import install as install_logging, parse_levels
+from pipeline.startup import StartupTimer
+from printer.backend import Printer
 
 
 class PhotoboothSettings(object):
@@ -27,7 +33,28 @@ class PhotoboothSettings(object):
         logo,
         printer,
         image_width,
-        image_height
+        image_height,
+        compositor,
+        camera,
+        timing_log,
+        print_backend,
+        max_print_jobs,
+        save_raw,
+        debug_intermediates,
+        workers,
+        layout,
+        camera_profile,
+        camera_storage,
+        camera_card_folder,
+        burst,
+        burst_eye_weight,
+        viewfinder,
+        viewfinder_device,
+        viewfinder_fps,
+        measure_startup,
+        journal,
+        log_file,
+        log_levels
     ):
         self.skip_select = skip_select
         if save:
@@ -48,6 +75,43 @@ class PhotoboothSettings(object):
         self.printer = printer
         self.image_width = image_width
         self.image_height = image_height
+        self.compositor = compositor
+        self.camera = camera
+        self.timing_log = (
+            os.path.abspath(os.path.expanduser(timing_log))
+            if timing_log else
+            timing_log
+        )
+        self.print_backend = print_backend
+        self.max_print_jobs = max_print_jobs
+        self.save_raw = save_raw
+        self.debug_intermediates = debug_intermediates
+        self.workers = workers
+        self.layout = (
+            os.path.abspath(os.path.expanduser(layout))
+            if layout else
+            layout
+        )
+        self.camera_profile = camera_profile
+        self.camera_storage = camera_storage
+        self.camera_card_folder = camera_card_folder
+        self.burst = burst
+        self.burst_eye_weight = burst_eye_weight
+        self.viewfinder = viewfinder
+        self.viewfinder_device = viewfinder_device
+        self.viewfinder_fps = viewfinder_fps
+        self.measure_startup = measure_startup
+        self.journal = (
+            os.path.abspath(os.path.expanduser(journal))
+            if journal else
+            journal
+        )
+        self.log_file = (
+            os.path.abspath(os.path.expanduser(log_file))
+            if log_file else
+            log_file
+        )
+        self.log_levels = log_levels
 
 
 def parse_command_line():
@@ -74,6 +138,12 @@ def parse_command_line():
              'this flag is not specified. A new directory titled '
              'photobooth_<timestamp> will be added to the specified directory.'
     )
+    parser.add_argument(
+        '--save-raw',
+        action='store_true',
+        help='Save the photos from the camera alongside the composite photos '
+             '(requires --save).'
+    )
     parser.add_argument(
         '--initial-wait-time',
         type=int,
@@ -119,6 +189,153 @@ def parse_command_line():
         help='Final image height in pixels. Use a dimension that works best '
              'for your photo printer.'
     )
+    parser.add_argument(
+        '--compositor',
+        default=None,
+        choices=Compositor.BACKENDS,
+        help='Image processing backend used to compose the print. "pillow" '
+             'works in memory, "imagemagick" runs the ImageMagick command '
+             'line tools.'
+    )
+    parser.add_argument(
+        '--debug-intermediates',
+        action='store_true',
+        help='Write the resized photos to disk, in the session '
+             'directory, as well as keeping them in memory.'
+    )
+    parser.add_argument(
+        '--camera',
+        default=None,
+        choices=Camera.BACKENDS,
+        help='Camera backend. "gphoto2" uses a tethered camera, "fake" '
+             'generates test photos so the photobooth can run without a '
+             'camera.'
+    )
+    parser.add_argument(
+        '--timing-log',
+        default=None,
+        help='Append a JSON line with the timeline of each session to this '
+             'file. Summarize it with timing_report.py. Timings are not '
+             'recorded if this is empty, which is the default.'
+    )
+    parser.add_argument(
+        '--print-backend',
+        default=None,
+        choices=Printer.BACKENDS,
+        help='How to print. "cups" prints to the CUPS printer named by '
+             '--printer. "file" writes print jobs to the directory named by '
+             '--printer, for testing without a printer.'
+    )
+    parser.add_argument(
+        '--max-print-jobs',
+        type=int,
+        default=None,
+        help='Hold prints back while this many jobs are already at the '
+             'printer. At least 1.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of processes that decode and resize photos. 0 picks one '
+             'per core, as long as there is enough memory.'
+    )
+    parser.add_argument(
+        '--layout',
+        default=None,
+        help='Print layout definition. See layouts/classic.cfg for the format. '
+             'Uses layouts/classic.cfg if this is empty.'
+    )
+    parser.add_argument(
+        '--camera-profile',
+        default=None,
+        help='Camera profile from camera_profiles.cfg to apply when the camera '
+             'is opened. "auto" picks the smallest profile the layout can '
+             'use. The camera settings are left alone if this is empty, which '
+             'is the default.'
+    )
+    parser.add_argument(
+        '--camera-storage',
+        default=None,
+        choices=Camera.STORAGE_MODES,
+        help='Where the camera keeps photos. "ram" skips writing them to the '
+             'memory card, so they download sooner. "both" also copies them '
+             'to the card while the camera is idle, which can hold up live '
+             'view frames while it runs.'
+    )
+    parser.add_argument(
+        '--camera-card-folder',
+        default=None,
+        help='Folder on the camera that --camera-storage both copies photos '
+             'to, e.g. /store_00020001 for the SD card of a Canon.'
+    )
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=None,
+        help='Photos to take, back to back, for each photo of a session. The '
+             'sharpest is kept. Needs NumPy if it is more than 1.'
+    )
+    parser.add_argument(
+        '--burst-eye-weight',
+        type=float,
+        default=None,
+        help='How much open eyes count for, against sharpness, when picking '
+             'from a burst, e.g. 1 for as much. Eyes are ignored if this is '
+             '0.'
+    )
+    parser.add_argument(
+        '--viewfinder',
+        default=None,
+        choices=FrameSource.SOURCES,
+        help='Live view shown behind the countdown. "camera" streams preview '
+             'frames from the camera, "v4l2" from the MJPEG webcam named by '
+             '--viewfinder-device, and "synthetic" generates test frames. '
+             'There is no live view if this is empty, which is the default.'
+    )
+    parser.add_argument(
+        '--viewfinder-device',
+        default=None,
+        help='V4L2 device for --viewfinder v4l2.'
+    )
+    parser.add_argument(
+        '--viewfinder-fps',
+        type=int,
+        default=None,
+        help='Frame rate to show the live view at.'
+    )
+    parser.add_argument(
+        '--measure-startup',
+        action='store_true',
+        help='Print how long each phase of startup took, and exit once '
+             'everything has started.'
+    )
+    parser.add_argument(
+        '--journal',
+        default=None,
+        help='Directory to journal sessions in, so sessions that were not '
+             'printed when the photobooth stopped or crashed are printed when '
+             'it starts again. A full size copy of every photo is kept there '
+             'until its session is done, and failed sessions are kept, so it '
+             'needs room for them. Sessions are not journaled if this is '
+             'empty, which is the default.'
+    )
+    parser.add_argument(
+        '--log-file',
+        default=None,
+        help='Write the log to this file from a background thread, in '
+             'batches, and only show warnings and errors on the console. The '
+             'recent history is dumped next to it when an error is logged, or '
+             'on a crash. Kivy writes the log itself if this is empty, which '
+             'is the default.'
+    )
+    parser.add_argument(
+        '--log-levels',
+        default=None,
+        help='Lowest level written to --log-file for each module, as '
+             '"module=level,...", e.g. "default=info,screens=warning". '
+             'Modules are named by their file name.'
+    )
 
     args = parser.parse_args()
     if args.config:
@@ -167,14 +384,141 @@ def parse_command_line():
             args.image_height
             if args.image_height is not None else
             config.get('photobooth', 'image-height')
+        ),
+        compositor=(
+            args.compositor
+            if args.compositor is not None else
+            config.get('photobooth', 'compositor')
+        ),
+        camera=(
+            args.camera
+            if args.camera is not None else
+            config.get('photobooth', 'camera')
+        ),
+        timing_log=(
+            args.timing_log
+            if args.timing_log is not None else
+            config.get('photobooth', 'timing-log')
+        ),
+        print_backend=(
+            args.print_backend
+            if args.print_backend is not None else
+            config.get('photobooth', 'print-backend')
+        ),
+        max_print_jobs=(
+            args.max_print_jobs
+            if args.max_print_jobs is not None else
+            config.getint('photobooth', 'max-print-jobs')
+        ),
+        save_raw=(
+            args.save_raw or
+            config.getboolean('photobooth', 'save-raw')
+        ),
+        debug_intermediates=(
+            args.debug_intermediates or
+            config.getboolean('photobooth', 'debug-intermediates')
+        ),
+        workers=(
+            args.workers
+            if args.workers is not None else
+            config.getint('photobooth', 'workers')
+        ),
+        layout=(
+            args.layout
+            if args.layout is not None else
+            config.get('photobooth', 'layout')
+        ),
+        camera_profile=(
+            args.camera_profile
+            if args.camera_profile is not None else
+            config.get('photobooth', 'camera-profile')
+        ),
+        camera_storage=(
+            args.camera_storage
+            if args.camera_storage is not None else
+            config.get('photobooth', 'camera-storage')
+        ),
+        camera_card_folder=(
+            args.camera_card_folder
+            if args.camera_card_folder is not None else
+            config.get('photobooth', 'camera-card-folder')
+        ),
+        burst=(
+            args.burst
+            if args.burst is not None else
+            config.getint('photobooth', 'burst')
+        ),
+        burst_eye_weight=(
+            args.burst_eye_weight
+            if args.burst_eye_weight is not None else
+            config.getfloat('photobooth', 'burst-eye-weight')
+        ),
+        viewfinder=(
+            args.viewfinder
+            if args.viewfinder is not None else
+            config.get('photobooth', 'viewfinder')
+        ),
+        viewfinder_device=(
+            args.viewfinder_device
+            if args.viewfinder_device is not None else
+            config.get('photobooth', 'viewfinder-device')
+        ),
+        viewfinder_fps=(
+            args.viewfinder_fps
+            if args.viewfinder_fps is not None else
+            config.getint('photobooth', 'viewfinder-fps')
+        ),
+        measure_startup=(
+            args.measure_startup or
+            config.getboolean('photobooth', 'measure-startup')
+        ),
+        journal=(
+            args.journal
+            if args.journal is not None else
+            config.get('photobooth', 'journal')
+        ),
+        log_file=(
+            args.log_file
+            if args.log_file is not None else
+            config.get('photobooth', 'log-file')
+        ),
+        log_levels=(
+            args.log_levels
+            if args.log_levels is not None else
+            config.get('photobooth', 'log-levels')
         )
-
     )
 
 
 def main():
-    settings = parse_command_line()
-    PhotoboothApp(settings).run()
+    startup = StartupTimer()
+    # Kivy reads its own options from the command line when it is imported,
+    # so it is imported before the settings are parsed.
+    with startup.phase('import kivy'):
+        import kivy.app
+
+    with startup.phase('import photobooth'):
+        from ui.photoboothapp import PhotoboothApp
+
+    with startup.phase('settings'):
+        settings = parse_command_line()
+
+    # Fork the workers before the log writer thread starts, so no worker is
+    # forked while that thread holds a lock.
+    with startup.phase('worker pool'):
+        worker_pool = WorkerPool(settings.workers or None)
+
+    if settings.log_file:
+        from kivy.logger import Logger
+
+        with startup.phase('logging'):
+            install_logging(
+                Logger,
+                settings.log_file,
+                parse_levels(settings.log_levels)
+            )
+
+    PhotoboothApp(settings, startup, worker_pool).run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,198 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import Queue
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from kivy.logger import Logger
+
+
+class ArchiveWriter(object):
+    """Background writer for saved photos.
+
+    Files are copied to a temporary name in the archive directory, and renamed
+    into place once they have been synced, so a crash never leaves a partial
+    photo behind. Syncing is batched, because every fsync on an SD card or USB
+    stick is slow. The queue is bounded, so a slow card holds up the print
+    queue instead of filling memory.
+    """
+    def __init__(self, directory, max_backlog=8, batch_size=4):
+        """
+        Args:
+            directory (str): archive directory.
+            max_backlog (int): most requests to queue before save() blocks.
+            batch_size (int): most files to write between syncs.
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.requests = Queue.Queue(maxsize=max_backlog)
+        self.batch = []
+        self.bytes_written = 0
+        self.busy_time = 0.0
+        self.worker = threading.Thread(target=self.run, name='archive writer')
+        self.worker.daemon = True
+
+    def start(self):
+        Logger.info('ArchiveWriter: start().')
+        self.worker.start()
+
+    def stop(self):
+        """Write everything queued so far, then stop."""
+        Logger.info('ArchiveWriter: stop().')
+        self.requests.put(None)
+        self.worker.join()
+
+    def save(self, src, name):
+        """Queue src to be copied into the archive as name.
+
+        If name is taken, a counter is added to it. src must not be removed
+        until a callback queued after it with then() has been called.
+        """
+        self.requests.put(('save', src, name))
+
+    def then(self, callback):
+        """Call callback from the writer thread once everything queued so far
+        is safely on disk.
+        """
+        self.requests.put(('then', callback))
+
+    def backlog(self):
+        """Number of requests waiting to be written."""
+        return self.requests.qsize() + len(self.batch)
+
+    def throughput(self):
+        """Average write speed in bytes per second."""
+        return self.bytes_written / self.busy_time if self.busy_time else 0.0
+
+    def run(self):
+        while True:
+            try:
+                # Flush a partial batch as soon as the writer goes idle.
+                request = self.requests.get(
+                    timeout=0.5 if self.batch else None
+                )
+
+            except Queue.Empty:
+                self.flush()
+                continue
+
+            if request is None:
+                self.flush()
+                break
+
+            if request[0] == 'save':
+                _, src, name = request
+                try:
+                    self.write(src, name)
+
+                except Exception:
+                    Logger.exception('ArchiveWriter: failed to save %s.', src)
+
+                if len(self.batch) >= self.batch_size:
+                    self.flush()
+
+            else:
+                self.flush()
+                try:
+                    request[1]()
+
+                except Exception:
+                    Logger.exception('ArchiveWriter: callback failed.')
+
+    def write(self, src, name):
+        start = time.time()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            os.chmod(tmp, 0o644)
+            with os.fdopen(fd, 'wb') as dest, open(src, 'rb') as fp:
+                shutil.copyfileobj(fp, dest)
+
+        except Exception:
+            os.remove(tmp)
+            raise
+
+        self.batch.append((tmp, name))
+        self.busy_time += time.time() - start
+        self.bytes_written += os.path.getsize(tmp)
+
+    def flush(self):
+        """Sync the batch, and rename it into place.
+
+        If that fails (e.g. the disk is full, or gone), the batch is dropped,
+        and the writer carries on, so save() and stop() are never left
+        waiting on a dead thread.
+        """
+        if not self.batch:
+            return
+
+        try:
+            self.sync_batch()
+
+        except Exception:
+            Logger.exception(
+                'ArchiveWriter: failed to save %s files.',
+                len(self.batch)
+            )
+            for tmp, _ in self.batch:
+                try:
+                    os.remove(tmp)
+
+                except OSError:
+                    pass
+
+            self.batch = []
+
+    def sync_batch(self):
+        start = time.time()
+        for tmp, _ in self.batch:
+            fd = os.open(tmp, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+
+            finally:
+                os.close(fd)
+
+        for tmp, name in self.batch:
+            dest = self.unique_name(name)
+            os.rename(tmp, dest)
+            Logger.info('ArchiveWriter: saved %s.', dest)
+
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+
+        finally:
+            os.close(fd)
+
+        self.busy_time += time.time() - start
+        Logger.info(
+            'ArchiveWriter: synced %s files in %.3fs. %.1f MB/s, backlog %s.',
+            len(self.batch),
+            time.time() - start,
+            self.throughput() / (1024 * 1024),
+            self.requests.qsize()
+        )
+        self.batch = []
+
+    def unique_name(self, name):
+        """Path in the archive for name that does not overwrite anything."""
+        base, ext = os.path.splitext(name)
+        dest = os.path.join(self.directory, name)
+        counter = 1
+        while os.path.exists(dest):
+            dest = os.path.join(
+                self.directory,
+                '{}_{}{}'.format(base, counter, ext)
+            )
+            counter += 1
+
+        return dest
@@ -0,0 +1,240 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import atexit
+import collections
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+
+FORMAT = '%(asctime)s [%(levelname)-7s] %(module)s: %(message)s'
+
+
+def parse_levels(text):
+    """Parse "module=level,..." into a dict of module to level number.
+
+    The module "default" sets the level of every module not listed.
+    """
+    levels = {}
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+
+        module, _, level = item.partition('=')
+        number = logging.getLevelName(level.strip().upper())
+        if not isinstance(number, int):
+            raise ValueError('Unknown log level "{}".'.format(level))
+
+        levels[module.strip()] = number
+
+    return levels
+
+
+class AsyncLogHandler(logging.Handler):
+    """Logging handler that keeps the caller off the disk.
+
+    emit() only appends the record to an in-memory ring buffer. A writer
+    thread formats the records, and writes them to the log file in batches,
+    every flush_interval seconds. If records come in faster than they can be
+    written, the oldest are dropped, and counted, rather than holding up the
+    caller. Records are formatted when they are written, so arguments should
+    not be changed after they are logged.
+
+    Every record, including those below their module's level, is also kept in
+    a history of the most recent records. When an error is logged, or the
+    process crashes, the history is dumped to a file next to the log, so the
+    lead-up to the error is on disk even if it was not worth writing at the
+    time.
+    """
+    def __init__(
+        self,
+        path,
+        levels=None,
+        capacity=10000,
+        history=2000,
+        flush_interval=1.0,
+        dump_interval=60.0
+    ):
+        """
+        Args:
+            path (str): log file.
+            levels (dict): module name to the lowest level written for it.
+                "default" applies to other modules, and defaults to INFO.
+            capacity (int): most records waiting to be written.
+            history (int): most recent records kept for dumps.
+            flush_interval (float): seconds between writes.
+            dump_interval (float): least seconds between dumps for errors, so
+                a burst of errors does not fill the disk with dumps.
+        """
+        super(AsyncLogHandler, self).__init__(logging.DEBUG)
+        self.path = path
+        self.levels = dict(levels or {})
+        self.default_level = self.levels.pop('default', logging.INFO)
+        self.pending = collections.deque(maxlen=capacity)
+        self.history = collections.deque(maxlen=history)
+        self.dropped = 0
+        self.dump_requested = False
+        self.last_dump = None
+        self.flush_interval = flush_interval
+        self.dump_interval = dump_interval
+        self.wake = threading.Event()
+        self.stopped = False
+        self.setFormatter(logging.Formatter(FORMAT))
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.fp = open(path, 'a')
+        self.writer = threading.Thread(target=self.run, name='log writer')
+        self.writer.daemon = True
+        self.writer.start()
+
+    def level_of(self, module):
+        return self.levels.get(module, self.default_level)
+
+    def emit(self, record):
+        # deque appends are atomic, so no lock is needed.
+        self.history.append(record)
+        if record.levelno >= self.level_of(record.module):
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+
+            self.pending.append(record)
+
+        if record.levelno >= logging.ERROR:
+            if record.exc_info and not record.exc_text:
+                # The traceback is gone once the except block is left.
+                record.exc_text = self.formatter.formatException(
+                    record.exc_info
+                )
+
+            self.dump_requested = True
+            self.wake.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.write_pending()
+            if self.dump_requested:
+                self.dump_requested = False
+                if (
+                    self.last_dump is None or
+                    time.time() - self.last_dump >= self.dump_interval
+                ):
+                    self.dump('error')
+
+    def write_pending(self):
+        records = []
+        while self.pending:
+            records.append(self.pending.popleft())
+
+        if not records and not self.dropped:
+            return
+
+        lines = [self.format_record(record) for record in records]
+        if self.dropped:
+            lines.append('{} [WARNING] asynclog: dropped {} records.'.format(
+                datetime.datetime.now(),
+                self.dropped
+            ))
+            self.dropped = 0
+
+        self.fp.write('\n'.join(lines) + '\n')
+        self.fp.flush()
+
+    def format_record(self, record):
+        try:
+            return self.format(record)
+
+        except Exception:
+            return '{} [ERROR  ] asynclog: failed to format {!r}.'.format(
+                datetime.datetime.now(),
+                record.msg
+            )
+
+    def dump(self, reason):
+        """Write the recent history to its own file.
+
+        Returns:
+            path of the dump.
+        """
+        path = '{}.{}-{}.dump'.format(
+            self.path,
+            reason,
+            datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        )
+        lines = [self.format_record(record) for record in list(self.history)]
+        with open(path, 'w') as fp:
+            fp.write('\n'.join(lines) + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        self.last_dump = time.time()
+        return path
+
+    def close(self):
+        """Write everything that is waiting, and stop the writer."""
+        if not self.stopped:
+            self.stopped = True
+            self.wake.set()
+            self.writer.join()
+            self.write_pending()
+            self.fp.close()
+
+        super(AsyncLogHandler, self).close()
+
+
+def install(logger, path, levels):
+    """Send logger's records through an AsyncLogHandler.
+
+    Handlers that write to files are replaced. Console handlers are kept, but
+    only get warnings and errors, because writing to a console is as slow as
+    writing to a file. Uncaught exceptions dump the history before the process
+    exits.
+
+    Returns:
+        the handler.
+    """
+    handler = AsyncLogHandler(path, levels)
+    for old in list(logger.handlers):
+        if (
+            isinstance(old, logging.StreamHandler) and
+            not isinstance(old, logging.FileHandler)
+        ):
+            old.setLevel(max(old.level, logging.WARNING))
+
+        else:
+            logger.removeHandler(old)
+
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+
+    previous_hook = sys.excepthook
+
+    def excepthook(*exc_info):
+        logger.critical('Uncaught exception.', exc_info=exc_info)
+        handler.dump('crash')
+        previous_hook(*exc_info)
+
+    sys.excepthook = excepthook
+    atexit.register(handler.close)
+    return handler
+
+
+def measure_overhead(logger, count=10000):
+    """Mean seconds per logger.info() call, as seen by the caller."""
+    start = time.time()
+    for idx in range(count):
+        logger.info('Overhead: call %s of %s, %.3fs.', idx, count, 0.5)
+
+    return (time.time() - start) / count
@@ -0,0 +1,67 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import os
+import time
+
+from kivy.logger import Logger
+
+from imaging.sharpness import SCORE_SIZE, pick_best, score_frame
+from pipeline.jobs import PoolJob
+
+
+def keep_best_frame(pool, frames, dest, eye_weight=0.0, timeline=None):
+    """Score the frames of a burst in the worker pool, move the best one to
+    dest, and delete the rest.
+
+    Returns:
+        dict with the index of the frame kept, the score of every frame, and
+        the time taken to pick it, in seconds.
+    """
+    start = time.time()
+    jobs = [
+        PoolJob(
+            pool,
+            'score',
+            score_frame,
+            (frame, SCORE_SIZE),
+            timeline,
+            os.path.basename(frame)
+        )
+        for frame in frames
+    ]
+    scores = [job.result if job.wait() == 0 else None for job in jobs]
+    best = pick_best(scores, eye_weight)
+
+    os.rename(frames[best], dest)
+    for idx, frame in enumerate(frames):
+        if idx != best and os.path.exists(frame):
+            os.remove(frame)
+
+    end = time.time()
+    elapsed = end - start
+    if timeline:
+        timeline.record(
+            'pick frame',
+            start,
+            end,
+            detail=os.path.basename(dest)
+        )
+
+    Logger.info(
+        'Burst: kept frame %s of %s for %s in %.3fs. Scores: %s.',
+        best + 1,
+        len(frames),
+        os.path.basename(dest),
+        elapsed,
+        ', '.join(
+            '{:.0f}/{:.2f}'.format(*score) if score else 'failed'
+            for score in scores
+        )
+    )
+    return {'frame': best, 'scores': scores, 'elapsed': elapsed}
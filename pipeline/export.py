@@ -0,0 +1,519 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import cgi
+import collections
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from kivy.logger import Logger
+
+from imaging.assetcache import AssetCache
+from imaging.contactsheet import make_contact_sheet
+from imaging.thumbnails import make_thumbnail
+from pipeline.jobs import PoolJob, ThreadJob
+from pipeline.session import Session
+from pipeline.timing import Timeline
+
+# Names the archive writer saves a session's files under.
+RAW_PHOTO = re.compile(r'^(session_\d{8}_\d{6}_\d+)_photo(\d+)\.jpg$')
+COMPOSITE = re.compile(r'^(session_\d{8}_\d{6}_\d+)\.jpg$')
+
+# Gallery index page.
+INDEX = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Photobooth</title>
+<style>
+body {{ margin: 0; padding: 8px; background: #222; }}
+img {{ margin: 4px; max-width: 100%; }}
+</style>
+</head>
+<body>
+<!-- {count} prints -->
+{items}
+</body>
+</html>
+"""
+
+
+class ArchivedSession(object):
+    """Files saved for one session by photobooth.py --save."""
+    def __init__(self, name):
+        self.name = name
+        self.composite = None
+        self.photos = {}
+
+    def __str__(self):
+        return self.name
+
+    def raw_photos(self, count):
+        """Paths of the photos saved with --save-raw, in the order they were
+        taken, or None if any of them are missing.
+        """
+        if set(self.photos) != set(range(count)):
+            return None
+
+        return [self.photos[idx] for idx in range(count)]
+
+
+def find_sessions(directories):
+    """Find the sessions saved in directories, and their subdirectories.
+
+    Returns:
+        list of ArchivedSession, in the order they were taken.
+    """
+    sessions = {}
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                match = RAW_PHOTO.match(name)
+                if match:
+                    session = sessions.setdefault(
+                        match.group(1),
+                        ArchivedSession(match.group(1))
+                    )
+                    session.photos[int(match.group(2)) - 1] = os.path.join(
+                        root,
+                        name
+                    )
+                    continue
+
+                match = COMPOSITE.match(name)
+                if match:
+                    session = sessions.setdefault(
+                        match.group(1),
+                        ArchivedSession(match.group(1))
+                    )
+                    session.composite = os.path.join(root, name)
+
+    return [sessions[name] for name in sorted(sessions)]
+
+
+class Manifest(object):
+    """What each output in a directory was made from.
+
+    An output is only made again if anything that went into it has changed,
+    so a run that is repeated, or was interrupted, only does the work that is
+    left. The manifest is saved after every output.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'manifest.json')
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as fp:
+                self.entries = json.load(fp)
+
+    @staticmethod
+    def key(parts, files):
+        """Make a key from settings, and the paths, sizes, and modified times
+        of input files.
+        """
+        return AssetCache.key(*(
+            tuple(parts) +
+            tuple(
+                '{}:{}:{}'.format(
+                    path,
+                    os.path.getsize(path),
+                    os.path.getmtime(path)
+                )
+                for path in files
+            )
+        ))
+
+    def fresh(self, name, key):
+        """Whether output name exists, and was made from key."""
+        with self.lock:
+            return (
+                self.entries.get(name) == key and
+                os.path.exists(os.path.join(self.directory, name))
+            )
+
+    def update(self, name, key):
+        with self.lock:
+            self.entries[name] = key
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(self.entries, fp, indent=1, sort_keys=True)
+
+            os.rename(tmp, self.path)
+
+
+def temporary_name(dest):
+    """Name to write dest under until it is complete, with the same
+    extension, so backends that go by the extension still work.
+    """
+    directory, name = os.path.split(dest)
+    return os.path.join(directory, '.{}.tmp{}'.format(
+        name,
+        os.path.splitext(name)[1]
+    ))
+
+
+class Progress(object):
+    """Counts of outputs made, skipped, and failed."""
+    def __init__(self, task):
+        self.task = task
+        self.made = 0
+        self.skipped = 0
+        self.failed = 0
+        self.start = time.time()
+
+    def report(self):
+        Logger.info(
+            'Export: %s made %s, skipped %s unchanged, %s failed, in %.1fs.',
+            self.task,
+            self.made,
+            self.skipped,
+            self.failed,
+            time.time() - self.start
+        )
+
+
+def resize_photos(compositor, pool, photos, resized, timeline):
+    """Start resizing photos for their slots, the same way the photobooth
+    does.
+
+    Args:
+        photos (list): raw photos, in the order they were taken.
+        resized (list): names of the resized photos.
+
+    Returns:
+        list of jobs, one per photo.
+    """
+    jobs = []
+    for idx, (photo, dest) in enumerate(zip(photos, resized)):
+        task = compositor.resize_task(photo, dest, idx)
+        if task:
+            jobs.append(PoolJob(
+                pool,
+                'resize',
+                task[0],
+                task[1],
+                timeline,
+                os.path.basename(photo)
+            ))
+
+        else:
+            jobs.append(ThreadJob(
+                timeline.timed(
+                    'resize',
+                    compositor.resize,
+                    os.path.basename(photo)
+                ),
+                photo,
+                dest,
+                idx
+            ))
+
+    return jobs
+
+
+def compose_sessions(compositor, pool, sessions, output, settings, work):
+    """Rebuild the composites of sessions from their raw photos.
+
+    Photos are resized in the worker pool, a few sessions ahead, while
+    composites are composed in this thread, so the workers are kept busy
+    without holding every session's photos in memory at once.
+
+    Args:
+        compositor (imaging.compositor.Compositor): composes the prints.
+        pool (imaging.workerpool.WorkerPool): resizes the photos.
+        sessions (list): ArchivedSessions to compose.
+        output (str): directory to write composites to.
+        settings (tuple): everything else that changes the composites.
+        work (str): directory for the canvas, and the resized photos.
+
+    Returns:
+        Progress.
+    """
+    progress = Progress('compose')
+    manifest = Manifest(output)
+    canvas = os.path.join(work, 'canvas.jpg')
+    compositor.make_canvas(canvas)
+
+    in_flight = collections.deque()
+    for session in sessions:
+        photos = session.raw_photos(Session.PHOTO_COUNT)
+        if photos is None:
+            Logger.warning(
+                'Export: %s has no raw photos. Was it saved with --save-raw?',
+                session
+            )
+            progress.failed += 1
+            continue
+
+        name = '{}.jpg'.format(session.name)
+        key = Manifest.key(settings, photos)
+        if manifest.fresh(name, key):
+            progress.skipped += 1
+            continue
+
+        # Intermediates are kept out of the archive.
+        resized = [
+            os.path.join(work, '{}_{}.jpg'.format(session.name, idx))
+            for idx in range(len(photos))
+        ]
+        jobs = resize_photos(
+            compositor,
+            pool,
+            photos,
+            resized,
+            Timeline(session.name)
+        )
+        in_flight.append((name, key, resized, jobs))
+        if len(in_flight) > pool.workers:
+            finish_composite(
+                compositor,
+                canvas,
+                output,
+                manifest,
+                progress,
+                *in_flight.popleft()
+            )
+
+    while in_flight:
+        finish_composite(
+            compositor,
+            canvas,
+            output,
+            manifest,
+            progress,
+            *in_flight.popleft()
+        )
+
+    progress.report()
+    return progress
+
+
+def finish_composite(
+    compositor,
+    canvas,
+    output,
+    manifest,
+    progress,
+    name,
+    key,
+    resized,
+    jobs
+):
+    """Compose a session once its photos have been resized."""
+    try:
+        for job in jobs:
+            if job.wait() != 0:
+                raise job.error
+
+        dest = os.path.join(output, name)
+        compositor.compose(resized, canvas, temporary_name(dest))
+        os.rename(temporary_name(dest), dest)
+        manifest.update(name, key)
+        progress.made += 1
+        Logger.info('Export: composed %s.', dest)
+
+    except Exception:
+        Logger.exception('Export: failed to compose %s.', name)
+        progress.failed += 1
+
+    finally:
+        compositor.release(resized)
+
+
+def export_gallery(pool, sessions, output, size, thumbnail_size):
+    """Write web sized copies of the composites, thumbnails of them, and an
+    index page that links them.
+
+    Args:
+        pool (imaging.workerpool.WorkerPool): scales the composites.
+        sessions (list): ArchivedSessions to export.
+        output (str): gallery directory.
+        size (int): longest side of the web sized copies.
+        thumbnail_size (int): longest side of the thumbnails.
+
+    Returns:
+        Progress.
+    """
+    progress = Progress('gallery')
+    manifest = Manifest(output)
+    for directory in ('web', 'thumbnails'):
+        if not os.path.exists(os.path.join(output, directory)):
+            os.makedirs(os.path.join(output, directory))
+
+    sessions = [session for session in sessions if session.composite]
+    jobs = []
+    for session in sessions:
+        for directory, longest in (
+            ('web', size),
+            ('thumbnails', thumbnail_size)
+        ):
+            name = os.path.join(directory, '{}.jpg'.format(session.name))
+            key = Manifest.key(('gallery', longest), [session.composite])
+            if manifest.fresh(name, key):
+                progress.skipped += 1
+                continue
+
+            dest = os.path.join(output, name)
+            jobs.append((
+                name,
+                key,
+                dest,
+                PoolJob(
+                    pool,
+                    'scale',
+                    make_thumbnail,
+                    (
+                        session.composite,
+                        temporary_name(dest),
+                        (longest, longest)
+                    ),
+                    detail=session.name
+                )
+            ))
+
+    for name, key, dest, job in jobs:
+        if job.wait() != 0:
+            progress.failed += 1
+            continue
+
+        os.rename(temporary_name(dest), dest)
+        manifest.update(name, key)
+        progress.made += 1
+
+    write_index(output, sessions)
+    progress.report()
+    return progress
+
+
+def write_index(output, sessions):
+    """Write the gallery's index page, with the sessions that were exported."""
+    items = []
+    for session in sessions:
+        name = '{}.jpg'.format(session.name)
+        if not all(
+            os.path.exists(os.path.join(output, directory, name))
+            for directory in ('web', 'thumbnails')
+        ):
+            continue
+
+        name = cgi.escape(name, quote=True)
+        items.append(
+            '<a href="web/{name}"><img src="thumbnails/{name}" '
+            'alt="{title}"></a>'.format(
+                name=name,
+                title=cgi.escape(session.name, quote=True)
+            )
+        )
+
+    with open(os.path.join(output, 'index.html'), 'w') as fp:
+        fp.write(INDEX.format(count=len(items), items='\n'.join(items)))
+
+
+def export_contact_sheets(
+    pool,
+    sessions,
+    output,
+    size,
+    columns,
+    rows,
+    background_color
+):
+    """Write pages of composites in a grid, captioned with their session
+    names, for proofing and picking reprints.
+
+    Returns:
+        Progress.
+    """
+    progress = Progress('contact sheets')
+    manifest = Manifest(output)
+    sessions = [session for session in sessions if session.composite]
+    per_page = columns * rows
+    jobs = []
+    for page, first in enumerate(range(0, len(sessions), per_page)):
+        on_page = sessions[first:first + per_page]
+        sources = [session.composite for session in on_page]
+        name = 'contact_sheet_{:03}.jpg'.format(page + 1)
+        key = Manifest.key(
+            ('contact sheet', size, columns, rows, background_color),
+            sources
+        )
+        if manifest.fresh(name, key):
+            progress.skipped += 1
+            continue
+
+        dest = os.path.join(output, name)
+        jobs.append((
+            name,
+            key,
+            dest,
+            PoolJob(
+                pool,
+                'contact sheet',
+                make_contact_sheet,
+                (
+                    sources,
+                    [session.name for session in on_page],
+                    temporary_name(dest),
+                    size,
+                    columns,
+                    rows,
+                    background_color
+                ),
+                detail=name
+            )
+        ))
+
+    for name, key, dest, job in jobs:
+        if job.wait() != 0:
+            progress.failed += 1
+            continue
+
+        os.rename(temporary_name(dest), dest)
+        manifest.update(name, key)
+        progress.made += 1
+
+    progress.report()
+    return progress
+
+
+def print_sessions(tracker, sessions):
+    """Send the composites of sessions to the printer, in order.
+
+    The tracker holds each job back until the printer has room for it, so
+    jobs are streamed to the printer instead of all being queued at once.
+    Returns once the printer has finished every job.
+
+    Returns:
+        Progress.
+    """
+    progress = Progress('print')
+    for session in sessions:
+        if not session.composite:
+            Logger.warning('Export: %s has no composite.', session)
+            progress.failed += 1
+            continue
+
+        try:
+            tracker.submit(session.composite, session.name)
+            progress.made += 1
+
+        except Exception:
+            Logger.exception('Export: failed to print %s.', session)
+            progress.failed += 1
+
+    while tracker.depth():
+        time.sleep(tracker.interval)
+
+    progress.report()
+    return progress
@@ -0,0 +1,151 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import threading
+import time
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+
+class Job(object):
+    """Handle on work completed somewhere else.
+
+    Mimics the subset of subprocess.Popen used by the photobooth, so in-process
+    work can be tracked alongside external processes. Whoever does the work
+    calls complete() or fail() when it is done.
+    """
+    def __init__(self, name='job'):
+        self.name = name
+        self.returncode = None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def complete(self, result=None):
+        self.result = result
+        self.returncode = 0
+        self._done.set()
+
+    def fail(self, error):
+        self.error = error
+        self.returncode = 1
+        self._done.set()
+
+    def poll(self):
+        """Return None while running, otherwise the return code."""
+        if not self._done.is_set():
+            return None
+
+        return self.returncode
+
+    def wait(self):
+        """Block until the job completes, and return the return code."""
+        self._done.wait()
+        return self.returncode
+
+
+class ThreadJob(Job):
+    """Run a function in a background thread."""
+    def __init__(self, target, *args, **kwargs):
+        super(ThreadJob, self).__init__(getattr(target, '__name__', 'job'))
+        self.elapsed = None
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(target, args, kwargs),
+            name=self.name
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, target, args, kwargs):
+        start = time.time()
+        try:
+            result = target(*args, **kwargs)
+            self.elapsed = time.time() - start
+            Logger.info(
+                'ThreadJob: %s complete in %.3fs.',
+                self.name,
+                self.elapsed
+            )
+            self.complete(result)
+
+        except Exception as e:
+            self.elapsed = time.time() - start
+            Logger.exception('ThreadJob: %s failed.', self.name)
+            self.fail(e)
+
+
+class PoolJob(Job):
+    """Run a module level function in a WorkerPool process.
+
+    If a timeline is given, the time spent waiting for a worker is recorded as
+    "<name> queue", and the time spent running as name. If the function
+    raises, error is a RuntimeError with the worker's traceback.
+    """
+    def __init__(self, pool, name, function, args, timeline=None, detail=None):
+        super(PoolJob, self).__init__(name)
+        self.latency = None
+        self.elapsed = None
+        self.timeline = timeline
+        self.detail = detail
+        self.submitted = time.time()
+        pool.submit(function, args, self._done_event)
+
+    def _done_event(self, result, error, latency, elapsed):
+        self.latency = latency
+        self.elapsed = elapsed
+        if self.timeline:
+            started = self.submitted + latency
+            self.timeline.record(
+                '{} queue'.format(self.name),
+                self.submitted,
+                started,
+                detail=self.detail
+            )
+            self.timeline.record(
+                self.name,
+                started,
+                started + elapsed,
+                detail=self.detail
+            )
+
+        if error:
+            Logger.error('PoolJob: %s failed.\n%s', self.name, error)
+            # The worker's exception can not be pickled reliably, so it is
+            # sent back as a formatted traceback.
+            self.fail(RuntimeError(error))
+            return
+
+        Logger.info(
+            'PoolJob: %s complete in %.3fs, after %.3fs in the queue.',
+            self.name,
+            elapsed,
+            latency
+        )
+        self.complete(result)
+
+
+def on_complete(jobs, callback):
+    """Call callback on the Kivy main thread once all jobs are complete.
+
+    Jobs are anything with a blocking wait() method, so subprocess.Popen objects
+    can be mixed with Jobs. A watcher thread waits on the jobs, so completion is
+    noticed immediately rather than at the next poll of a Clock timer.
+    """
+    jobs = list(jobs)
+
+    def watch():
+        for job in jobs:
+            job.wait()
+
+        Clock.schedule_once(lambda dt: callback())
+
+    watcher = threading.Thread(target=watch, name='job watcher')
+    watcher.daemon = True
+    watcher.start()
@@ -0,0 +1,283 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import Queue
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from kivy.logger import Logger
+
+from pipeline.session import Session
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+
+    finally:
+        os.close(fd)
+
+
+class JournalSession(object):
+    """What the journal knows about a session that was not finished."""
+    def __init__(self, name):
+        self.name = name
+        self.photos = {}
+        self.files = {}
+        self.stages = set()
+        self.records = []
+
+    def __str__(self):
+        return self.name
+
+    def resumable(self, photo_count):
+        """Whether the session was handed to the print queue with all of its
+        photos kept.
+        """
+        return (
+            SessionJournal.SUBMITTED in self.stages and
+            set(self.photos) == set(range(photo_count))
+        )
+
+
+class SessionJournal(object):
+    """Append-only journal of sessions, on persistent storage.
+
+    Everything in the session directories is lost if the photobooth or the Pi
+    crashes, so the photos are copied to a spool directory next to the journal
+    as they are taken, and each stage of the print pipeline is recorded as it
+    finishes. The composite is kept as well, so a resumed session does not
+    have to be composed again. Records and files are written and synced by a
+    worker thread, in order, so a record is never on disk before its file.
+
+    On startup, unfinished() finds the sessions that were handed to the print
+    queue but not finished, so they can be resumed from their last finished
+    stage. Each record is one JSON line. A torn last line, from a crash while
+    it was being written, is ignored.
+    """
+    CAPTURED = 'captured'
+    SUBMITTED = 'submitted'
+    COMPOSED = 'composed'
+    SAVED = 'saved'
+    PRINTED = 'printed'
+    FINISHED = 'finished'
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): where to keep the journal, and the spool.
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, 'journal.jsonl')
+        self.spool = os.path.join(directory, 'spool')
+        self.fp = None
+        self.requests = Queue.Queue()
+        self.worker = threading.Thread(target=self.run, name='session journal')
+        self.worker.daemon = True
+        if not os.path.exists(self.spool):
+            os.makedirs(self.spool)
+
+    def start(self):
+        Logger.info('SessionJournal: start().')
+        self.fp = open(self.path, 'a')
+        self.worker.start()
+
+    def stop(self):
+        """Write everything queued so far, then stop."""
+        Logger.info('SessionJournal: stop().')
+        self.requests.put(None)
+        self.worker.join()
+
+    def keep(self, session, src, event, **fields):
+        """Queue src to be copied to the spool, then record event for it."""
+        self.requests.put(('keep', session.name, src, event, fields))
+
+    def record(self, session, event, **fields):
+        """Queue event to be recorded for session."""
+        self.requests.put(('record', session.name, None, event, fields))
+
+    def finish(self, session, status):
+        """Queue the session's last record, then delete its spool directory.
+
+        The spool is left alone for failed sessions, so their photos are not
+        lost.
+        """
+        self.requests.put(
+            ('finish', session.name, None, self.FINISHED, {'status': status})
+        )
+
+    def then(self, callback):
+        """Call callback from the worker thread once everything queued so far
+        is on disk.
+        """
+        self.requests.put(('then', callback))
+
+    def unfinished(self, photo_count):
+        """Find the sessions that can be resumed.
+
+        Sessions that were never handed to the print queue are dropped, with
+        their spool directories. The journal is rewritten with only the
+        sessions that are returned, so it does not grow forever. Must be
+        called before start().
+
+        Returns:
+            list of JournalSession, oldest first.
+        """
+        sessions = {}
+        order = []
+        for record in self.read():
+            name = record['session']
+            if name not in sessions:
+                sessions[name] = JournalSession(name)
+                order.append(name)
+
+            session = sessions[name]
+            session.records.append(record)
+            event = record['event']
+            session.stages.add(event)
+            if event == self.CAPTURED:
+                session.photos[record['index']] = record['file']
+
+            elif 'file' in record:
+                session.files[event] = record['file']
+
+        resumable = []
+        for name in order:
+            session = sessions[name]
+            if self.FINISHED in session.stages:
+                continue
+
+            if session.resumable(photo_count):
+                Logger.info(
+                    'SessionJournal: resuming %s after %s.',
+                    session,
+                    ', '.join(sorted(session.stages))
+                )
+                resumable.append(session)
+
+            else:
+                Logger.warning(
+                    'SessionJournal: dropping %s, which can not be resumed.',
+                    session
+                )
+                shutil.rmtree(self.spool_dir(name), ignore_errors=True)
+
+        self.compact(resumable)
+        return resumable
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as fp:
+            for line in fp:
+                try:
+                    yield json.loads(line)
+
+                except ValueError:
+                    Logger.warning(
+                        'SessionJournal: skipping torn record %r.',
+                        line
+                    )
+
+    def compact(self, sessions):
+        """Replace the journal with the records of sessions."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            for session in sessions:
+                for record in session.records:
+                    fp.write(json.dumps(record, sort_keys=True) + '\n')
+
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.rename(tmp, self.path)
+        fsync_path(self.directory)
+
+    def spool_dir(self, name):
+        return os.path.join(self.spool, name)
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+
+            if request[0] == 'then':
+                try:
+                    request[1]()
+
+                except Exception:
+                    Logger.exception('SessionJournal: callback failed.')
+
+                continue
+
+            kind, name, src, event, fields = request
+            try:
+                if kind == 'keep':
+                    fields['file'] = self.copy(name, src)
+
+                self.write(name, event, fields)
+                if kind == 'finish':
+                    self.remove(name, fields['status'])
+
+            except Exception:
+                Logger.exception(
+                    'SessionJournal: failed to record %s %s.',
+                    name,
+                    event
+                )
+
+        self.fp.close()
+
+    def copy(self, name, src):
+        """Copy src into the session's spool directory, and sync it."""
+        start = time.time()
+        directory = self.spool_dir(name)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+            fsync_path(self.spool)
+
+        dest = os.path.join(directory, os.path.basename(src))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp, open(src, 'rb') as source:
+            shutil.copyfileobj(source, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.rename(tmp, dest)
+        fsync_path(directory)
+        Logger.info(
+            'SessionJournal: kept %s in %.3fs.',
+            dest,
+            time.time() - start
+        )
+        return dest
+
+    def write(self, name, event, fields):
+        record = dict(fields, session=name, event=event, time=time.time())
+        self.fp.write(json.dumps(record, sort_keys=True) + '\n')
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+    def remove(self, name, status):
+        directory = self.spool_dir(name)
+        if status == Session.FAILED:
+            Logger.warning(
+                'SessionJournal: %s failed. Its photos are in %s.',
+                name,
+                directory
+            )
+            return
+
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,227 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import Queue
+import os
+import threading
+from functools import partial
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from pipeline.journal import SessionJournal
+from pipeline.session import Session
+
+
+class PrintQueue(object):
+    """Background queue that composes and prints sessions.
+
+    Sessions are processed in order by a single worker thread, so the UI can
+    start the next session as soon as the last one is handed over.
+    """
+    def __init__(
+        self,
+        compositor,
+        canvas_image,
+        canvas_job,
+        archive,
+        save_raw,
+        tracker,
+        timing_log,
+        journal
+    ):
+        """
+        Args:
+            compositor (imaging.compositor.Compositor): print compositor.
+            canvas_image (str): canvas created by the compositor.
+            canvas_job (pipeline.jobs.Job): completes when the canvas has
+                been created.
+            archive (pipeline.archive.ArchiveWriter): saves prints, or None to
+                not save them.
+            save_raw (bool): save the photos with the print.
+            tracker (printer.tracker.PrintTracker): submits prints, or None
+                to not print.
+            timing_log (pipeline.timing.TimingLog): where to write session
+                timelines, or None.
+            journal (pipeline.journal.SessionJournal): records finished
+                stages, or None.
+        """
+        self.compositor = compositor
+        self.canvas_image = canvas_image
+        self.canvas_job = canvas_job
+        self.archive = archive
+        self.save_raw = save_raw
+        self.tracker = tracker
+        self.timing_log = timing_log
+        self.journal = journal
+        self.sessions = Queue.Queue()
+        self.pending = []
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.worker = threading.Thread(target=self.run, name='print queue')
+        self.worker.daemon = True
+
+    def start(self):
+        Logger.info('PrintQueue: start().')
+        self.worker.start()
+
+    def stop(self):
+        Logger.info('PrintQueue: stop().')
+        self.sessions.put(None)
+
+    def submit(self, session):
+        """Queue session to be composed and printed."""
+        Logger.info('PrintQueue: submit(%s).', session)
+        with self.lock:
+            self.pending.append(session)
+
+        self.set_status(session, Session.QUEUED)
+        self.sessions.put(session)
+
+    def discard(self, session):
+        """Queue cancelled session to be cleaned up."""
+        Logger.info('PrintQueue: discard(%s).', session)
+        session.status = Session.CANCELLED
+        self.sessions.put(session)
+
+    def depth(self):
+        """Number of sessions waiting to be printed, including the current one."""
+        with self.lock:
+            return len(self.pending)
+
+    def jobs(self):
+        """List of (session name, status) for sessions waiting to be printed."""
+        with self.lock:
+            return [(session.name, session.status) for session in self.pending]
+
+    def bind(self, listener):
+        """Call listener on the Kivy main thread when the queue changes."""
+        self.listeners.append(listener)
+
+    def set_status(self, session, status):
+        Logger.info('PrintQueue: %s %s', session, status)
+        session.status = status
+        for listener in self.listeners:
+            Clock.schedule_once(lambda dt, listener=listener: listener())
+
+    def run(self):
+        while True:
+            session = self.sessions.get()
+            if session is None:
+                break
+
+            if session.status != Session.CANCELLED:
+                try:
+                    self.process(session)
+                    status = Session.DONE
+
+                except Exception:
+                    Logger.exception('PrintQueue: %s failed.', session)
+                    status = Session.FAILED
+
+                with self.lock:
+                    self.pending.remove(session)
+
+                self.set_status(session, status)
+
+            self.cleanup(session)
+
+    def process(self, session):
+        if SessionJournal.COMPOSED not in session.stages:
+            self.compose(session)
+
+        self.set_status(session, Session.PRINTING)
+        self.print_photo(session)
+
+    def compose(self, session):
+        timeline = session.timeline
+
+        self.set_status(session, Session.RESIZING)
+        with timeline.span('resize wait'):
+            for job in session.resize_jobs.itervalues():
+                if job.wait() != 0:
+                    raise job.error
+
+        self.set_status(session, Session.COMPOSITING)
+        if self.canvas_job.wait() != 0:
+            raise self.canvas_job.error
+
+        with timeline.span('composite'):
+            self.compositor.compose(
+                session.resized_photos(),
+                self.canvas_image,
+                session.print_image
+            )
+
+        if self.journal:
+            self.journal.keep(
+                session,
+                session.print_image,
+                SessionJournal.COMPOSED
+            )
+
+    def print_photo(self, session):
+        timeline = session.timeline
+        if self.archive and SessionJournal.SAVED not in session.stages:
+            Logger.info('Saving photo %s.', session.print_image)
+            with timeline.span('save'):
+                self.archive.save(
+                    session.print_image,
+                    '{}.jpg'.format(session.name)
+                )
+                if self.save_raw:
+                    for photo in session.photos:
+                        self.archive.save(
+                            photo,
+                            '{}_{}'.format(
+                                session.name,
+                                os.path.basename(photo)
+                            )
+                        )
+
+            if self.journal:
+                self.archive.then(
+                    partial(self.journal.record, session, SessionJournal.SAVED)
+                )
+
+        if self.tracker and SessionJournal.PRINTED not in session.stages:
+            Logger.info('Printing photo %s.', session.print_image)
+            with timeline.span('print submit'):
+                self.tracker.submit(session.print_image, session.name)
+
+            if self.journal:
+                self.journal.record(session, SessionJournal.PRINTED)
+
+    def cleanup(self, session):
+        """Release session's images, and delete its working files."""
+        jobs = session.resize_jobs.values() + session.thumbnail_jobs.values()
+        for job in jobs:
+            job.wait()
+
+        self.compositor.release(session.intermediates())
+        if self.archive:
+            # Saved files are copied from the session directory, and the
+            # session is not finished until they are on disk.
+            self.archive.then(partial(self.finish, session))
+
+        else:
+            self.finish(session)
+
+        if self.timing_log:
+            self.timing_log.write(session.timeline, session.status)
+
+    def finish(self, session):
+        """Record that session is finished, and delete its working files."""
+        if self.journal:
+            # The journal copies photos out of the session directory on its
+            # own thread, so the directory is only removed after it has.
+            self.journal.finish(session, session.status)
+            self.journal.then(session.remove)
+
+        else:
+            session.remove()
@@ -0,0 +1,84 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import itertools
+import os
+import shutil
+
+import datetime
+
+from pipeline.timing import Timeline
+
+_session_ids = itertools.count(1)
+
+
+class Session(object):
+    """Working files for one photobooth session.
+
+    Each session gets its own directory, so a session can be composed and
+    printed in the background while the next one is being shot.
+    """
+    QUEUED = 'Queued'
+    RESIZING = 'Resizing...'
+    COMPOSITING = 'Compositing...'
+    PRINTING = 'Printing...'
+    DONE = 'Done'
+    FAILED = 'Failed'
+    CANCELLED = 'Cancelled'
+
+    PHOTO_COUNT = 3
+
+    def __init__(self, photobuffer, name=None):
+        """
+        Args:
+            photobuffer (str): directory to create the session directory in.
+            name (str): name of a session being resumed, or None for a new
+                session.
+        """
+        self.name = name or 'session_{}_{}'.format(
+            datetime.datetime.now().strftime('%Y%m%d_%H%M%S'),
+            next(_session_ids)
+        )
+        self.directory = os.path.join(photobuffer, self.name)
+        self.photos = [
+            os.path.join(self.directory, 'photo{}.jpg'.format(idx + 1))
+            for idx in range(self.PHOTO_COUNT)
+        ]
+        self.thumbnails = [
+            os.path.join(self.directory, 'photo{}_thumb.jpg'.format(idx + 1))
+            for idx in range(self.PHOTO_COUNT)
+        ]
+        self.print_image = os.path.join(self.directory, 'composite.jpg')
+        self.resize_jobs = {}
+        self.thumbnail_jobs = {}
+        self.status = self.QUEUED
+        self.timeline = Timeline(self.name)
+        # Pipeline stages finished before the session was resumed.
+        self.stages = set()
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def __str__(self):
+        return self.name
+
+    def resized_photos(self):
+        return [self.resized(photo) for photo in self.photos]
+
+    def intermediates(self):
+        """Names of the images created while composing the print."""
+        return self.resized_photos()
+
+    def remove(self):
+        """Delete the session directory."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def resized(name):
+        base, ext = os.path.splitext(name)
+        return '{base}_resized{ext}'.format(base=base, ext=ext)
@@ -0,0 +1,119 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+def process_start_time():
+    """Wall clock time the process started, or None if it is not known."""
+    try:
+        with open('/proc/self/stat') as fp:
+            # The command name can contain spaces, so split after it.
+            fields = fp.read().rsplit(')', 1)[1].split()
+
+        with open('/proc/uptime') as fp:
+            uptime = float(fp.read().split()[0])
+
+    except (IOError, IndexError, ValueError):
+        return None
+
+    # starttime is field 22 of stat, in clock ticks since boot.
+    started = int(fields[19]) / float(os.sysconf('SC_CLK_TCK'))
+    return time.time() - uptime + started
+
+
+class StartupTimer(object):
+    """Time spent in each phase of startup.
+
+    Phases on the critical path run one after another, until the first frame
+    is on screen. Deferred phases run in the background, or between frames,
+    after that. Times are measured from when the process started, so the time
+    to load the interpreter is included.
+
+    This module does not import Kivy, so it can time the Kivy import.
+    """
+    def __init__(self):
+        now = time.time()
+        self.origin = process_start_time() or now
+        self.phases = []
+        self.pending = set()
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.record('interpreter', self.origin, now)
+
+    def expect(self, name):
+        """Wait for phase name before startup is complete."""
+        with self.lock:
+            self.pending.add(name)
+
+    def record(self, name, start, end, deferred=False):
+        with self.lock:
+            self.phases.append(
+                (name, start - self.origin, end - start, deferred)
+            )
+            complete = name in self.pending
+            self.pending.discard(name)
+            complete = complete and not self.pending
+            listeners = list(self.listeners) if complete else []
+
+        for listener in listeners:
+            listener()
+
+    @contextmanager
+    def phase(self, name, deferred=False):
+        """Record the time spent in a with block."""
+        start = time.time()
+        try:
+            yield
+
+        finally:
+            self.record(name, start, time.time(), deferred)
+
+    def timed(self, name, function):
+        """Wrap function so its first call is recorded as a deferred phase."""
+        self.expect(name)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.phase(name, deferred=True):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def bind(self, callback):
+        """Call callback, from any thread, once all expected phases are done."""
+        self.listeners.append(callback)
+
+    def report(self):
+        """Lines of a table of the phases, in the order they started."""
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+
+        lines = ['{:<24} {:>9} {:>9}'.format('phase', 'start (s)', 'time (s)')]
+        for name, start, duration, deferred in phases:
+            lines.append('{:<24} {:>9.3f} {:>9.3f}'.format(
+                name + (' *' if deferred else ''),
+                start,
+                duration
+            ))
+
+        critical = [
+            start + duration
+            for _, start, duration, deferred in phases
+            if not deferred
+        ]
+        finished = [start + duration for _, start, duration, _ in phases]
+        lines.append(
+            'First frame after {:.3f}s, everything ready after {:.3f}s. '
+            '* runs in the background.'.format(max(critical), max(finished))
+        )
+        return lines
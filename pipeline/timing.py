@@ -0,0 +1,148 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Timeline(object):
+    """Timing spans for one session.
+
+    Spans are recorded from whichever thread did the work, so recording is
+    locked. Tags describe the conditions the session ran under, so timings can
+    be compared between them.
+    """
+    STAGE = 'stage'
+    STATE = 'state'
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.spans = []
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, start, end, kind=STAGE, detail=None):
+        # Imported here so timing_report.py can read timing logs without
+        # Kivy, which also takes over the command line when it is imported.
+        from kivy.logger import Logger
+
+        Logger.info(
+            'Timeline: %s %s %s took %.3fs.',
+            self.name,
+            name,
+            detail or '',
+            end - start
+        )
+        span = {
+            'name': name,
+            'kind': kind,
+            'start': start - self.start,
+            'duration': end - start,
+        }
+        if detail is not None:
+            span['detail'] = detail
+
+        with self.lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, detail=None):
+        """Record the time spent in a with block."""
+        start = time.time()
+        try:
+            yield
+
+        finally:
+            self.record(name, start, time.time(), detail=detail)
+
+    def timed(self, name, function, detail=None):
+        """Wrap function so each call is recorded."""
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.span(name, detail):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def to_dict(self, status):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span['start'])
+
+        return {
+            'session': self.name,
+            'status': status,
+            'start': self.start,
+            'spans': spans,
+            'tags': dict(self.tags),
+        }
+
+
+class TimingLog(object):
+    """Append-only JSON lines file with one timeline per session."""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def write(self, timeline, status):
+        line = json.dumps(timeline.to_dict(status), sort_keys=True)
+        with self.lock:
+            with open(self.path, 'a') as fp:
+                fp.write(line + '\n')
+
+
+def read_timelines(paths):
+    """Generate session records from timing logs."""
+    for path in paths:
+        with open(path) as fp:
+            for line in fp:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values."""
+    values = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def summarize(records, group_by=None):
+    """Collect span durations by (kind, name).
+
+    Args:
+        records: session records.
+        group_by (str): tag to split spans by. Its value is added to the name.
+
+    Returns:
+        dict mapping (kind, name) to a list of durations in seconds.
+    """
+    durations = {}
+    for record in records:
+        suffix = ''
+        if group_by:
+            suffix = ' [{}]'.format(
+                record.get('tags', {}).get(group_by, '-')
+            )
+
+        for span in record['spans']:
+            durations.setdefault(
+                (span['kind'], span['name'] + suffix),
+                []
+            ).append(span['duration'])
+
+    return durations
@@ -0,0 +1,52 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+
+
+class Printer(object):
+    """Interface for print backends.
+
+    Methods are blocking, and are only called with the print tracker's lock
+    held, so backends do not have to be thread safe.
+    """
+    CUPS = 'cups'
+    FILE = 'file'
+    BACKENDS = (CUPS, FILE)
+
+    # Job states.
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    FINISHED = (DONE, FAILED)
+
+    def submit(self, filename, title):
+        """Submit a print job, and return its job id."""
+        raise NotImplementedError
+
+    def job_state(self, job_id):
+        """Get the state of a submitted job."""
+        raise NotImplementedError
+
+
+def make_printer(backend, name):
+    """Create printer for the named backend.
+
+    Args:
+        backend (str): one of Printer.BACKENDS.
+        name (str): CUPS printer name, or directory for the file backend.
+    """
+    if backend == Printer.CUPS:
+        from printer.cupsprinter import CupsPrinter
+        return CupsPrinter(name)
+
+    elif backend == Printer.FILE:
+        from printer.fileprinter import FilePrinter
+        return FilePrinter(name)
+
+    raise ValueError('Unknown print backend "{}".'.format(backend))
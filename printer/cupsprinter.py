@@ -0,0 +1,61 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import cups
+from kivy.logger import Logger
+
+from printer.backend import Printer
+
+
+class CupsPrinter(Printer):
+    """Print through a CUPS connection that is opened once, and reused."""
+    states = {
+        cups.IPP_JOB_PENDING: Printer.PENDING,
+        cups.IPP_JOB_HELD: Printer.PENDING,
+        cups.IPP_JOB_PROCESSING: Printer.PROCESSING,
+        cups.IPP_JOB_STOPPED: Printer.PENDING,
+        cups.IPP_JOB_CANCELED: Printer.FAILED,
+        cups.IPP_JOB_ABORTED: Printer.FAILED,
+        cups.IPP_JOB_COMPLETED: Printer.DONE,
+    }
+
+    def __init__(self, name):
+        self.name = name
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            Logger.info('CupsPrinter: connect().')
+            self.connection = cups.Connection()
+
+        return self.connection
+
+    def submit(self, filename, title):
+        try:
+            return self.connect().printFile(self.name, filename, title, {})
+
+        except (cups.IPPError, RuntimeError):
+            # The scheduler may have restarted. Reconnect, and try once more.
+            Logger.exception('CupsPrinter: submit failed, reconnecting.')
+            self.connection = None
+            return self.connect().printFile(self.name, filename, title, {})
+
+    def job_state(self, job_id):
+        try:
+            attributes = self.connect().getJobAttributes(
+                job_id,
+                requested_attributes=['job-state']
+            )
+
+        except cups.IPPError:
+            # Jobs are forgotten eventually once they are complete.
+            Logger.exception('CupsPrinter: lost track of job %s.', job_id)
+            self.connection = None
+            return Printer.DONE
+
+        return self.states.get(attributes['job-state'], Printer.PENDING)
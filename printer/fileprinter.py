@@ -0,0 +1,46 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import itertools
+import os
+import shutil
+import time
+
+from printer.backend import Printer
+
+
+class FilePrinter(Printer):
+    """Printer that writes jobs to a directory, like cups-pdf.
+
+    Each job takes print_time seconds to "print", so the print queue can be
+    tested without a printer.
+    """
+    def __init__(self, directory, print_time=30.0):
+        self.directory = directory
+        self.print_time = print_time
+        self.job_ids = itertools.count(1)
+        self.jobs = {}
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def submit(self, filename, title):
+        job_id = next(self.job_ids)
+        ext = os.path.splitext(filename)[1]
+        shutil.copy(
+            filename,
+            os.path.join(self.directory, '{}-{}{}'.format(job_id, title, ext))
+        )
+        self.jobs[job_id] = time.time()
+        return job_id
+
+    def job_state(self, job_id):
+        submitted = self.jobs[job_id]
+        if time.time() - submitted < self.print_time:
+            return Printer.PROCESSING
+
+        return Printer.DONE
@@ -0,0 +1,122 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import threading
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from printer.backend import Printer
+
+
+class PrintTracker(object):
+    """Submit print jobs, and follow them until the printer is done.
+
+    Job states are polled from a background thread. Submissions are held off
+    while max_jobs are already at the printer, so a backed up printer does not
+    end up with a long spool of jobs that can not be cancelled from the
+    photobooth.
+    """
+    def __init__(self, printer, max_jobs, interval=1.0):
+        """
+        Args:
+            printer (printer.backend.Printer): print backend.
+            max_jobs (int): most jobs to have at the printer at once, at
+                least 1.
+            interval (float): seconds between job state polls.
+        """
+        if max_jobs < 1:
+            # submit() would wait forever for room.
+            raise ValueError(
+                'max_jobs must be at least 1, not {}.'.format(max_jobs)
+            )
+
+        self.printer = printer
+        self.max_jobs = max_jobs
+        self.interval = interval
+        self.jobs = {}
+        self.lock = threading.Condition()
+        self.listeners = []
+        self.stopped = threading.Event()
+        self.worker = threading.Thread(target=self.run, name='print tracker')
+        self.worker.daemon = True
+
+    def start(self):
+        Logger.info('PrintTracker: start().')
+        self.worker.start()
+
+    def stop(self):
+        Logger.info('PrintTracker: stop().')
+        self.stopped.set()
+
+    def bind(self, listener):
+        """Call listener on the Kivy main thread when job states change."""
+        self.listeners.append(listener)
+
+    def depth(self):
+        """Number of jobs at the printer that have not finished."""
+        with self.lock:
+            return len(self.jobs)
+
+    def submit(self, filename, title):
+        """Submit a print job, waiting until the printer has room for it.
+
+        Returns:
+            printer's job id.
+        """
+        with self.lock:
+            while len(self.jobs) >= self.max_jobs:
+                Logger.info(
+                    'PrintTracker: %s jobs at printer, holding %s.',
+                    len(self.jobs),
+                    title
+                )
+                self.lock.wait()
+
+            job_id = self.printer.submit(filename, title)
+            self.jobs[job_id] = Printer.PENDING
+            Logger.info('PrintTracker: submitted %s as job %s.', title, job_id)
+
+        self.notify()
+        return job_id
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            changed = False
+            with self.lock:
+                for job_id, old_state in list(self.jobs.items()):
+                    try:
+                        state = self.printer.job_state(job_id)
+
+                    except Exception:
+                        Logger.exception(
+                            'PrintTracker: failed to get state of job %s.',
+                            job_id
+                        )
+                        continue
+
+                    if state == old_state:
+                        continue
+
+                    Logger.info('PrintTracker: job %s %s.', job_id, state)
+                    changed = True
+                    if state in Printer.FINISHED:
+                        del self.jobs[job_id]
+
+                    else:
+                        self.jobs[job_id] = state
+
+                if changed:
+                    self.lock.notify_all()
+
+            if changed:
+                self.notify()
+
+    def notify(self):
+        for listener in self.listeners:
+            Clock.schedule_once(lambda dt, listener=listener: listener())
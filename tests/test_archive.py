@@ -0,0 +1,94 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipeline.archive import ArchiveWriter
+
+
+class FailingArchiveWriter(ArchiveWriter):
+    """Archive on a card that fails the first sync."""
+    def __init__(self, *args, **kwargs):
+        super(FailingArchiveWriter, self).__init__(*args, **kwargs)
+        self.failures = 1
+
+    def sync_batch(self):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('No space left on device')
+
+        super(FailingArchiveWriter, self).sync_batch()
+
+
+class ArchiveWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.directory, 'archive')
+        os.makedirs(self.archive_dir)
+        self.photo = os.path.join(self.directory, 'photo.jpg')
+        with open(self.photo, 'wb') as fp:
+            fp.write(b'photo')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_save(self):
+        archive = ArchiveWriter(self.archive_dir)
+        archive.start()
+        saved = []
+        archive.save(self.photo, 'session.jpg')
+        archive.then(lambda: saved.extend(os.listdir(self.archive_dir)))
+        archive.stop()
+
+        # The callback only runs once the file is renamed into place.
+        self.assertEqual(saved, ['session.jpg'])
+        with open(os.path.join(self.archive_dir, 'session.jpg'), 'rb') as fp:
+            self.assertEqual(fp.read(), b'photo')
+
+    def test_names_are_not_reused(self):
+        archive = ArchiveWriter(self.archive_dir, batch_size=2)
+        archive.start()
+        for _ in range(3):
+            archive.save(self.photo, 'session.jpg')
+
+        archive.stop()
+
+        self.assertEqual(
+            sorted(os.listdir(self.archive_dir)),
+            ['session.jpg', 'session_1.jpg', 'session_2.jpg']
+        )
+
+    def test_missing_source(self):
+        archive = ArchiveWriter(self.archive_dir)
+        archive.start()
+        archive.save(os.path.join(self.directory, 'missing.jpg'), 'a.jpg')
+        archive.save(self.photo, 'b.jpg')
+        archive.stop()
+
+        self.assertEqual(os.listdir(self.archive_dir), ['b.jpg'])
+
+    def test_failed_sync(self):
+        archive = FailingArchiveWriter(self.archive_dir)
+        archive.start()
+        called = []
+        archive.save(self.photo, 'dropped.jpg')
+        archive.then(lambda: called.append(True))
+        archive.save(self.photo, 'saved.jpg')
+        archive.stop()
+
+        # The failed batch is dropped, with its temporary file, and the
+        # writer carries on.
+        self.assertEqual(called, [True])
+        self.assertEqual(os.listdir(self.archive_dir), ['saved.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
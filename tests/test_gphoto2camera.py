@@ -0,0 +1,81 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import io
+import os
+import tempfile
+import unittest
+
+from camera.gphoto2camera import GPhoto2Camera, GPhoto2Error
+
+
+class FakeShell(object):
+    """Stands in for the gphoto2 --shell process."""
+    def __init__(self, output):
+        self.stdout = io.BytesIO(output)
+
+
+def make_camera(output):
+    camera = GPhoto2Camera.__new__(GPhoto2Camera)
+    camera.shell = FakeShell(output)
+    return camera
+
+
+class ReadUntilPromptTest(unittest.TestCase):
+    def test_root_prompt(self):
+        camera = make_camera(
+            b'New file is in location /capt0000.jpg on the camera\n'
+            b'gphoto2: {/home/pi} /> '
+        )
+        self.assertEqual(
+            camera.read_until_prompt(),
+            'New file is in location /capt0000.jpg on the camera\n'
+        )
+
+    def test_folder_prompt(self):
+        camera = make_camera(
+            b'Saving file as IMG_0001.JPG\n'
+            b'gphoto2: {/dev/shm/photobooth} /store_00020001/DCIM/100CANON> '
+        )
+        self.assertEqual(
+            camera.read_until_prompt(),
+            'Saving file as IMG_0001.JPG\n'
+        )
+
+    def test_prompt_after_prompt(self):
+        camera = make_camera(
+            b'gphoto2: {/home/pi} /store_00020001> '
+            b'gphoto2: {/home/pi} /store_00020001/DCIM> '
+        )
+        self.assertEqual(camera.read_until_prompt(), '')
+        self.assertEqual(camera.read_until_prompt(), '')
+
+    def test_arrow_in_output(self):
+        camera = make_camera(
+            b'a> b\n'
+            b'gphoto2: {/home/pi} /> '
+        )
+        self.assertEqual(camera.read_until_prompt(), 'a> b\n')
+
+    def test_shell_exited(self):
+        camera = make_camera(b'*** Error: no camera found\n')
+        self.assertRaises(GPhoto2Error, camera.read_until_prompt)
+
+
+class CloseTest(unittest.TestCase):
+    def test_removes_preview_dir(self):
+        camera = GPhoto2Camera()
+        camera.preview_dir = tempfile.mkdtemp(prefix='preview_')
+        preview_dir = camera.preview_dir
+        camera.close()
+        self.assertFalse(os.path.exists(preview_dir))
+        self.assertIsNone(camera.preview_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import unittest
+
+from pipeline.jobs import PoolJob
+
+
+class FakePool(object):
+    """Runs each task as soon as it is submitted."""
+    def submit(self, function, args, callback):
+        try:
+            result, error = function(*args), None
+
+        except Exception as e:
+            result, error = None, 'Traceback:\n{}'.format(e)
+
+        callback(result, error, 0.0, 0.0)
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+class PoolJobTest(unittest.TestCase):
+    def test_complete(self):
+        job = PoolJob(FakePool(), 'add', sum, ([1, 2],))
+        self.assertEqual(job.wait(), 0)
+        self.assertEqual(job.result, 3)
+        self.assertIsNone(job.error)
+
+    def test_error_can_be_raised(self):
+        job = PoolJob(FakePool(), 'fail', fail, ('bad photo',))
+        self.assertNotEqual(job.wait(), 0)
+        with self.assertRaises(RuntimeError) as context:
+            raise job.error
+
+        self.assertIn('bad photo', str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
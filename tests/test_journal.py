@@ -0,0 +1,194 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pipeline.journal import SessionJournal
+from pipeline.printqueue import PrintQueue
+from pipeline.session import Session
+
+
+class SlowJournal(SessionJournal):
+    """Journal on a slow SD card."""
+    def copy(self, name, src):
+        time.sleep(0.1)
+        return super(SlowJournal, self).copy(name, src)
+
+
+class FakeCompositor(object):
+    def release(self, images):
+        pass
+
+
+def make_session(photobuffer):
+    session = Session(photobuffer)
+    for photo in session.photos + [session.print_image]:
+        with open(photo, 'wb') as fp:
+            fp.write(os.path.basename(photo))
+
+    return session
+
+
+class SessionJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.photobuffer = os.path.join(self.directory, 'photobuffer')
+        self.journal_dir = os.path.join(self.directory, 'journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def records(self, journal):
+        return [
+            (record['session'], record['event'])
+            for record in journal.read()
+        ]
+
+    def capture(self, journal, session):
+        for idx, photo in enumerate(session.photos):
+            journal.keep(session, photo, SessionJournal.CAPTURED, index=idx)
+
+        journal.record(session, SessionJournal.SUBMITTED)
+
+    def test_keep_copies_to_spool(self):
+        journal = SessionJournal(self.journal_dir)
+        journal.start()
+        session = make_session(self.photobuffer)
+        self.capture(journal, session)
+        journal.stop()
+
+        journal = SessionJournal(self.journal_dir)
+        entries = journal.unfinished(Session.PHOTO_COUNT)
+        self.assertEqual([entry.name for entry in entries], [session.name])
+        for idx, photo in entries[0].photos.items():
+            self.assertEqual(
+                os.path.dirname(photo),
+                journal.spool_dir(session.name)
+            )
+            with open(photo, 'rb') as fp:
+                self.assertEqual(
+                    fp.read(),
+                    os.path.basename(session.photos[idx])
+                )
+
+    def test_finished_sessions_are_not_resumed(self):
+        journal = SessionJournal(self.journal_dir)
+        journal.start()
+        session = make_session(self.photobuffer)
+        self.capture(journal, session)
+        journal.finish(session, Session.DONE)
+        journal.stop()
+
+        journal = SessionJournal(self.journal_dir)
+        self.assertEqual(journal.unfinished(Session.PHOTO_COUNT), [])
+        self.assertFalse(os.path.exists(journal.spool_dir(session.name)))
+
+    def test_failed_sessions_keep_their_spool(self):
+        journal = SessionJournal(self.journal_dir)
+        journal.start()
+        session = make_session(self.photobuffer)
+        self.capture(journal, session)
+        journal.finish(session, Session.FAILED)
+        journal.stop()
+
+        self.assertTrue(os.path.exists(journal.spool_dir(session.name)))
+
+    def test_sessions_not_submitted_are_dropped(self):
+        journal = SessionJournal(self.journal_dir)
+        journal.start()
+        session = make_session(self.photobuffer)
+        journal.keep(
+            session,
+            session.photos[0],
+            SessionJournal.CAPTURED,
+            index=0
+        )
+        journal.stop()
+
+        journal = SessionJournal(self.journal_dir)
+        self.assertEqual(journal.unfinished(Session.PHOTO_COUNT), [])
+        self.assertFalse(os.path.exists(journal.spool_dir(session.name)))
+
+    def test_unfinished_compacts_journal(self):
+        journal = SessionJournal(self.journal_dir)
+        journal.start()
+        done = make_session(self.photobuffer)
+        self.capture(journal, done)
+        journal.finish(done, Session.DONE)
+        unfinished = make_session(self.photobuffer)
+        self.capture(journal, unfinished)
+        journal.stop()
+
+        journal = SessionJournal(self.journal_dir)
+        journal.unfinished(Session.PHOTO_COUNT)
+        self.assertEqual(
+            self.records(journal),
+            [(unfinished.name, SessionJournal.CAPTURED)] * 3 +
+            [(unfinished.name, SessionJournal.SUBMITTED)]
+        )
+
+    def test_torn_record_is_skipped(self):
+        journal = SessionJournal(self.journal_dir)
+        journal.start()
+        session = make_session(self.photobuffer)
+        self.capture(journal, session)
+        journal.stop()
+        with open(journal.path, 'a') as fp:
+            fp.write(json.dumps({'session': session.name})[:10])
+
+        journal = SessionJournal(self.journal_dir)
+        entries = journal.unfinished(Session.PHOTO_COUNT)
+        self.assertEqual([entry.name for entry in entries], [session.name])
+
+    def test_session_is_removed_after_it_is_kept(self):
+        journal = SlowJournal(self.journal_dir)
+        journal.start()
+        queue = PrintQueue(
+            FakeCompositor(),
+            None,
+            None,
+            None,
+            False,
+            None,
+            None,
+            journal
+        )
+        session = make_session(self.photobuffer)
+        self.capture(journal, session)
+        journal.keep(
+            session,
+            session.print_image,
+            SessionJournal.COMPOSED
+        )
+        session.status = Session.FAILED
+        queue.cleanup(session)
+        journal.stop()
+
+        self.assertFalse(os.path.exists(session.directory))
+        self.assertEqual(
+            self.records(journal),
+            [(session.name, SessionJournal.CAPTURED)] * 3 +
+            [
+                (session.name, SessionJournal.SUBMITTED),
+                (session.name, SessionJournal.COMPOSED),
+                (session.name, SessionJournal.FINISHED),
+            ]
+        )
+        self.assertEqual(
+            sorted(os.listdir(journal.spool_dir(session.name))),
+            ['composite.jpg', 'photo1.jpg', 'photo2.jpg', 'photo3.jpg']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
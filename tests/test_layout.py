@@ -0,0 +1,175 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+from imaging.layout import (
+    DEFAULT_LAYOUT,
+    LayoutError,
+    Placement,
+    load_layout,
+    parse_margin
+)
+
+STRIPS = os.path.join(os.path.dirname(DEFAULT_LAYOUT), 'strips.cfg')
+
+
+def box(placement):
+    return (placement.x, placement.y, placement.width, placement.height)
+
+
+class LoadLayoutTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, text):
+        path = os.path.join(self.directory, 'layout.cfg')
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(text))
+
+        return path
+
+    def test_classic(self):
+        layout = load_layout(None, 1924, 1300, '/logo.jpg', 3)
+        self.assertEqual((layout.width, layout.height), (1924, 1300))
+        self.assertEqual(
+            [box(layout.photo_slots(photo)[0]) for photo in range(3)],
+            [
+                (72, 60, 880, 580),
+                (972, 60, 880, 580),
+                (72, 660, 880, 580),
+            ]
+        )
+        overlays = layout.canvas_overlays()
+        self.assertEqual([box(overlay) for overlay in overlays], [
+            (972, 660, 880, 580)
+        ])
+        self.assertEqual(overlays[0].source, '/logo.jpg')
+        self.assertEqual(overlays[0].fit, Placement.CENTER)
+        self.assertEqual(layout.top_overlays(), [])
+
+    def test_no_logo(self):
+        layout = load_layout(None, 1924, 1300, None, 3)
+        self.assertEqual(layout.overlays, [])
+
+    def test_strips(self):
+        layout = load_layout(STRIPS, 1924, 1300, '/logo.jpg', 3)
+        self.assertEqual((layout.width, layout.height), (1200, 1800))
+        slots = layout.photo_slots(0)
+        self.assertEqual([box(slot) for slot in slots], [
+            (30, 30, 555, 412),
+            (615, 30, 555, 412),
+        ])
+        self.assertEqual(
+            [slot.fit for slot in slots],
+            [Placement.COVER] * 2
+        )
+        self.assertTrue(slots[0].same_render(slots[1]))
+
+    def test_box_and_rotate(self):
+        layout = load_layout(self.write('''
+            [layout]
+            padding = 5
+
+            [slot 1]
+            photo = 1
+            box = 0, 0, 100, 200
+            rotate = -90
+
+            [overlay frame]
+            image = /frame.png
+            box = 0, 0, 100, 200
+            padding = 0
+            above = yes
+            '''), 100, 200, None, 1)
+        slot = layout.photo_slots(0)[0]
+        self.assertEqual(box(slot), (5, 5, 90, 190))
+        self.assertEqual(slot.rotate, 270)
+        self.assertEqual(
+            [box(overlay) for overlay in layout.top_overlays()],
+            [(0, 0, 100, 200)]
+        )
+
+    def test_missing_photo(self):
+        path = self.write('''
+            [slot 1]
+            photo = 1
+            box = 0, 0, 10, 10
+            ''')
+        self.assertRaisesRegexp(
+            LayoutError,
+            'no slot for photo 2, 3',
+            load_layout,
+            path,
+            100,
+            100,
+            None,
+            3
+        )
+
+    def test_invalid(self):
+        for slot in (
+            'photo = 2\nbox = 0, 0, 10, 10',
+            'photo = 1',
+            'photo = 1\ncell = 1',
+            'photo = 1\nbox = 0, 0, 10',
+            'photo = 1\nbox = 0, 0, 10, 10\nrotate = 45',
+            'photo = 1\nbox = 0, 0, 10, 10\nfit = stretch',
+        ):
+            path = self.write('[slot 1]\n' + slot + '\n')
+            self.assertRaises(
+                LayoutError,
+                load_layout,
+                path,
+                100,
+                100,
+                None,
+                1
+            )
+
+    def test_grid_does_not_fit(self):
+        path = self.write('''
+            [layout]
+            grid = 2x2
+            margin = 60
+
+            [slot 1]
+            photo = 1
+            cell = 1
+            ''')
+        self.assertRaises(LayoutError, load_layout, path, 100, 100, None, 1)
+
+    def test_unreadable(self):
+        self.assertRaises(
+            LayoutError,
+            load_layout,
+            os.path.join(self.directory, 'missing.cfg'),
+            100,
+            100,
+            None,
+            1
+        )
+
+
+class ParseMarginTest(unittest.TestCase):
+    def test_shorthand(self):
+        self.assertEqual(parse_margin('1'), [1, 1, 1, 1])
+        self.assertEqual(parse_margin('1, 2'), [1, 2, 1, 2])
+        self.assertEqual(parse_margin('1, 2, 3, 4'), [1, 2, 3, 4])
+        self.assertRaises(LayoutError, parse_margin, '1, 2, 3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import unittest
+
+from ui.photoboothstate import PhotoboothState
+
+SESSION = [
+    PhotoboothState.START,
+    PhotoboothState.PHOTO,
+    PhotoboothState.PHOTO_COMPLETE,
+    PhotoboothState.PHOTO,
+    PhotoboothState.PHOTO_COMPLETE,
+    PhotoboothState.PHOTO,
+    PhotoboothState.PHOTO_COMPLETE,
+]
+
+
+class PhotoboothStateTest(unittest.TestCase):
+    def setUp(self):
+        self.skip_select = False
+        self.state_machine = PhotoboothState(
+            {PhotoboothState.SKIP_SELECT: lambda: self.skip_select}
+        )
+        self.transitions = []
+        self.state_machine.bind(
+            lambda old, new, entered, left:
+                self.transitions.append((old, new))
+        )
+
+    def dispatch(self, *events):
+        for event in events:
+            self.state_machine.dispatch(event)
+
+    def test_session(self):
+        self.dispatch(*SESSION)
+        self.assertEqual(self.state_machine.state, PhotoboothState.SELECTING)
+        self.assertEqual(
+            [new for _, new in self.transitions],
+            [
+                PhotoboothState.COUNTDOWN1,
+                PhotoboothState.PHOTO1,
+                PhotoboothState.COUNTDOWN2,
+                PhotoboothState.PHOTO2,
+                PhotoboothState.COUNTDOWN3,
+                PhotoboothState.PHOTO3,
+                PhotoboothState.SELECTING,
+            ]
+        )
+
+        self.dispatch(PhotoboothState.PRINT)
+        self.assertEqual(self.state_machine.state, PhotoboothState.WAITING)
+
+    def test_guard(self):
+        self.skip_select = True
+        self.dispatch(*SESSION)
+        self.assertEqual(self.state_machine.state, PhotoboothState.WAITING)
+
+    def test_handler(self):
+        handled = []
+        self.state_machine.on(
+            PhotoboothState.START,
+            lambda old, new: handled.append((old, new))
+        )
+        self.dispatch(PhotoboothState.START)
+        self.assertEqual(
+            handled,
+            [(PhotoboothState.WAITING, PhotoboothState.COUNTDOWN1)]
+        )
+
+    def test_rejected(self):
+        rejected = []
+        self.state_machine.on_rejected(
+            lambda state, event: rejected.append((state, event))
+        )
+        self.dispatch(PhotoboothState.PRINT)
+        self.assertEqual(self.state_machine.state, PhotoboothState.WAITING)
+        self.assertEqual(self.transitions, [])
+        self.assertEqual(
+            rejected,
+            [(PhotoboothState.WAITING, PhotoboothState.PRINT)]
+        )
+        self.assertEqual(
+            self.state_machine.rejected[
+                (PhotoboothState.WAITING, PhotoboothState.PRINT)
+            ],
+            1
+        )
+
+    def test_no_guard_allows(self):
+        state_machine = PhotoboothState({PhotoboothState.SKIP_SELECT: bool})
+        state_machine.TRANSITIONS = {
+            (PhotoboothState.WAITING, PhotoboothState.START): [
+                (PhotoboothState.SKIP_SELECT, PhotoboothState.COUNTDOWN1)
+            ],
+        }
+        rejected = []
+        state_machine.on_rejected(
+            lambda state, event: rejected.append((state, event))
+        )
+        state_machine.dispatch(PhotoboothState.START)
+        self.assertEqual(state_machine.state, PhotoboothState.WAITING)
+        self.assertEqual(
+            rejected,
+            [(PhotoboothState.WAITING, PhotoboothState.START)]
+        )
+
+    def test_events_from_handlers_are_queued(self):
+        states = []
+
+        def start(old, new):
+            # Handled after this handler returns, not in the middle of it.
+            self.state_machine.dispatch(PhotoboothState.PHOTO)
+            states.append(self.state_machine.state)
+
+        self.state_machine.on(PhotoboothState.START, start)
+        self.state_machine.on(
+            PhotoboothState.PHOTO,
+            lambda old, new: states.append(self.state_machine.state)
+        )
+        self.dispatch(PhotoboothState.START)
+        self.assertEqual(
+            states,
+            [PhotoboothState.COUNTDOWN1, PhotoboothState.PHOTO1]
+        )
+        self.assertFalse(self.state_machine.dispatching)
+
+    def test_handler_error_does_not_block_events(self):
+        def start(old, new):
+            raise RuntimeError('camera unplugged')
+
+        self.state_machine.on(PhotoboothState.START, start)
+        self.assertRaises(
+            RuntimeError,
+            self.state_machine.dispatch,
+            PhotoboothState.START
+        )
+        self.dispatch(PhotoboothState.PHOTO)
+        self.assertEqual(self.state_machine.state, PhotoboothState.PHOTO1)
+
+    def test_report(self):
+        self.dispatch(*SESSION)
+        self.dispatch(PhotoboothState.PHOTO)
+        lines = self.state_machine.report()
+        self.assertIn(
+            'rejected {} in {}: 1'.format(
+                PhotoboothState.PHOTO,
+                PhotoboothState.SELECTING
+            ),
+            lines
+        )
+        self.assertTrue(any(
+            line.startswith(PhotoboothState.SELECTING) for line in lines
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
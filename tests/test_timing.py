@@ -0,0 +1,59 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import unittest
+
+from pipeline.timing import percentile, summarize
+
+
+def make_record(profile, *durations):
+    return {
+        'tags': {'camera_profile': profile},
+        'spans': [
+            {'kind': 'stage', 'name': 'download', 'duration': duration}
+            for duration in durations
+        ],
+    }
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(percentile(values, 50), 3)
+        self.assertEqual(percentile(values, 95), 5)
+        self.assertEqual(percentile(values, 0), 1)
+
+
+class SummarizeTest(unittest.TestCase):
+    def test_collects_durations(self):
+        durations = summarize([
+            make_record('fast', 1.0, 2.0),
+            make_record('slow', 3.0),
+        ])
+        self.assertEqual(durations, {('stage', 'download'): [1.0, 2.0, 3.0]})
+
+    def test_group_by_tag(self):
+        durations = summarize(
+            [
+                make_record('fast', 1.0),
+                make_record('slow', 3.0),
+                {'spans': [
+                    {'kind': 'stage', 'name': 'download', 'duration': 2.0}
+                ]},
+            ],
+            group_by='camera_profile'
+        )
+        self.assertEqual(durations, {
+            ('stage', 'download [fast]'): [1.0],
+            ('stage', 'download [slow]'): [3.0],
+            ('stage', 'download [-]'): [2.0],
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
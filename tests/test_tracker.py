@@ -0,0 +1,84 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from printer.fileprinter import FilePrinter
+from printer.tracker import PrintTracker
+
+PRINT_TIME = 0.3
+
+
+class PrintTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.photo = os.path.join(self.directory, 'composite.jpg')
+        with open(self.photo, 'wb') as fp:
+            fp.write(b'print')
+
+        self.printer = FilePrinter(
+            os.path.join(self.directory, 'printer'),
+            PRINT_TIME
+        )
+        self.tracker = None
+
+    def tearDown(self):
+        if self.tracker:
+            self.tracker.stop()
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def start_tracker(self, max_jobs):
+        self.tracker = PrintTracker(self.printer, max_jobs, interval=0.01)
+        self.tracker.start()
+
+    def test_submit(self):
+        self.start_tracker(2)
+        job_id = self.tracker.submit(self.photo, 'session')
+        self.assertEqual(self.tracker.depth(), 1)
+        self.assertEqual(
+            os.listdir(self.printer.directory),
+            ['{}-session.jpg'.format(job_id)]
+        )
+
+        time.sleep(PRINT_TIME * 2)
+        self.assertEqual(self.tracker.depth(), 0)
+
+    def test_holds_jobs_over_max_jobs(self):
+        self.start_tracker(1)
+        self.tracker.submit(self.photo, 'first')
+        submitted = threading.Event()
+        second = threading.Thread(
+            target=lambda: (
+                self.tracker.submit(self.photo, 'second'),
+                submitted.set()
+            )
+        )
+        second.daemon = True
+        second.start()
+
+        # Held while the first job prints.
+        self.assertFalse(submitted.wait(PRINT_TIME / 2))
+        self.assertEqual(len(os.listdir(self.printer.directory)), 1)
+
+        # Submitted once it is done.
+        self.assertTrue(submitted.wait(PRINT_TIME * 5))
+        self.assertEqual(self.tracker.depth(), 1)
+        self.assertEqual(len(os.listdir(self.printer.directory)), 2)
+
+    def test_max_jobs_at_least_1(self):
+        self.assertRaises(ValueError, PrintTracker, self.printer, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
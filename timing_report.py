@@ -0,0 +1,68 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import argparse
+import os
+
+from pipeline.timing import percentile, read_timelines, summarize
+
+
+def parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Summarize photobooth session timelines.'
+    )
+    parser.add_argument(
+        'logs',
+        nargs='*',
+        default=['~/.cache/photobooth/timing.jsonl'],
+        help='Timing logs written by photobooth.py --timing-log.'
+    )
+    parser.add_argument(
+        '--group-by',
+        default=None,
+        help='Split each span by the value of this session tag, e.g. '
+             'camera_profile to compare download times between camera '
+             'profiles.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_command_line()
+    records = list(
+        read_timelines(os.path.expanduser(log) for log in args.logs)
+    )
+
+    statuses = {}
+    for record in records:
+        statuses[record['status']] = statuses.get(record['status'], 0) + 1
+
+    print('{} sessions: {}'.format(
+        len(records),
+        ', '.join(
+            '{} {}'.format(count, status)
+            for status, count in sorted(statuses.items())
+        )
+    ))
+    print('')
+
+    row = '{:<6} {:<28} {:>6} {:>8} {:>8} {:>8} {:>10}'
+    print(row.format('kind', 'name', 'count', 'p50', 'p95', 'max', 'total'))
+    for (kind, name), durations in sorted(summarize(records, args.group_by).items()):
+        print(row.format(
+            kind,
+            name,
+            len(durations),
+            '{:.3f}'.format(percentile(durations, 50)),
+            '{:.3f}'.format(percentile(durations, 95)),
+            '{:.3f}'.format(max(durations)),
+            '{:.1f}'.format(sum(durations))
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -7,58 +7,192 @@ See LICENSE.txt at the root of the project or
 https://opensource.org/licenses/BSD-3-Clause
 """
 import os
-import shlex
-import shutil
-import subprocess
+import time
 
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.logger import Logger
 from kivy.uix.screenmanager import NoTransition
 
-import datetime
-
+from camera.backend import make_camera
+from camera.framesources import make_frame_source
+from camera.profiles import load_camera_profile
+from camera.session import CameraSession
+from imaging.assetcache import AssetCache
+from imaging.buffers import BufferStore, shared_memory_dir
+from imaging.compositor import make_compositor
+from imaging.thumbnails import make_thumbnail
+from imaging.workerpool import WorkerPool
+from pipeline.archive import ArchiveWriter
+from pipeline.jobs import PoolJob, ThreadJob, on_complete
+from pipeline.journal import SessionJournal
+from pipeline.printqueue import PrintQueue
+from pipeline.session import Session
+from pipeline.startup import StartupTimer
+from pipeline.timing import Timeline, TimingLog
+from printer.backend import make_printer
+from printer.tracker import PrintTracker
 from ui.photoboothstate import PhotoboothState
 from ui.screens import ScreenMgr
+from ui.texttextures import TextTextureCache
 
 
 class PhotoboothApp(App):
-    def __init__(self, settings, **kwargs):
+    # Index of the photo taken in each photo state.
+    photo_index = {
+        PhotoboothState.PHOTO1: 0,
+        PhotoboothState.PHOTO2: 1,
+        PhotoboothState.PHOTO3: 2,
+    }
+
+    def __init__(self, settings, startup=None, worker_pool=None, **kwargs):
+        """
+        Args:
+            settings (PhotoboothSettings):
+            startup (pipeline.startup.StartupTimer): records startup phases.
+            worker_pool (imaging.workerpool.WorkerPool): pool forked before
+                any threads were started, or None to fork one now.
+        """
         Logger.info('PhotoboothApp: __init__().')
 
         super(PhotoboothApp, self).__init__(**kwargs)
 
         self.settings = settings
+        self.startup = startup or StartupTimer()
+        self.startup.bind(
+            lambda: Clock.schedule_once(lambda dt: self.startup_event())
+        )
+        self.startup.expect('first frame')
+        self.started = None
+
+        # Fork the workers before any other threads, or the UI, exist.
+        self.worker_pool = worker_pool
+        if self.worker_pool is None:
+            with self.startup.phase('worker pool'):
+                self.worker_pool = WorkerPool(self.settings.workers or None)
+
+        Logger.info(
+            'PhotoboothApp: %s image workers.',
+            self.worker_pool.workers
+        )
         self.sm = None
-        self.state_machine = PhotoboothState()
+        self.state_machine = PhotoboothState({
+            PhotoboothState.SKIP_SELECT: lambda: self.settings.skip_select
+        })
+        self.state_machine.bind(self.transition_event)
+        for event, action in (
+            (PhotoboothState.START, self.countdown_action),
+            (PhotoboothState.PHOTO, self.photo_action),
+            (PhotoboothState.PHOTO_COMPLETE, self.photo_complete_action),
+            (PhotoboothState.CANCEL, self.cancel_action),
+            (PhotoboothState.PRINT, self.print_action)
+        ):
+            self.state_machine.on(event, action)
+
+        self.state_machine.on_rejected(self.rejected_event)
         self.countdown = None
-        self.processes = []
-        photobuffer = '/tmp/photobooth'
-        self.photonames = {
-            PhotoboothState.PHOTO1: os.path.join(photobuffer, 'photo1.jpg'),
-            PhotoboothState.PHOTO2: os.path.join(photobuffer, 'photo2.jpg'),
-            PhotoboothState.PHOTO3: os.path.join(photobuffer, 'photo3.jpg'),
-        }
-        self.montage_image = os.path.join(photobuffer, 'montage.jpg')
-        self.canvas_image = os.path.join(photobuffer, 'canvas.jpg')
-        self.print_image = os.path.join(photobuffer, 'composite.jpg')
-        if not os.path.exists(photobuffer):
-            os.makedirs(photobuffer)
+        self.session = None
+        self.text_textures = TextTextureCache()
+        self.photobuffer = shared_memory_dir('photobooth')
+        self.canvas_image = os.path.join(self.photobuffer, 'canvas.jpg')
+        if not os.path.exists(self.photobuffer):
+            os.makedirs(self.photobuffer)
 
         if self.settings.save and not os.path.exists(self.settings.save):
             os.makedirs(self.settings.save)
 
-        cmd = (
-            'convert '
-            '-size {width}x{height} '
-            'xc: {color} '
-            '{filename}'.format(
-                width=self.settings.image_width,
-                height=self.settings.image_height,
-                color=self.settings.background_color,
-                filename=self.canvas_image
+        with self.startup.phase('compositor'):
+            self.compositor = make_compositor(
+                self.settings.compositor,
+                self.settings.image_width,
+                self.settings.image_height,
+                self.settings.background_color,
+                self.settings.logo,
+                AssetCache(os.path.expanduser('~/.cache/photobooth')),
+                BufferStore(os.path.join(self.photobuffer, 'buffers')),
+                self.settings.debug_intermediates,
+                self.settings.layout,
+                Session.PHOTO_COUNT
+            )
+
+        # The canvas is not needed until the first print is composed.
+        self.canvas_job = ThreadJob(
+            self.startup.timed('canvas', self.compositor.make_canvas),
+            self.canvas_image
+        )
+
+        with self.startup.phase('camera session'):
+            self.camera = CameraSession(
+                make_camera(
+                    self.settings.camera,
+                    self.settings.camera_card_folder
+                ),
+                load_camera_profile(
+                    self.settings.camera_profile,
+                    self.compositor.layout
+                ),
+                self.settings.camera_storage
             )
+            self.camera.start()
+
+        # Opening the camera is left to the camera session's thread.
+        self.startup.expect('camera')
+        on_complete([self.camera.opened], self.camera_opened_event)
+
+        self.live_view = None
+        source = make_frame_source(
+            self.settings.viewfinder,
+            self.camera,
+            self.settings.viewfinder_device,
+            self.settings.viewfinder_fps
         )
-        subprocess.call(shlex.split(cmd))
+        if source:
+            # Only load Pillow's decoder, and the rest of the live view, if
+            # there is one.
+            from camera.liveview import LiveView
+            self.live_view = LiveView(source)
+
+        self.print_tracker = None
+        if self.settings.printer:
+            self.print_tracker = PrintTracker(
+                make_printer(
+                    self.settings.print_backend,
+                    self.settings.printer
+                ),
+                self.settings.max_print_jobs
+            )
+            self.print_tracker.start()
+
+        self.archive = None
+        if self.settings.save:
+            self.archive = ArchiveWriter(self.settings.save)
+            self.archive.start()
+
+        timing_log = None
+        if self.settings.timing_log:
+            timing_log = TimingLog(self.settings.timing_log)
+
+        self.journal = None
+        unfinished = []
+        if self.settings.journal:
+            with self.startup.phase('journal'):
+                self.journal = SessionJournal(self.settings.journal)
+                unfinished = self.journal.unfinished(Session.PHOTO_COUNT)
+                self.journal.start()
+
+        self.print_queue = PrintQueue(
+            self.compositor,
+            self.canvas_image,
+            self.canvas_job,
+            self.archive,
+            self.settings.save_raw,
+            self.print_tracker,
+            timing_log,
+            self.journal
+        )
+        self.print_queue.start()
+        for entry in unfinished:
+            self.resume_session(entry)
 
     def build(self):
         """Build UI.
@@ -68,239 +202,304 @@ class PhotoboothApp(App):
         """
         Logger.info('PhotoboothApp: build().')
 
-        self.sm = ScreenMgr(self, transition=NoTransition())
+        with self.startup.phase('build'):
+            self.sm = ScreenMgr(self, transition=NoTransition())
+
+        self.started = time.time()
         return self.sm
 
+    def on_start(self):
+        Logger.info('PhotoboothApp: on_start().')
+        # Kivy opens the window between build() and on_start().
+        now = time.time()
+        self.startup.record('window', self.started, now)
+        self.started = now
+        self.root_window.bind(on_flip=self.first_frame_event)
+
+    def first_frame_event(self, window):
+        """The waiting screen is up. Start on the deferred work."""
+        window.unbind(on_flip=self.first_frame_event)
+        self.startup.record('first frame', self.started, time.time())
+        Clock.schedule_once(self.sm.build_deferred)
+
+    def camera_opened_event(self):
+        start, end = self.camera.opened.result
+        self.startup.record('camera', start, end, deferred=True)
+
+    def startup_event(self):
+        """Everything started."""
+        report = self.startup.report()
+        for line in report:
+            Logger.info('PhotoboothApp: %s', line)
+
+        if self.settings.measure_startup:
+            print('\n'.join(report))
+            self.stop()
+
+    def on_stop(self):
+        Logger.info('PhotoboothApp: on_stop().')
+        for line in self.state_machine.report():
+            Logger.info('PhotoboothApp: %s', line)
+
+        if self.live_view:
+            self.live_view.stop()
+
+        self.camera.stop()
+        self.print_queue.stop()
+        if self.print_tracker:
+            self.print_tracker.stop()
+
+        if self.archive:
+            self.archive.stop()
+
+        if self.journal:
+            self.journal.stop()
+
+        self.worker_pool.terminate()
+
+    def transition_event(self, old_state, new_state, entered, left):
+        """Record time spent in each state of a session."""
+        if self.session and old_state != PhotoboothState.WAITING:
+            self.session.timeline.record(
+                old_state,
+                entered,
+                left,
+                kind=Timeline.STATE
+            )
+
     def start_event(self):
         """Waiting screen start button pressed."""
         Logger.info('PhotoboothApp: start_event().')
 
-        self.state_machine.transition_to(PhotoboothState.COUNTDOWN1)
-        self.sm.pb_screens[ScreenMgr.COUNTDOWN].start_countdown(
-            self.settings.initial_wait_time
-        )
-        self.sm.current = ScreenMgr.COUNTDOWN
+        self.session = Session(self.photobuffer)
+        self.state_machine.dispatch(PhotoboothState.START)
 
     def photo_event(self):
         """Time to take a picture."""
         Logger.info('PhotoboothApp: photo_event().')
 
-        if self.state_machine.state not in (
-            PhotoboothState.COUNTDOWN1,
-            PhotoboothState.COUNTDOWN2,
-            PhotoboothState.COUNTDOWN3
-        ):
-            Logger.error(
-                'photo event occurred unexpectedly in "%s"',
-                self.state_machine.state
-            )
-            self.sm.current = ScreenMgr.WAITING
-            self.state_machine.transition_to(PhotoboothState.WAITING)
-            return
-
-        if self.state_machine.state == PhotoboothState.COUNTDOWN1:
-            state = PhotoboothState.PHOTO1
-        elif self.state_machine.state == PhotoboothState.COUNTDOWN2:
-            state = PhotoboothState.PHOTO2
-        else:
-            state = PhotoboothState.PHOTO3
-
-        # Update UI.
-        self.sm.pb_screens[ScreenMgr.CHEESE].on_entry()
-        self.sm.current = ScreenMgr.CHEESE
-
-        # Take the picture.
-        self.capture_image(self.photonames[state])
-
-        self.state_machine.transition_to(state)
+        self.state_machine.dispatch(PhotoboothState.PHOTO)
 
     def photo_complete_event(self):
         """Camera finished taking picture."""
         Logger.info('PhotoboothApp: photo_complete_event().')
 
-        if self.state_machine.state not in (
-            PhotoboothState.PHOTO1,
-            PhotoboothState.PHOTO2,
-            PhotoboothState.PHOTO3
-        ):
-            Logger.error(
-                'photo complete event occurred unexpectedly in "%s"',
-                self.state_machine.state
-            )
-            self.sm.current = ScreenMgr.WAITING
-            self.state_machine.transition_to(PhotoboothState.WAITING)
-            return
-
-        if self.state_machine.state == PhotoboothState.PHOTO1:
-            state = PhotoboothState.COUNTDOWN2
-            self.sm.pb_screens[ScreenMgr.COUNTDOWN].start_countdown(
-                self.settings.wait_time
-            )
-            self.sm.current = ScreenMgr.COUNTDOWN
-        elif self.state_machine.state == PhotoboothState.PHOTO2:
-            state = PhotoboothState.COUNTDOWN3
-            self.sm.pb_screens[ScreenMgr.COUNTDOWN].start_countdown(
-                self.settings.wait_time
-            )
-            self.sm.current = ScreenMgr.COUNTDOWN
-        else:
-            if self.settings.skip_select:
-                state = PhotoboothState.PRINTING
-                self.sm.pb_screens[ScreenMgr.PRINTING].on_entry()
-                self.sm.current = ScreenMgr.PRINTING
-            else:
-                state = PhotoboothState.SELECTING
-                self.sm.pb_screens[ScreenMgr.SELECTING].on_entry()
-                self.sm.current = ScreenMgr.SELECTING
-
-        self.state_machine.transition_to(state)
+        self.sm.screen(ScreenMgr.CHEESE).on_exit()
+        self.state_machine.dispatch(PhotoboothState.PHOTO_COMPLETE)
 
     def cancel_event(self):
         """Session canceled."""
         Logger.info('PhotoboothApp: cancel_event().')
 
-        if self.state_machine.state != PhotoboothState.SELECTING:
-            Logger.error(
-                'cancel event occurred unexpectedly in "%s"',
-                self.state_machine.state
-            )
-
-        self.sm.current = ScreenMgr.WAITING
-        self.state_machine.transition_to(PhotoboothState.WAITING)
+        self.state_machine.dispatch(PhotoboothState.CANCEL)
 
     def print_event(self):
         """Print request."""
         Logger.info('PhotoboothApp: print_event().')
 
-        if self.state_machine.state != PhotoboothState.SELECTING:
-            Logger.error(
-                'print event occurred unexpectedly in "%s"',
-                self.state_machine.state
+        self.state_machine.dispatch(PhotoboothState.PRINT)
+
+    def countdown_action(self, old_state, new_state):
+        """Count down to the next photo."""
+        self.sm.screen(ScreenMgr.COUNTDOWN).start_countdown(
+            self.settings.initial_wait_time
+            if new_state == PhotoboothState.COUNTDOWN1 else
+            self.settings.wait_time
+        )
+        self.sm.current = ScreenMgr.COUNTDOWN
+
+    def photo_action(self, old_state, new_state):
+        """Take the picture."""
+        self.sm.screen(ScreenMgr.CHEESE).on_entry()
+        self.sm.current = ScreenMgr.CHEESE
+        on_complete(
+            self.capture_image(
+                self.session.photos[self.photo_index[new_state]]
+            ),
+            self.photo_complete_event
+        )
+
+    def photo_complete_action(self, old_state, new_state):
+        """Process the photo while the next one is taken."""
+        idx = self.photo_index[old_state]
+        if self.journal:
+            self.journal.keep(
+                self.session,
+                self.session.photos[idx],
+                SessionJournal.CAPTURED,
+                index=idx
             )
+
+        self.resize_image(idx)
+        if not self.settings.skip_select:
+            self.thumbnail_image(idx)
+
+        if new_state == PhotoboothState.SELECTING:
+            self.sm.screen(ScreenMgr.SELECTING).on_entry()
+            self.sm.current = ScreenMgr.SELECTING
+
+        elif new_state == PhotoboothState.WAITING:
             self.sm.current = ScreenMgr.WAITING
+            self.submit_session()
+
+        else:
+            self.countdown_action(old_state, new_state)
+
+    def cancel_action(self, old_state, new_state):
+        self.sm.current = ScreenMgr.WAITING
+        self.discard_session()
+
+    def print_action(self, old_state, new_state):
+        self.sm.current = ScreenMgr.WAITING
+        self.submit_session()
+
+    def rejected_event(self, state, event):
+        """Event that is not allowed in state. Start over."""
+        self.sm.current = ScreenMgr.WAITING
+        if state != PhotoboothState.WAITING:
             self.state_machine.transition_to(PhotoboothState.WAITING)
-            return
 
-        self.sm.pb_screens[ScreenMgr.PRINTING].on_entry()
-        self.sm.current = ScreenMgr.PRINTING
-        self.state_machine.transition_to(PhotoboothState.PRINTING)
+        self.discard_session()
 
     def capture_image(self, filename):
-        """Launch process to capture image with camera."""
+        """Queue request to capture image with camera.
+
+        Returns:
+            list of jobs to wait on.
+        """
         Logger.info('PhotoboothApp: capture_image(%s).', filename)
 
-        cmd = (
-            'gphoto2 '
-            '--capture-image-and-download '
-            '--filename {filename} '
-            '--keep '
-            '--force-overwrite'.format(filename=filename)
+        job = self.camera.capture(
+            filename,
+            self.session.timeline,
+            self.settings.burst
         )
-        cmd = shlex.split(cmd)
-        self.processes = [subprocess.Popen(cmd)]
-
-    def resize_images(self):
-        """Launch processes to resize images."""
-        Logger.info('PhotoboothApp: resize_images().')
-
-        cmd = 'convert {src} -resize {width}x{height} {dest}'
-        self.processes = [
-            subprocess.Popen(
-                shlex.split(
-                    cmd.format(
-                        src=fname,
-                        width=880,
-                        height=580,
-                        dest=self.resized(fname)
-                    )
-                )
+        if self.settings.burst > 1:
+            job = ThreadJob(
+                self.pick_frame,
+                job,
+                filename,
+                self.session.timeline
             )
-            for fname in self.photonames.itervalues()
-        ]
 
-    def compose_photo(self):
-        """Launch process to compose photo."""
-        Logger.info('PhotoboothApp: compose_print().')
-
-        cmd = (
-            'montage {photo1} {photo2} {photo3} {logo} '
-            '-mode concatenate '
-            '-tile 2 '
-            '-frame 10 '
-            '-mattecolor none '
-            '-background {background_color} '
-            '{dest}'.format(
-                photo1=self.resized(self.photonames[PhotoboothState.PHOTO1]),
-                photo2=self.resized(self.photonames[PhotoboothState.PHOTO2]),
-                photo3=self.resized(self.photonames[PhotoboothState.PHOTO3]),
-                logo=self.settings.logo,
-                background_color=self.settings.background_color,
-                dest=self.montage_image
+        return [job]
+
+    def pick_frame(self, capture_job, filename, timeline):
+        """Keep the best photo of a burst as filename."""
+        from pipeline.burst import keep_best_frame
+
+        if capture_job.wait() != 0:
+            raise capture_job.error
+
+        result = keep_best_frame(
+            self.worker_pool,
+            capture_job.result['frames'],
+            filename,
+            self.settings.burst_eye_weight,
+            timeline
+        )
+        if result['elapsed'] > self.settings.wait_time:
+            Logger.warning(
+                'PhotoboothApp: picking a frame took %.3fs, longer than the '
+                '%ss wait time.',
+                result['elapsed'],
+                self.settings.wait_time
             )
+
+        return result
+
+    def resize_image(self, idx, session=None):
+        """Launch job to resize photo idx of session, or of the current
+        session.
+        """
+        Logger.info('PhotoboothApp: resize_image(%s).', idx)
+
+        session = session or self.session
+        fname = session.photos[idx]
+        task = self.compositor.resize_task(
+            fname,
+            session.resized(fname),
+            idx
         )
-        self.processes = [subprocess.Popen(shlex.split(cmd))]
-
-    def composite_photo(self):
-        Logger.info('PhotoboothApp: composite_print().')
-
-        cmd = (
-            'composite '
-            '-gravity center '
-            '{montage} {canvas} {composite}'.format(
-                montage=self.montage_image,
-                canvas=self.canvas_image,
-                composite=self.print_image
+        if task:
+            session.resize_jobs[idx] = PoolJob(
+                self.worker_pool,
+                'resize',
+                task[0],
+                task[1],
+                session.timeline,
+                os.path.basename(fname)
+            )
+        else:
+            session.resize_jobs[idx] = ThreadJob(
+                session.timeline.timed(
+                    'resize',
+                    self.compositor.resize,
+                    os.path.basename(fname)
+                ),
+                fname,
+                session.resized(fname),
+                idx
             )
+
+    def thumbnail_image(self, idx):
+        """Launch job to make a screen-sized preview of photo idx."""
+        Logger.info('PhotoboothApp: thumbnail_image(%s).', idx)
+
+        # Previews are shown in a 2x2 grid.
+        size = (self.root.width // 2, self.root.height // 2)
+        self.session.thumbnail_jobs[idx] = PoolJob(
+            self.worker_pool,
+            'thumbnail',
+            make_thumbnail,
+            (self.session.photos[idx], self.session.thumbnails[idx], size),
+            self.session.timeline,
+            os.path.basename(self.session.photos[idx])
         )
-        self.processes = [subprocess.Popen(shlex.split(cmd))]
 
-    def print_photo(self):
-        """Launch process to print photo."""
-        Logger.info('PhotoboothApp: print_photo().')
+    def submit_session(self):
+        """Hand the current session to the print queue."""
+        Logger.info('PhotoboothApp: submit_session().')
 
-        if self.settings.save:
-            dest = os.path.join(
-                self.settings.save,
-                'img_{}.jpg'.format(
-                    datetime.datetime.now().strftime('%H%M%S')
-                )
-            )
-            Logger.info('Saving photo to %s.', dest)
-            shutil.copy(self.print_image, dest)
+        for idx in range(len(self.session.photos)):
+            if idx not in self.session.resize_jobs:
+                self.resize_image(idx)
 
-        if self.settings.printer:
-            cmd = (
-                'lp '
-                '-d {printer} '
-                '{photo}'.format(
-                    printer=self.settings.printer,
-                    photo=self.print_image
-                )
-            )
-            Logger.info('Printing photo. %s', cmd)
-            self.processes = [subprocess.Popen(shlex.split(cmd))]
+        if self.journal:
+            self.journal.record(self.session, SessionJournal.SUBMITTED)
 
-        else:
-            self.processes = []
+        self.print_queue.submit(self.session)
+        self.session = None
 
-    def print_complete(self):
-        """Print photo process complete."""
-        Logger.info('PhotoboothApp: print_complete().')
+    def resume_session(self, entry):
+        """Hand a session that an earlier run did not finish back to the
+        print queue, from its last finished stage.
 
-        self.sm.current = ScreenMgr.WAITING
-        self.state_machine.transition_to(PhotoboothState.WAITING)
+        Args:
+            entry (pipeline.journal.JournalSession):
+        """
+        Logger.info('PhotoboothApp: resume_session(%s).', entry)
 
-    def processing(self):
-        """Check to see if we are still background processing anything."""
-        Logger.info('PhotoboothApp: processing().')
+        session = Session(self.photobuffer, entry.name)
+        session.photos = [
+            entry.photos[idx]
+            for idx in range(Session.PHOTO_COUNT)
+        ]
+        session.stages = entry.stages
+        session.timeline.tags['resumed'] = 'yes'
+        if SessionJournal.COMPOSED in session.stages:
+            session.print_image = entry.files[SessionJournal.COMPOSED]
+
+        else:
+            for idx in range(Session.PHOTO_COUNT):
+                self.resize_image(idx, session)
 
-        if any((process.poll() is None for process in self.processes)):
-            # Still processing.
-            return True
+        self.print_queue.submit(session)
 
-        return False
+    def discard_session(self):
+        """Throw away the current session."""
+        Logger.info('PhotoboothApp: discard_session().')
 
-    @staticmethod
-    def resized(name):
-        base, ext = os.path.splitext(name)
-        return '{base}_resized{ext}'.format(base=base, ext=ext)
+        if self.session:
+            self.print_queue.discard(self.session)
+            self.session = None
@@ -6,10 +6,26 @@ This software is licensed under the BSD 3-Clause License.
 See LICENSE.txt at the root of the project or
 https://opensource.org/licenses/BSD-3-Clause
 """
+import collections
+import time
+
 from kivy.logger import Logger
 
 
 class PhotoboothState(object):
+    """Table driven state machine.
+
+    Events are queued, and handled one at a time, in the order they were
+    dispatched, so an event dispatched while another is being handled (e.g.
+    by a handler) waits for that one to finish. The next state is looked up
+    in TRANSITIONS by the current state and the event. Events that have no
+    entry for the current state are rejected.
+
+    Each transition is counted, and the time its handlers took is recorded,
+    as is the time spent in each state, for report().
+
+    Events must be dispatched from the Kivy main thread.
+    """
     WAITING = 'waiting state'
     COUNTDOWN1 = 'countdown 1 state'
     PHOTO1 = 'photo 1 state'
@@ -18,16 +34,183 @@ class PhotoboothState(object):
     COUNTDOWN3 = 'countdown 3 state'
     PHOTO3 = 'photo 3 state'
     SELECTING = 'selecting state'
-    PRINTING = 'printing state'
 
-    def __init__(self):
+    START = 'start event'
+    PHOTO = 'photo event'
+    PHOTO_COMPLETE = 'photo complete event'
+    CANCEL = 'cancel event'
+    PRINT = 'print event'
+
+    # Guards, set by whoever owns the state machine.
+    SKIP_SELECT = 'skip select'
+
+    # (state, event): [(guard, next state), ...]. The first entry whose guard
+    # is None, or true, is taken.
+    TRANSITIONS = {
+        (WAITING, START): [(None, COUNTDOWN1)],
+        (COUNTDOWN1, PHOTO): [(None, PHOTO1)],
+        (PHOTO1, PHOTO_COMPLETE): [(None, COUNTDOWN2)],
+        (COUNTDOWN2, PHOTO): [(None, PHOTO2)],
+        (PHOTO2, PHOTO_COMPLETE): [(None, COUNTDOWN3)],
+        (COUNTDOWN3, PHOTO): [(None, PHOTO3)],
+        (PHOTO3, PHOTO_COMPLETE): [
+            (SKIP_SELECT, WAITING),
+            (None, SELECTING)
+        ],
+        (SELECTING, CANCEL): [(None, WAITING)],
+        (SELECTING, PRINT): [(None, WAITING)],
+    }
+
+    def __init__(self, guards=None):
+        """
+        Args:
+            guards (dict): guard name to function returning whether its
+                transitions may be taken.
+        """
         self.state = self.WAITING
+        self.entered = time.time()
+        self.guards = guards or {}
+        self.listeners = []
+        self.handlers = {}
+        self.rejected_handler = None
+        self.events = collections.deque()
+        self.dispatching = False
+
+        # Metrics.
+        self.residency = collections.defaultdict(float)
+        self.visits = collections.Counter()
+        self.transition_counts = collections.Counter()
+        self.transition_times = collections.defaultdict(float)
+        self.rejected = collections.Counter()
         Logger.info('State Machine: Initialized to state %s.', self.state)
 
+    def bind(self, listener):
+        """Call listener(old state, new state, time entered, time left) on
+        every transition.
+        """
+        self.listeners.append(listener)
+
+    def on(self, event, handler):
+        """Call handler(old state, new state) after event is handled."""
+        self.handlers[event] = handler
+
+    def on_rejected(self, handler):
+        """Call handler(state, event) when an event is rejected."""
+        self.rejected_handler = handler
+
+    def dispatch(self, event):
+        """Queue event, and handle it, unless an event is being handled, in
+        which case it is handled after that one.
+        """
+        self.events.append(event)
+        if self.dispatching:
+            return
+
+        self.dispatching = True
+        try:
+            while self.events:
+                self.handle(self.events.popleft())
+
+        finally:
+            self.dispatching = False
+
+    def handle(self, event):
+        old_state = self.state
+        targets = self.TRANSITIONS.get((old_state, event))
+        if targets is None:
+            self.rejected[(old_state, event)] += 1
+            Logger.error(
+                'State Machine: Rejected "%s" in "%s".',
+                event,
+                old_state
+            )
+            if self.rejected_handler:
+                self.rejected_handler(old_state, event)
+
+            return
+
+        for guard, new_state in targets:
+            if guard is None or self.guards[guard]():
+                break
+
+        else:
+            self.rejected[(old_state, event)] += 1
+            Logger.error(
+                'State Machine: No guard allows "%s" in "%s".',
+                event,
+                old_state
+            )
+            if self.rejected_handler:
+                self.rejected_handler(old_state, event)
+
+            return
+
+        start = time.time()
+        self.transition_to(new_state)
+        handler = self.handlers.get(event)
+        if handler:
+            handler(old_state, new_state)
+
+        key = (old_state, event, new_state)
+        self.transition_counts[key] += 1
+        self.transition_times[key] += time.time() - start
+
     def transition_to(self, new_state):
+        """Go to new_state, whatever the table says. Used to recover from
+        rejected events.
+        """
+        now = time.time()
         Logger.info(
-            'State Machine: Transitioning from "%s" to "%s".',
+            'State Machine: Transitioning from "%s" to "%s" after %.3fs.',
             self.state,
-            new_state
+            new_state,
+            now - self.entered
         )
+        self.residency[self.state] += now - self.entered
+        self.visits[self.state] += 1
+        for listener in self.listeners:
+            listener(self.state, new_state, self.entered, now)
+
         self.state = new_state
+        self.entered = now
+
+    def report(self):
+        """Time spent in each state, and the count and mean time of each
+        transition, as lines of text.
+        """
+        residency = dict(self.residency)
+        residency[self.state] = (
+            residency.get(self.state, 0.0) + time.time() - self.entered
+        )
+        lines = ['{:<20} {:>7} {:>10} {:>10}'.format(
+            'state',
+            'visits',
+            'total (s)',
+            'mean (s)'
+        )]
+        for state in sorted(residency, key=residency.get, reverse=True):
+            visits = self.visits[state] + (1 if state == self.state else 0)
+            lines.append('{:<20} {:>7} {:>10.1f} {:>10.3f}'.format(
+                state,
+                visits,
+                residency[state],
+                residency[state] / visits
+            ))
+
+        lines.append('{:<48} {:>7} {:>10}'.format(
+            'transition',
+            'count',
+            'mean (ms)'
+        ))
+        for key in sorted(self.transition_counts):
+            count = self.transition_counts[key]
+            lines.append('{:<48} {:>7} {:>10.1f}'.format(
+                '{} -> {}'.format(key[0], key[2]),
+                count,
+                self.transition_times[key] / count * 1000
+            ))
+
+        for (state, event), count in sorted(self.rejected.items()):
+            lines.append('rejected {} in {}: {}'.format(event, state, count))
+
+        return lines
@@ -8,15 +8,21 @@ https://opensource.org/licenses/BSD-3-Clause
 """
 import os
 import random
+import time
+from functools import partial
+
 from kivy.clock import Clock
+from kivy.graphics.texture import Texture
 from kivy.logger import Logger
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
+from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.image import Image
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen, ScreenManager
 
-from ui.photoboothstate import PhotoboothState
+from pipeline.jobs import on_complete
+from ui.texttextures import FrameTimer
 
 LARGE_FONT = 130
 SMALL_FONT = 50
@@ -29,7 +35,6 @@ class ScreenMgr(ScreenManager):
     COUNTDOWN = 'countdown'
     CHEESE = 'cheese'
     SELECTING = 'selecting'
-    PRINTING = 'printing'
 
     def __init__(self, app, **kwargs):
         """
@@ -42,18 +47,53 @@ class ScreenMgr(ScreenManager):
         Logger.info('ScreenMgr: __init__().')
         super(ScreenMgr, self).__init__(**kwargs)
         self.app = app
-        self.pb_screens = {
-            self.WAITING: WaitingScreen(app, name=self.WAITING),
-            self.COUNTDOWN: CountdownScreen(app, name=self.COUNTDOWN),
-            self.CHEESE: CheeseScreen(app, name=self.CHEESE),
-            self.SELECTING: SelectingScreen(app, name=self.SELECTING),
-            self.PRINTING: PrintingScreen(app, name=self.PRINTING)
+        # Only the waiting screen is needed for the first frame. The others
+        # are built by build_deferred(), or when they are first used.
+        self.screen_classes = {
+            self.WAITING: WaitingScreen,
+            self.COUNTDOWN: CountdownScreen,
+            self.CHEESE: CheeseScreen,
+            self.SELECTING: SelectingScreen
         }
-        for screen in self.pb_screens.itervalues():
-            self.add_widget(screen)
+        self.pb_screens = {}
+        for name in self.deferred_screens():
+            self.app.startup.expect('screen {}'.format(name))
 
+        self.screen(self.WAITING)
         self.current = self.WAITING
 
+    def screen(self, name):
+        """Get screen name, building it if it has not been built yet."""
+        if name not in self.pb_screens:
+            start = time.time()
+            screen = self.screen_classes[name](self.app, name=name)
+            self.add_widget(screen)
+            self.pb_screens[name] = screen
+            self.app.startup.record(
+                'screen {}'.format(name),
+                start,
+                time.time(),
+                deferred=name != self.WAITING
+            )
+
+        return self.pb_screens[name]
+
+    def deferred_screens(self):
+        return [
+            name
+            for name in (self.COUNTDOWN, self.CHEESE, self.SELECTING)
+            if name not in self.pb_screens
+        ]
+
+    def build_deferred(self, dt=None):
+        """Build the screens that are not built yet, one per frame, so the UI
+        keeps responding while they are built.
+        """
+        names = self.deferred_screens()
+        if names:
+            self.screen(names[0])
+            Clock.schedule_once(self.build_deferred)
+
 
 class WaitingScreen(Screen):
     """Waiting state widget.
@@ -63,6 +103,7 @@ class WaitingScreen(Screen):
     |                 |
     | Press to begin. |
     |                 |
+    | 1 print queued  |
     +-----------------+
     """
     def __init__(self, app, **kwargs):
@@ -86,25 +127,59 @@ class WaitingScreen(Screen):
             background_color=(0, 0, 1, 1)
         )
         self.start_button.bind(on_release=self.start_event)
+        self.queue_status = Label(
+            text='',
+            halign='center',
+            valign='middle',
+            size_hint=(1, 0.15)
+        )
 
-        self.layout = BoxLayout()
+        self.layout = BoxLayout(orientation='vertical')
         self.layout.add_widget(self.start_button)
+        self.layout.add_widget(self.queue_status)
         self.add_widget(self.layout)
 
+        self.app.print_queue.bind(self.queue_event)
+        if self.app.print_tracker:
+            self.app.print_tracker.bind(self.queue_event)
+
     def start_event(self, obj):
         Logger.info('WaitingScreen: start_event(%s).', obj)
         self.app.start_event()
 
+    def queue_event(self):
+        Logger.info('WaitingScreen: queue_event().')
+        status = []
+        jobs = self.app.print_queue.jobs()
+        if jobs:
+            status.append('{} print{} queued. {}'.format(
+                len(jobs),
+                '' if len(jobs) == 1 else 's',
+                jobs[0][1]
+            ))
+
+        if self.app.print_tracker and self.app.print_tracker.depth():
+            status.append(
+                '{} at the printer.'.format(self.app.print_tracker.depth())
+            )
+
+        self.queue_status.text = ' '.join(status)
+
 
 class CountdownScreen(Screen):
     """Countdown state widget.
 
+    The countdown is drawn over the live view, if there is one.
+
     +-----------------+
     |                 |
     |        5        |
     |                 |
     |                 |
     +-----------------+
+
+    The digits are pre-rendered textures, so a tick does not re-rasterize
+    text.
     """
     def __init__(self, app, **kwargs):
         """
@@ -119,32 +194,91 @@ class CountdownScreen(Screen):
 
         self.app = app
         self.time_remaining = 5
-        self.time_remaining_label = Label(
-            text=str(self.time_remaining),
-            # text_size=self.size,
-            halign='center',
-            valign='middle',
-            font_size=LARGE_FONT
+        self.app.text_textures.prerender(
+            [
+                str(digit)
+                for digit in range(
+                    max(
+                        self.app.settings.initial_wait_time,
+                        self.app.settings.wait_time
+                    ) + 1
+                )
+            ],
+            LARGE_FONT
         )
-        self.layout = BoxLayout()
-        self.layout.add_widget(self.time_remaining_label)
+        self.time_remaining_image = Image()
+        self.viewfinder = Image(allow_stretch=True, opacity=0)
+        self.texture = None
+        self.frame_timer = FrameTimer('countdown')
+        self.layout = FloatLayout()
+        self.layout.add_widget(self.viewfinder)
+        self.layout.add_widget(self.time_remaining_image)
         self.add_widget(self.layout)
 
+    def show_time_remaining(self):
+        self.app.text_textures.show(
+            self.time_remaining_image,
+            str(self.time_remaining),
+            LARGE_FONT
+        )
+
     def timer_event(self, obj):
         Logger.info('CountdownScreen: timer_event(%s)', obj)
         self.time_remaining -= 1
         if self.time_remaining:
-            self.time_remaining_label.text = str(self.time_remaining)
+            self.show_time_remaining()
             Clock.schedule_once(self.timer_event, 1)
 
         else:
+            self.frame_timer.stop()
+            self.stop_live_view()
             self.app.photo_event()
 
     def start_countdown(self, time):
         Logger.info('CountdownScreen: start_countdown(%s)', time)
         self.time_remaining = time
-        self.time_remaining_label.text = str(self.time_remaining)
+        self.show_time_remaining()
         Clock.schedule_once(self.timer_event, 1)
+        self.frame_timer.start()
+        self.start_live_view()
+
+    def start_live_view(self):
+        if not self.app.live_view:
+            return
+
+        self.viewfinder.opacity = 0
+        self.app.live_view.start((int(self.width), int(self.height)))
+        Clock.schedule_interval(
+            self.frame_event,
+            1.0 / self.app.settings.viewfinder_fps
+        )
+
+    def stop_live_view(self):
+        if not self.app.live_view:
+            return
+
+        Clock.unschedule(self.frame_event)
+        self.app.live_view.stop()
+
+    def frame_event(self, dt):
+        """Show the latest live view frame, if there is a new one.
+
+        Frames are decoded in the background, so this only uploads pixels.
+        """
+        frame = self.app.live_view.frame()
+        if frame is None:
+            return
+
+        size, pixels = frame
+        if self.texture is None or self.texture.size != size:
+            self.texture = Texture.create(size=size, colorfmt='rgb')
+            # Frames are stored top row first.
+            self.texture.flip_vertical()
+
+        self.texture.blit_buffer(pixels, colorfmt='rgb', bufferfmt='ubyte')
+        self.viewfinder.texture = self.texture
+        self.viewfinder.canvas.ask_update()
+        self.viewfinder.opacity = 1
 
 
 class CheeseScreen(Screen):
@@ -156,6 +290,9 @@ class CheeseScreen(Screen):
     |                 |
     |                 |
     +-----------------+
+
+    The messages are pre-rendered textures, so a tick does not re-rasterize
+    text.
     """
     smile = [
         'Cheese!',
@@ -194,14 +331,12 @@ class CheeseScreen(Screen):
         super(CheeseScreen, self).__init__(**kwargs)
 
         self.app = app
-        self.smile_label = Label(
-            text=self.smile[0],
-            halign='center',
-            valign='middle',
-            font_size=LARGE_FONT
-        )
+        self.app.text_textures.prerender(self.smile, LARGE_FONT)
+        self.app.text_textures.prerender(self.waiting, SMALL_FONT)
+        self.smile_image = Image()
+        self.frame_timer = FrameTimer('cheese')
         self.layout = BoxLayout()
-        self.layout.add_widget(self.smile_label)
+        self.layout.add_widget(self.smile_image)
         self.add_widget(self.layout)
 
         self.wait_idx = 0
@@ -209,24 +344,33 @@ class CheeseScreen(Screen):
 
     def on_entry(self):
         Logger.info('CheeseScreen: on_entry().')
-        self.smile_label.font_size = LARGE_FONT
-        self.smile_label.text = random.choice(self.smile)
+        self.app.text_textures.show(
+            self.smile_image,
+            random.choice(self.smile),
+            LARGE_FONT
+        )
         self.wait_idx = -1
         self.wait_count = 0
         Clock.schedule_once(self.timer_event, 2)
+        self.frame_timer.start()
+
+    def on_exit(self):
+        Logger.info('CheeseScreen: on_exit().')
+        Clock.unschedule(self.timer_event)
+        self.frame_timer.stop()
 
     def timer_event(self, obj):
         Logger.info('CheeseScreen: timer_event().')
-        if self.app.processing():
-            self.wait_count += 1
-            if self.wait_count % 3 == 0:
-                self.wait_idx = (self.wait_idx + 1) % len(self.waiting)
-                self.smile_label.font_size = SMALL_FONT
-                self.smile_label.text = self.waiting[self.wait_idx]
+        self.wait_count += 1
+        if self.wait_count % 3 == 0:
+            self.wait_idx = (self.wait_idx + 1) % len(self.waiting)
+            self.app.text_textures.show(
+                self.smile_image,
+                self.waiting[self.wait_idx],
+                SMALL_FONT
+            )
 
-            Clock.schedule_once(self.timer_event, 1)
-        else:
-            self.app.photo_complete_event()
+        Clock.schedule_once(self.timer_event, 1)
 
 
 class SelectingScreen(Screen):
@@ -295,9 +439,36 @@ class SelectingScreen(Screen):
     def on_entry(self):
         Logger.info('SelectingScreen: on_entry().')
 
-        self.image1.source = self.app.photonames[PhotoboothState.PHOTO1]
-        self.image2.source = self.app.photonames[PhotoboothState.PHOTO2]
-        self.image3.source = self.app.photonames[PhotoboothState.PHOTO3]
+        session = self.app.session
+        for idx, image in enumerate((self.image1, self.image2, self.image3)):
+            image.source = ''
+            on_complete(
+                [session.thumbnail_jobs[idx]],
+                partial(self.show_thumbnail, session, idx, image)
+            )
+
+    def show_thumbnail(self, session, idx, image):
+        if session is not self.app.session:
+            # Session was cancelled before the preview was ready.
+            return
+
+        start = time.time()
+        if session.thumbnail_jobs[idx].returncode != 0:
+            # Show the full size photo rather than an empty frame.
+            Logger.error(
+                'SelectingScreen: preview %s failed. Showing the photo.',
+                idx + 1
+            )
+            image.source = session.photos[idx]
+
+        else:
+            image.source = session.thumbnails[idx]
+
+        Logger.info(
+            'SelectingScreen: loaded preview %s in %.3fs.',
+            idx + 1,
+            time.time() - start
+        )
 
     def cancel_event(self, obj):
         Logger.info('SelectingScreen: cancel_event().')
@@ -306,84 +477,3 @@ class SelectingScreen(Screen):
     def print_event(self, obj):
         Logger.info('SelectingScreen: print_event().')
         self.app.print_event()
-
-
-class PrintingScreen(Screen):
-    """Printing state widget.
-
-    +-----------------+
-    |                 |
-    |   Printing...   |
-    |                 |
-    |                 |
-    +-----------------+
-    """
-    statuses = ['Resizing...', 'Montaging...', 'Compositing...', 'Printing...']
-
-    def __init__(self, app, **kwargs):
-        """
-        Args:
-            app:
-
-        Returns:
-
-        """
-        Logger.info('PrintingScreen: __init__().')
-        super(PrintingScreen, self).__init__(**kwargs)
-
-        self.app = app
-        self.status = Label(
-            text=self.statuses[0],
-            halign='center',
-            valign='middle',
-            font_size=SMALL_FONT
-        )
-        layout = BoxLayout()
-        layout.add_widget(self.status)
-        self.add_widget(layout)
-
-        self.idx = 0
-
-    def on_entry(self):
-        Logger.info('PrintingScreen: on_entry().')
-        self.app.resize_images()
-        Clock.schedule_once(self.timer_event, 0.5)
-
-    def timer_event(self, obj):
-        Logger.info('PrintingScreen: timer_event().')
-        if self.idx == 0:
-            # Resizing images.
-            if not self.app.processing():
-                self.idx += 1
-                self.status.text = self.statuses[self.idx]
-                self.app.compose_photo()
-
-            Clock.schedule_once(self.timer_event, 0.5)
-
-        elif self.idx == 1:
-            # Montaging print.
-            if not self.app.processing():
-                self.idx += 1
-                self.status.text = self.statuses[self.idx]
-                self.app.composite_photo()
-
-            Clock.schedule_once(self.timer_event, 0.5)
-
-        elif self.idx == 2:
-            # Compositing.
-            if not self.app.processing():
-                self.idx += 1
-                self.status.text = self.statuses[self.idx]
-                self.app.print_photo()
-
-            Clock.schedule_once(self.timer_event, 0.5)
-
-        else:
-            # Printing.
-            if not self.app.processing():
-                self.idx = 0
-                self.status.text = self.statuses[self.idx]
-                self.app.print_complete()
-            else:
-                Clock.schedule_once(self.timer_event, 0.5)
-
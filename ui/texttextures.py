@@ -0,0 +1,109 @@
+"""
+Copyright 2015, Andrew Lin
+All rights reserved.
+
+This software is licensed under the BSD 3-Clause License.
+See LICENSE.txt at the root of the project or
+https://opensource.org/licenses/BSD-3-Clause
+"""
+import time
+
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.logger import Logger
+
+from pipeline.timing import percentile
+
+
+class TextTextureCache(object):
+    """Text rendered to textures ahead of time.
+
+    Changing a Label's text, or font size, rasterizes the text again, and at
+    the countdown's font size that takes a noticeable part of a frame on the
+    Pi, just as the camera is busy. Every text a screen shows is rendered once,
+    when the screen is built, and the screen swaps textures after that.
+    Textures must be rendered on the Kivy main thread.
+    """
+    def __init__(self):
+        self.textures = {}
+        self.render_time = 0.0
+        self.renders = 0
+
+    def prerender(self, texts, font_size):
+        start = time.time()
+        for text in texts:
+            self.texture(text, font_size)
+
+        Logger.info(
+            'TextTextureCache: %s texts at %spt ready in %.3fs, %.1fms per '
+            'render.',
+            len(texts),
+            font_size,
+            time.time() - start,
+            self.mean_render_time() * 1000
+        )
+
+    def texture(self, text, font_size):
+        """Texture of text, rendered now if it was not rendered before, or
+        None for no text.
+        """
+        if not text:
+            return None
+
+        key = (text, font_size)
+        texture = self.textures.get(key)
+        if texture is None:
+            start = time.time()
+            label = CoreLabel(text=text, font_size=font_size, halign='center')
+            label.refresh()
+            texture = label.texture
+            self.textures[key] = texture
+            self.render_time += time.time() - start
+            self.renders += 1
+
+        return texture
+
+    def show(self, image, text, font_size):
+        """Show text in an Image widget."""
+        texture = self.texture(text, font_size)
+        image.texture = texture
+        # An Image without a texture is drawn as a white box.
+        image.opacity = 1 if texture else 0
+
+    def mean_render_time(self):
+        return self.render_time / self.renders if self.renders else 0.0
+
+
+class FrameTimer(object):
+    """Frame times while a screen is showing, so dropped frames show up in
+    the log.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.frame_times = []
+        self.last = None
+
+    def start(self):
+        self.frame_times = []
+        self.last = time.time()
+        # An interval of 0 is called once per frame.
+        Clock.schedule_interval(self.tick, 0)
+
+    def tick(self, dt):
+        now = time.time()
+        self.frame_times.append(now - self.last)
+        self.last = now
+
+    def stop(self):
+        Clock.unschedule(self.tick)
+        if not self.frame_times:
+            return
+
+        Logger.info(
+            'FrameTimer: %s %s frames, mean %.1fms, p95 %.1fms, max %.1fms.',
+            self.name,
+            len(self.frame_times),
+            sum(self.frame_times) / len(self.frame_times) * 1000,
+            percentile(self.frame_times, 95) * 1000,
+            max(self.frame_times) * 1000
+        )